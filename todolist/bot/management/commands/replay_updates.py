@@ -0,0 +1,47 @@
+import json
+import time
+
+import requests
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Post recorded Telegram updates to the webhook like Telegram does, '
+        'a local stand-in for trying webhook mode without a public URL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON file with a getUpdates response or a list of updates')
+        parser.add_argument('--url', default='http://127.0.0.1:8000/bot/webhook')
+        parser.add_argument('--secret', default=settings.TG_BOT_WEBHOOK_SECRET,
+                            help='TG_BOT_WEBHOOK_SECRET by default')
+        parser.add_argument('--delay', type=float, default=0, help='Seconds between updates')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        updates = data.get('result') if isinstance(data, dict) else data
+        if not isinstance(updates, list):
+            raise CommandError('Expected a getUpdates response or a list of updates')
+
+        failed = 0
+        with requests.Session() as session:
+            for number, update in enumerate(updates):
+                if number and options['delay']:
+                    time.sleep(options['delay'])
+                try:
+                    response = session.post(
+                        options['url'], json=update, timeout=10,
+                        headers={'X-Telegram-Bot-Api-Secret-Token': options['secret']},
+                    )
+                except requests.RequestException as error:
+                    raise CommandError(f'Update {update.get("update_id")}: {error}')
+                if response.status_code != 200:
+                    failed += 1
+                    self.stderr.write(f'Update {update.get("update_id")}: {response.status_code} {response.text[:200]}')
+        self.stdout.write(f'Posted {len(updates)} updates, {failed} failed')
@@ -1,14 +1,23 @@
+import asyncio
+import copy
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Union
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 from django.db.models import QuerySet
 
 from bot.models import TgUser
-from bot.tg.client import TgClient
+from bot.outbox import Outbox, OutboxRelay, SenderStatsWriter
+from bot.tg.client import AsyncTgClient, TgClient
+from bot.tg.dc import UpdateObj
+from bot.tg.runtime import BotRuntime
+from bot.tg.sender import SendQueue, get_send_queue
+from bot.webhook import InboxRelay
 from goals.models import Goal, GoalCategory, BoardParticipant
-from todolist.settings import TG_BOT_TOKEN
+from todolist.settings import TG_BOT_TOKEN, TG_BOT_WORKERS, TG_BOT_CONVERSATIONS_CACHE_SIZE
 
 
 @dataclass
@@ -51,29 +60,83 @@ class OperationBuffer:
     category_id_input: int = None
     goal_title: str = None
 
+    state_fields = [
+        'current_operation', 'operation_state', 'sub_operation', 'user_input', 'valid_input', 'category_id_input',
+        'goal_title',
+    ]
+
     def __init__(self, tg_user):
         self.tg_user = tg_user
 
+    def to_dict(self) -> dict:
+        return copy.deepcopy({name: getattr(self, name) for name in self.state_fields})
 
-class Command(BaseCommand):
-    help = 'Start Telegram bot'
+    @classmethod
+    def from_dict(cls, tg_user, data: dict) -> 'OperationBuffer':
+        op_buff = cls(tg_user)
+        for name in cls.state_fields:
+            if name in data:
+                setattr(op_buff, name, copy.deepcopy(data[name]))
+        return op_buff
+
+
+class ConversationStore:
+    """
+    Operation buffers of bot users keyed by tg_user_id, in a bounded LRU in front of TgUser.conversation.
+
+    Changes are written through to the database, so conversations survive restarts and any bot process can
+    continue them. A cached buffer is reused only while it matches the row the handler has just loaded.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._buffers: OrderedDict[int, tuple[dict, OperationBuffer]] = OrderedDict()
+
+    def get(self, tg_user: TgUser) -> OperationBuffer | None:
+        if tg_user.conversation is None:
+            return None
+        with self._lock:
+            cached = self._buffers.get(tg_user.tg_user_id)
+            if cached is not None and cached[0] == tg_user.conversation:
+                self._buffers.move_to_end(tg_user.tg_user_id)
+                cached[1].tg_user = tg_user
+                return cached[1]
+        op_buff = OperationBuffer.from_dict(tg_user, tg_user.conversation)
+        self._remember(tg_user.tg_user_id, tg_user.conversation, op_buff)
+        return op_buff
+
+    def put(self, tg_user: TgUser, op_buff: OperationBuffer | None):
+        data = None if op_buff is None else op_buff.to_dict()
+        if data != tg_user.conversation:
+            TgUser.objects.filter(id=tg_user.id).update(conversation=data)
+            tg_user.conversation = data
+        self._remember(tg_user.tg_user_id, data, op_buff)
+
+    def _remember(self, tg_user_id: int, data: dict | None, op_buff: OperationBuffer | None):
+        with self._lock:
+            if op_buff is None:
+                self._buffers.pop(tg_user_id, None)
+                return
+            self._buffers[tg_user_id] = (data, op_buff)
+            self._buffers.move_to_end(tg_user_id)
+            while len(self._buffers) > self.max_size:
+                self._buffers.popitem(last=False)
+
+
+class ChatHandler:
+    """
+    Handles one message, the operation buffer of its user is loaded from and saved to the conversation store.
+    Replies go through the send queue in runbot and through the outbox in the API.
+    """
     op_buff: Union[OperationBuffer, None] = None
     operation_commands: list = ['/create', '/create_category', '/cancel']
     categories: QuerySet[GoalCategory] | None = None
     goals: QuerySet[Goal] | None = None
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)  # mandatory
-        self.tg_client = TgClient(TG_BOT_TOKEN)
-
-    def handle(self, *args, **kwargs):
-        offset = 0
-
-        while True:
-            response = self.tg_client.get_updates(offset=offset)
-            for item in response.result:
-                offset = item.update_id + 1
-                self.handle_message(item.message)
+    def __init__(self, tg_client: SendQueue | Outbox, conversations: ConversationStore):
+        self.tg_client = tg_client
+        self.conversations = conversations
 
     def handle_message(self, message):
         tg_user, created = TgUser.objects.get_or_create(
@@ -84,10 +147,14 @@ class Command(BaseCommand):
         if created:
             self.tg_client.send_message(chat_id=message.chat.id, text="Greetings!")
 
-        if tg_user.user:
-            self.handle_verified_user(message, tg_user)
-        else:
-            self.handle_unverified_user(message, tg_user)
+        self.op_buff = self.conversations.get(tg_user)
+        try:
+            if tg_user.user:
+                self.handle_verified_user(message, tg_user)
+            else:
+                self.handle_unverified_user(message, tg_user)
+        finally:
+            self.conversations.put(tg_user, self.op_buff)
 
     def handle_verified_user(self, message, tg_user):
 
@@ -220,6 +287,12 @@ class Command(BaseCommand):
             board__participants__role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
             is_deleted=False
         ).first()
+        if category is None:
+            # Deleted or no longer writable since it was chosen
+            self.op_buff = None
+            self.tg_client.send_message(chat_id=message.chat.id, text='Category is not available anymore\n'
+                                                                      'Operation cancelled')
+            return None
         goal = Goal.objects.create(
             user=tg_user, title=self.op_buff.goal_title, category=category
         )
@@ -266,3 +339,60 @@ class Command(BaseCommand):
 
         response = '\n'.join([f'#{goal.id} {goal.title}' for goal in self.goals])
         return response
+
+
+class Command(BaseCommand):
+    help = 'Start Telegram bot'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)  # mandatory
+        # Only polls, messages are sent by the send queue
+        self.tg_client = TgClient(TG_BOT_TOKEN, pool_size=1)
+        self.outbox = get_send_queue()
+        self.conversations = ConversationStore(max_size=TG_BOT_CONVERSATIONS_CACHE_SIZE)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=TG_BOT_WORKERS, help='Threads handling updates')
+
+    def handle(self, *args, **options):
+        webhook = settings.TG_BOT_MODE == 'webhook'
+        if webhook:
+            # Updates go to bot/webhook of the API, which stores them for the inbox relay below. One delivery
+            # at a time, so they are stored in the order Telegram sends them
+            if not settings.TG_BOT_WEBHOOK_URL or not settings.TG_BOT_WEBHOOK_SECRET:
+                raise CommandError('Webhook mode needs TG_BOT_WEBHOOK_URL and TG_BOT_WEBHOOK_SECRET')
+            self.tg_client.set_webhook(
+                settings.TG_BOT_WEBHOOK_URL, secret_token=settings.TG_BOT_WEBHOOK_SECRET, max_connections=1
+            )
+            self.stdout.write(f'Webhook set to {settings.TG_BOT_WEBHOOK_URL}')
+        else:
+            # getUpdates is refused while a webhook is set
+            self.tg_client.delete_webhook()
+        # In both modes runbot is the only process sending, messages of the API come through the outbox table
+        outbox_relay = OutboxRelay(self.outbox)
+        stats_writer = SenderStatsWriter(self.outbox, settings.TG_BOT_STATS_INTERVAL)
+        inbox_relay = InboxRelay(self.handle_update, workers=options['workers']) if webhook else None
+        self.outbox.start()
+        outbox_relay.start()
+        stats_writer.start()
+        try:
+            if webhook:
+                inbox_relay.start()
+                inbox_relay.join()
+            else:
+                runtime = BotRuntime(AsyncTgClient(self.tg_client), self.handle_update, workers=options['workers'])
+                asyncio.run(runtime.run())
+        finally:
+            if inbox_relay is not None:
+                # Queued updates are finished, the rest stays in the inbox for the next start
+                inbox_relay.stop()
+                inbox_relay.pool.join(timeout=30)
+            outbox_relay.stop()
+            outbox_relay.join(timeout=10)
+            self.outbox.stop(timeout=30)
+            stats_writer.stop()
+            stats_writer.join(timeout=10)
+
+    def handle_update(self, update: UpdateObj):
+        # Called from handler threads, never for two updates of the same chat at once
+        ChatHandler(self.outbox, self.conversations).handle_message(update.message)
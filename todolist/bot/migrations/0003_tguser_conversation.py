@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_tguser_username_tguser_verification_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tguser',
+            name='conversation',
+            field=models.JSONField(blank=True, default=None, null=True, verbose_name='conversation state'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_tguser_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(verbose_name='tg_chat_id')),
+                ('text', models.TextField(verbose_name='text')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.3 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('update_id', models.BigIntegerField(unique=True, verbose_name='update_id')),
+                ('chat_id', models.BigIntegerField(verbose_name='tg_chat_id')),
+                ('data', models.JSONField(verbose_name='update')),
+                ('received', models.DateTimeField(auto_now_add=True, verbose_name='received')),
+                ('handled', models.DateTimeField(blank=True, default=None, null=True, verbose_name='handled')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inboundupdate',
+            index=models.Index(condition=models.Q(('handled__isnull', True)), fields=['update_id'], name='inbound_update_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.3 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_inboundupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SenderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stats', models.JSONField(verbose_name='stats')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+            ],
+        ),
+    ]
@@ -19,8 +19,8 @@ class TgUser(models.Model):
 
     verification_code = models.CharField(verbose_name='verification code', max_length=16, null=True)
 
-    # in_operation = models.BooleanField(verbose_name='in operation', default=False)
-    # operation_buff = models.CharField(verbose_name='operation buffer', null=True, blank=True)
+    # Operation buffer of runbot, see bot.management.commands.runbot.ConversationStore
+    conversation = models.JSONField(verbose_name='conversation state', null=True, blank=True, default=None)
 
     def generate_verification_code(self):
         verification_code = ''.join(
@@ -28,3 +28,33 @@ class TgUser(models.Model):
         )
         self.verification_code = verification_code
 
+
+
+class OutboxMessage(models.Model):
+    """Message stored by an API process for runbot to send, see bot.outbox"""
+    chat_id = models.BigIntegerField(verbose_name='tg_chat_id')
+    text = models.TextField(verbose_name='text')
+    created = models.DateTimeField(verbose_name='created', auto_now_add=True)
+
+
+class SenderStats(models.Model):
+    """Stats of the runbot send queue, saved by runbot for the API, see bot.outbox.SenderStatsWriter"""
+    stats = models.JSONField(verbose_name='stats')
+    updated = models.DateTimeField(verbose_name='updated', auto_now=True)
+
+
+class InboundUpdate(models.Model):
+    """Update Telegram posted to the webhook, stored by the API for runbot to handle, see bot.webhook"""
+    update_id = models.BigIntegerField(verbose_name='update_id', unique=True)
+    chat_id = models.BigIntegerField(verbose_name='tg_chat_id')
+    data = models.JSONField(verbose_name='update')
+    received = models.DateTimeField(verbose_name='received', auto_now_add=True)
+    # Kept for a while after handling, so updates Telegram delivers again are recognized
+    handled = models.DateTimeField(verbose_name='handled', null=True, blank=True, default=None)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['update_id'], condition=models.Q(handled__isnull=True), name='inbound_update_pending_idx'
+            ),
+        ]
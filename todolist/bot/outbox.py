@@ -0,0 +1,106 @@
+import logging
+import threading
+
+from django.db import connection, connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from bot.models import OutboxMessage, SenderStats
+from bot.relay import NotifyRelay
+from bot.tg.sender import SendQueue
+
+OUTBOX_CHANNEL = 'bot_outbox'
+OUTBOX_BATCH_SIZE = 100
+SENDER_STATS_ID = 1
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Stand-in for a TgClient in API processes: messages are stored in the database and sent by runbot.
+
+    runbot is the only process talking to Telegram, so its send queue alone keeps the bot within the rate limits,
+    and messages survive restarts of the API workers.
+    """
+
+    def send_message(self, chat_id: int, text: str):
+        OutboxMessage.objects.create(chat_id=chat_id, text=text)
+        if connection.vendor == 'postgresql':
+            # Delivered on commit, wakes the relay of runbot
+            with connection.cursor() as cursor:
+                cursor.execute(f'NOTIFY {OUTBOX_CHANNEL}')
+
+
+class OutboxRelay(NotifyRelay):
+    """
+    Moves stored messages to the send queue of runbot in the order they were stored.
+
+    Messages leave the table once queued, so the ones still in the send queue when runbot crashes are lost;
+    a stopped runbot sends them first.
+    """
+
+    channel = OUTBOX_CHANNEL
+
+    def __init__(self, queue: SendQueue, batch_size: int = OUTBOX_BATCH_SIZE):
+        super().__init__(name='bot-outbox')
+        self.queue = queue
+        self.batch_size = batch_size
+
+    def drain(self) -> int:
+        """Queue every stored message, returns their number"""
+        moved = 0
+        while True:
+            with transaction.atomic():
+                messages = list(
+                    OutboxMessage.objects.select_for_update(skip_locked=True).order_by('id')[:self.batch_size]
+                )
+                OutboxMessage.objects.filter(id__in=[message.id for message in messages]).delete()
+            for message in messages:
+                self.queue.send_message(chat_id=message.chat_id, text=message.text)
+            moved += len(messages)
+            if len(messages) < self.batch_size:
+                return moved
+
+
+def outbox_stats() -> dict:
+    """Messages waiting for runbot and the age of the oldest one in seconds"""
+    stats = OutboxMessage.objects.aggregate(depth=Count('id'), oldest=Min('created'))
+    oldest = stats['oldest']
+    return {'depth': stats['depth'], 'oldest': (timezone.now() - oldest).total_seconds() if oldest else None}
+
+
+class SenderStatsWriter(threading.Thread):
+    """Saves SendQueue.stats() of runbot every ``interval`` seconds and once more when stopped"""
+
+    def __init__(self, queue: SendQueue, interval: float):
+        super().__init__(name='bot-sender-stats', daemon=True)
+        self.queue = queue
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            self.save()
+            while not self.stopped.wait(self.interval):
+                self.save()
+            self.save()
+        finally:
+            connections['default'].close()
+
+    def stop(self):
+        self.stopped.set()
+
+    def save(self):
+        try:
+            SenderStats.objects.update_or_create(id=SENDER_STATS_ID, defaults={'stats': self.queue.stats()})
+        except Exception:
+            logger.exception('Saving send queue stats failed')
+
+
+def sender_stats() -> dict | None:
+    """Last saved stats of the runbot send queue with their age in seconds, None before runbot saved any"""
+    saved = SenderStats.objects.filter(id=SENDER_STATS_ID).first()
+    if saved is None:
+        return None
+    return {**saved.stats, 'age': (timezone.now() - saved.updated).total_seconds()}
@@ -0,0 +1,73 @@
+import logging
+import os
+import select
+import threading
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class NotifyRelay(threading.Thread):
+    """
+    Thread of runbot draining a table other processes write to, see bot.outbox and bot.webhook.
+
+    ``drain`` runs on start, whenever NOTIFY arrives on ``channel`` and every ``poll_interval`` seconds anyway,
+    so nothing is missed while the connection is re-established. Other databases are only polled.
+    """
+
+    channel = ''
+    poll_interval = 5
+    retry_interval = 1
+
+    def __init__(self, name: str):
+        super().__init__(name=name, daemon=True)
+        self.stopped = threading.Event()
+        # Written by stop and wake, so a waiting relay doesn't wait for poll_interval
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.listen()
+                except Exception:
+                    logger.exception('%s failed, reconnecting', self.name)
+                    connections['default'].close()
+                    self.stopped.wait(self.retry_interval)
+        finally:
+            connections['default'].close()
+            os.close(self._wake_read)
+
+    def wake(self):
+        """Drain again without waiting for NOTIFY"""
+        try:
+            os.write(self._wake_write, b'\0')
+        except BlockingIOError:
+            # Already woken
+            pass
+
+    def stop(self):
+        self.stopped.set()
+        self.wake()
+
+    def listen(self):
+        db = connections['default']
+        db.ensure_connection()
+        raw = db.connection if db.vendor == 'postgresql' else None
+        if raw is not None:
+            with raw.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+        while not self.stopped.is_set():
+            self.drain()
+            waiting = [self._wake_read] if raw is None else [raw, self._wake_read]
+            ready = select.select(waiting, [], [], self.poll_interval)[0]
+            if self._wake_read in ready:
+                os.read(self._wake_read, 1024)
+            if raw in ready:
+                raw.poll()
+                raw.notifies.clear()
+
+    def drain(self):
+        raise NotImplementedError
@@ -1,3 +1,574 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bot.management.commands.runbot import Command, ConversationStore
+from bot.models import InboundUpdate, OutboxMessage, SenderStats, TgUser
+from bot.outbox import Outbox, OutboxRelay, SenderStatsWriter
+from bot.tg.client import TgApiError, TgClient
+from bot.tg.dc import GetUpdatesResponse
+from bot.tg.runtime import BotRuntime, UpdatePool
+from bot.tg.sender import SendQueue
+from bot.webhook import InboxRelay
+from core.models import User
+from goals.models import Board, BoardParticipant, Goal, GoalCategory
+
+
+def message_data(message_id: int, chat_id: int, text: str) -> dict:
+    return {
+        'message_id': message_id,
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User', 'last_name': None, 'username': None},
+        'chat': {'id': chat_id, 'type': 'private', 'title': None, 'username': None, 'first_name': 'User',
+                 'last_name': None},
+        'text': text,
+    }
+
+
+def make_updates(*updates: tuple[int, int, str]) -> GetUpdatesResponse:
+    """Response of getUpdates with ``(update_id, chat_id, text)`` messages"""
+    return GetUpdatesResponse.Schema().load({'ok': True, 'result': [
+        {'update_id': update_id, 'message': message_data(update_id, chat_id, text)}
+        for update_id, chat_id, text in updates
+    ]})
+
+
+class FakeClient:
+    """Serves prepared getUpdates responses, then stops the runtime"""
+
+    def __init__(self, *responses: GetUpdatesResponse):
+        self.responses = list(responses)
+        self.offsets = []
+
+    async def get_updates(self, offset: int = 0, timeout: int = 60) -> GetUpdatesResponse:
+        self.offsets.append(offset)
+        if not self.responses:
+            raise asyncio.CancelledError
+        return self.responses.pop(0)
+
+
+class BotRuntimeTestCase(SimpleTestCase):
+    def run_bot(self, client: FakeClient, handle):
+        with mock.patch('bot.tg.runtime.close_old_connections'):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(BotRuntime(client, handle, workers=4).run())
+
+    def test_chats_are_concurrent_and_ordered(self):
+        handled = []
+        second_chat_started = threading.Event()
+
+        def handle(update):
+            if update.message.chat.id == 1 and update.message.text == 'first':
+                # Waits for the other chat, so it would time out if chats were handled one after another
+                self.assertTrue(second_chat_started.wait(5))
+            if update.message.chat.id == 2:
+                second_chat_started.set()
+            handled.append((update.message.chat.id, update.message.text))
+
+        self.run_bot(FakeClient(make_updates((10, 1, 'first'), (11, 2, 'other'), (12, 1, 'second'))), handle)
+        self.assertLess(handled.index((1, 'first')), handled.index((1, 'second')))
+        self.assertEqual(len(handled), 3)
+
+    def test_offset_confirms_queued_batch(self):
+        client = FakeClient(make_updates((10, 1, 'a'), (11, 2, 'b')), make_updates(), make_updates((12, 1, 'c')))
+        self.run_bot(client, lambda update: None)
+        self.assertEqual(client.offsets, [0, 12, 12, 13])
+
+    def test_slow_chat_does_not_block_polling(self):
+        handled = []
+        fast_handled = threading.Event()
+
+        def handle(update):
+            if update.message.text == 'slow':
+                # The update of the other chat comes with the next getUpdates, which must not wait for this one
+                self.assertTrue(fast_handled.wait(5))
+            handled.append(update.message.text)
+            if update.message.text == 'fast':
+                fast_handled.set()
+
+        self.run_bot(FakeClient(make_updates((10, 1, 'slow')), make_updates((11, 2, 'fast'))), handle)
+        # Queued updates are finished before the runtime stops
+        self.assertEqual(handled, ['fast', 'slow'])
+
+    def test_max_pending(self):
+        pending = []
+
+        class CountingClient(FakeClient):
+            async def get_updates(self, offset: int = 0, timeout: int = 60):
+                pending.append(runtime.pending)
+                return await super().get_updates(offset, timeout)
+
+        runtime = BotRuntime(
+            CountingClient(make_updates((10, 1, 'a'), (11, 2, 'b')), make_updates((12, 1, 'c'))),
+            lambda update: time.sleep(0.05), workers=4, max_pending=2,
+        )
+        with mock.patch('bot.tg.runtime.close_old_connections'):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(runtime.run())
+        self.assertEqual(pending[0], 0)
+        self.assertTrue(all(count < 2 for count in pending), pending)
+
+    def test_failed_update_does_not_stop_chat(self):
+        handled = []
+
+        def handle(update):
+            if update.message.text == 'bad':
+                raise ValueError(update.message.text)
+            handled.append(update.message.text)
+
+        with self.assertLogs('bot.tg.runtime', 'ERROR'):
+            self.run_bot(FakeClient(make_updates((10, 1, 'bad'), (11, 1, 'good'))), handle)
+        self.assertEqual(handled, ['good'])
+
+
+class ConversationStoreTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='Passw0rd!')
+        board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=board, user=self.user, role=BoardParticipant.Role.owner)
+        self.category = GoalCategory.objects.create(title='Category', user=self.user, board=board)
+        for tg_user_id in (1, 2):
+            TgUser.objects.create(tg_user_id=tg_user_id, tg_chat_id=tg_user_id, user=self.user)
+        self.tg_client = mock.Mock()
+        self.update_id = 0
+
+    def send(self, command: Command, chat_id: int, text: str) -> str:
+        self.update_id += 1
+        self.tg_client.reset_mock()
+        command.handle_update(make_updates((self.update_id, chat_id, text)).result[0])
+        return self.tg_client.send_message.call_args.kwargs['text']
+
+    def command(self, cache_size: int = 100) -> Command:
+        command = Command()
+        command.outbox = self.tg_client
+        command.conversations = ConversationStore(max_size=cache_size)
+        return command
+
+    def test_conversations_are_per_user(self):
+        command = self.command()
+        self.assertIn(f'#{self.category.id} Category', self.send(command, 1, '/create'))
+        self.assertEqual(self.send(command, 2, '/status'), 'You have no pending operations')
+        self.assertIn('Enter goal title', self.send(command, 1, str(self.category.id)))
+        self.assertIn('created successfully', self.send(command, 1, 'Goal'))
+        self.assertEqual(Goal.objects.get().title, 'Goal')
+        self.assertIsNone(TgUser.objects.get(tg_user_id=1).conversation)
+
+    def test_conversation_survives_restart(self):
+        self.send(self.command(), 1, '/create')
+        self.assertEqual(TgUser.objects.get(tg_user_id=1).conversation['sub_operation'], ['id', 'Category id prompt'])
+        self.assertIn('Enter goal title', self.send(self.command(), 1, str(self.category.id)))
+        self.assertIn('created successfully', self.send(self.command(), 1, 'Goal'))
+
+    def test_cache_is_bounded(self):
+        command = self.command(cache_size=1)
+        self.send(command, 1, '/create')
+        self.send(command, 2, '/create')
+        self.assertEqual(list(command.conversations._buffers), [2])
+        self.assertIn('Enter goal title', self.send(command, 1, str(self.category.id)))
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def respond(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append((self.command, self.path, body, self.client_address[1], self.headers))
+        status, data = self.server.responses.pop(0)
+        payload = data if isinstance(data, bytes) else json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTelegram(ThreadingHTTPServer):
+    """Local Bot API stand-in answering with scripted ``(status, data)`` responses and recording requests"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeTelegramHandler)
+        self.responses = []
+        self.requests = []
+
+
+class TgClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeTelegram()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = TgClient('token', base_url=f'http://127.0.0.1:{self.server.server_port}')
+        sleep = mock.patch('bot.tg.client.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sent(self, text: str = 'Hi'):
+        return 200, {'ok': True, 'result': message_data(1, 7, text)}
+
+    def test_post_over_one_connection(self):
+        self.server.responses = [self.sent('a'), self.sent('b'), self.sent('c')]
+        for text in 'abc':
+            self.assertEqual(self.client.send_message(chat_id=7, text=text).result.text, text)
+        self.assertEqual([request[0] for request in self.server.requests], ['POST'] * 3)
+        self.assertEqual(json.loads(self.server.requests[0][2]), {'chat_id': 7, 'text': 'a'})
+        self.assertEqual(len({request[3] for request in self.server.requests}), 1)
+
+    def test_retry_after(self):
+        self.server.responses = [
+            (429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 3',
+                   'parameters': {'retry_after': 3}}),
+            self.sent(),
+        ]
+        self.client.send_message(chat_id=7, text='Hi')
+        self.assertEqual(len(self.server.requests), 2)
+        self.sleep.assert_called_once_with(3.0)
+
+    def test_backoff_on_server_errors(self):
+        self.server.responses = [(502, b'Bad Gateway'), (503, {'ok': False}), (200, {'ok': True, 'result': []})]
+        self.assertEqual(self.client.get_updates(offset=5, timeout=0).result, [])
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [0.5, 1.0])
+        self.assertIn('offset=5', self.server.requests[-1][1])
+
+    def test_client_error_is_not_retried(self):
+        self.server.responses = [(400, {'ok': False, 'description': 'Bad Request: chat not found'})]
+        with self.assertRaisesMessage(TgApiError, 'chat not found'):
+            self.client.send_message(chat_id=7, text='Hi')
+        self.assertEqual(len(self.server.requests), 1)
+        self.sleep.assert_not_called()
+
+    def test_gives_up(self):
+        self.server.responses = [(500, {'ok': False, 'description': 'Internal'})] * (TgClient.max_retries + 1)
+        with self.assertRaises(TgApiError):
+            self.client.send_message(chat_id=7, text='Hi')
+        self.assertEqual(len(self.server.requests), TgClient.max_retries + 1)
+
+
+class RecordingClient:
+    """Records ``(time, chat_id, text)`` of sent messages, ``block`` holds the first send until it is set"""
+
+    def __init__(self, fail_chats=()):
+        self.sent = []
+        self.fail_chats = fail_chats
+        self.block = threading.Event()
+        self.block.set()
+        self.sending = threading.Event()
+
+    def send_message(self, chat_id: int, text: str):
+        self.sending.set()
+        self.block.wait(5)
+        if chat_id in self.fail_chats:
+            raise TgApiError('sendMessage', 400, {'description': 'Bad Request: chat not found'})
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+class SendQueueTestCase(SimpleTestCase):
+    def make_queue(self, client: RecordingClient, **kwargs) -> SendQueue:
+        queue = SendQueue(client, **{'workers': 2, 'rate': 1000, 'chat_rate': 1000, **kwargs})
+        self.addCleanup(queue.stop, 5)
+        return queue
+
+    def test_waiting_messages_are_coalesced(self):
+        client = RecordingClient()
+        client.block.clear()
+        queue = self.make_queue(client)
+        queue.send_message(1, 'a')
+        self.assertTrue(client.sending.wait(5))
+        queue.send_message(1, 'b')
+        queue.send_message(1, 'c')
+        self.assertEqual(queue.stats()['depth'], 2)
+        client.block.set()
+        self.assertTrue(queue.flush(5))
+        self.assertEqual([text for _, _, text in client.sent], ['a', 'b\n\nc'])
+        stats = queue.stats()
+        self.assertEqual((stats['sent'], stats['requests'], stats['coalesced'], stats['depth']), (3, 2, 1, 0))
+        self.assertIsNotNone(stats['latency']['p95'])
+
+    def test_chat_rate(self):
+        client = RecordingClient()
+        queue = self.make_queue(client, chat_rate=10)
+        for text in 'abc':
+            queue.send_message(1, text)
+            self.assertTrue(queue.flush(5))
+        queue.send_message(2, 'other')
+        self.assertTrue(queue.flush(5))
+        times = [sent_at for sent_at, chat_id, _ in client.sent if chat_id == 1]
+        self.assertGreaterEqual(times[2] - times[0], 0.18)
+        # Other chats do not wait for chat 1
+        self.assertLess(client.sent[3][0] - times[2], 0.09)
+
+    def test_global_rate(self):
+        client = RecordingClient()
+        queue = self.make_queue(client, rate=10, workers=4)
+        started = time.monotonic()
+        for chat_id in range(5):
+            queue.send_message(chat_id, 'Hi')
+        self.assertTrue(queue.flush(5))
+        self.assertEqual(len(client.sent), 5)
+        self.assertGreaterEqual(client.sent[-1][0] - started, 0.38)
+
+    def test_failed_send_does_not_stop_queue(self):
+        client = RecordingClient(fail_chats={1})
+        queue = self.make_queue(client)
+        with self.assertLogs('bot.tg.sender', 'ERROR'):
+            queue.send_message(1, 'lost')
+            queue.send_message(2, 'Hi')
+            self.assertTrue(queue.flush(5))
+        self.assertEqual([(chat_id, text) for _, chat_id, text in client.sent], [(2, 'Hi')])
+        self.assertEqual(queue.stats()['failed'], 1)
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='Passw0rd!')
+        self.queue = mock.Mock()
+
+    def test_relay_keeps_order(self):
+        outbox = Outbox()
+        for text in 'abc':
+            outbox.send_message(chat_id=1, text=text)
+        self.assertEqual(OutboxRelay(self.queue, batch_size=2).drain(), 3)
+        self.assertEqual([call.kwargs['text'] for call in self.queue.send_message.call_args_list], ['a', 'b', 'c'])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_verification_is_stored(self):
+        TgUser.objects.create(tg_user_id=1, tg_chat_id=10, verification_code='code')
+        self.client.force_login(self.user)
+        response = self.client.patch('/bot/verify', {'verification_code': 'code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(OutboxMessage.objects.values_list('chat_id', 'text')),
+                         [(10, 'Verification completed successfully')])
+
+    def test_stats(self):
+        Outbox().send_message(chat_id=1, text='Hi')
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        stats = self.client.get('/bot/send_stats').json()
+        self.assertEqual(stats['outbox']['depth'], 1)
+        self.assertGreaterEqual(stats['outbox']['oldest'], 0)
+        self.assertIsNone(stats['sender'])
+
+        queue = SendQueue(mock.Mock(), workers=1)
+        for text in 'ab':
+            queue.send_message(chat_id=1, text=text)
+        self.assertTrue(queue.flush(5))
+        SenderStatsWriter(queue, interval=10).save()
+        queue.stop(5)
+        sender = self.client.get('/bot/send_stats').json()['sender']
+        self.assertEqual((sender['queued'], sender['depth']), (2, 0))
+        self.assertIn('p95', sender['latency'])
+        self.assertGreaterEqual(sender['age'], 0)
+
+
+class OutboxRelayTestCase(TransactionTestCase):
+    @mock.patch.object(OutboxRelay, 'poll_interval', 30)
+    def test_notify_wakes_relay(self):
+        queue = mock.Mock()
+        sent = threading.Event()
+        queue.send_message.side_effect = lambda **kwargs: sent.set()
+        relay = OutboxRelay(queue)
+        relay.start()
+        try:
+            # Polls only every 30 seconds, so the message has to come through NOTIFY
+            time.sleep(0.5)
+            Outbox().send_message(chat_id=1, text='Hi')
+            self.assertTrue(sent.wait(5))
+        finally:
+            relay.stop()
+            relay.join(5)
+        self.assertFalse(relay.is_alive())
+        queue.send_message.assert_called_once_with(chat_id=1, text='Hi')
+
+
+class SenderStatsWriterTestCase(TransactionTestCase):
+    def test_saves_until_stopped(self):
+        queue = mock.Mock()
+        queue.stats.side_effect = [{'sent': 1}, {'sent': 2}]
+        writer = SenderStatsWriter(queue, interval=30)
+        writer.start()
+        writer.stop()
+        writer.join(5)
+        self.assertFalse(writer.is_alive())
+        # Saved on start and once more on stop, without waiting for the interval
+        self.assertEqual(SenderStats.objects.get().stats, {'sent': 2})
+
+
+def update_data(update_id: int, chat_id: int, text: str) -> dict:
+    return {'update_id': update_id, 'message': message_data(update_id, chat_id, text)}
+
+
+@override_settings(TG_BOT_MODE='webhook', TG_BOT_WEBHOOK_SECRET='secret', TG_BOT_WEBHOOK_MAX_PENDING=10)
+class WebhookTestCase(TestCase):
+    def post(self, data, secret='secret'):
+        return self.client.post('/bot/webhook', data, content_type='application/json',
+                                HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret)
+
+    def test_updates_are_stored_once(self):
+        for update_id, chat_id, text in [(1, 1, 'first'), (2, 2, 'other'), (1, 1, 'first')]:
+            self.assertEqual(self.post(update_data(update_id, chat_id, text)).status_code, 200)
+        self.assertEqual(list(InboundUpdate.objects.order_by('update_id').values_list('update_id', 'chat_id')),
+                         [(1, 1), (2, 2)])
+        self.assertEqual(InboundUpdate.objects.get(update_id=1).data, update_data(1, 1, 'first'))
+
+    def test_secret_is_checked(self):
+        self.assertEqual(self.post(update_data(1, 1, 'Hi'), secret='wrong').status_code, 403)
+        self.assertEqual(self.client.post('/bot/webhook', update_data(1, 1, 'Hi'),
+                                          content_type='application/json').status_code, 403)
+        self.assertFalse(InboundUpdate.objects.exists())
+
+    def test_invalid_update(self):
+        response = self.post({'update_id': 1, 'message': {'text': 'Hi'}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('message', response.json())
+
+    @override_settings(TG_BOT_WEBHOOK_MAX_PENDING=1)
+    def test_full_inbox(self):
+        self.assertEqual(self.post(update_data(1, 1, 'Hi')).status_code, 200)
+        response = self.post(update_data(2, 1, 'Hi'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        InboundUpdate.objects.update(handled=timezone.now())
+        self.assertEqual(self.post(update_data(2, 1, 'Hi')).status_code, 200)
+
+    @override_settings(TG_BOT_MODE='polling')
+    def test_polling_mode(self):
+        self.assertEqual(self.post(update_data(1, 1, 'Hi')).status_code, 404)
+
+
+class InboxRelayTestCase(TransactionTestCase):
+    """Updates are handled in pool threads with their own connections, so the inbox has to be committed"""
+
+    def store(self, *updates: tuple[int, int, str]):
+        for update_id, chat_id, text in updates:
+            InboundUpdate.objects.create(
+                update_id=update_id, chat_id=chat_id, data=update_data(update_id, chat_id, text)
+            )
+
+    def test_updates_are_handled_in_order(self):
+        handled = []
+        relay = InboxRelay(lambda update: handled.append((update.message.chat.id, update.message.text)), workers=2)
+        self.store((3, 1, 'second'), (1, 1, 'first'), (2, 2, 'other'))
+        self.assertEqual(relay.drain(), 3)
+        self.assertTrue(relay.pool.join(5))
+        self.assertEqual([text for chat_id, text in handled if chat_id == 1], ['first', 'second'])
+        self.assertFalse(InboundUpdate.objects.filter(handled__isnull=True).exists())
+        # Handled updates are kept, so deliveries of them are still recognized
+        self.assertEqual(InboundUpdate.objects.count(), 3)
+        self.assertEqual(relay.drain(), 0)
+
+    def test_failed_update_is_not_retried(self):
+        def handle(update):
+            raise ValueError(update.message.text)
+
+        relay = InboxRelay(handle, workers=1)
+        self.store((1, 1, 'bad'))
+        with self.assertLogs('bot.tg.runtime', 'ERROR'):
+            relay.drain()
+            self.assertTrue(relay.pool.join(5))
+        self.assertIsNotNone(InboundUpdate.objects.get().handled)
+
+    def test_full_pool(self):
+        release = threading.Event()
+        handled = []
+
+        def handle(update):
+            self.assertTrue(release.wait(5))
+            handled.append(update.update_id)
+
+        relay = InboxRelay(handle, workers=1, max_pending=1)
+        self.store((1, 1, 'a'), (2, 1, 'b'))
+        with mock.patch.object(relay, 'wake') as wake:
+            self.assertEqual(relay.drain(), 1)
+            release.set()
+            self.assertTrue(relay.pool.join(5))
+            # The handled update makes room, the relay is woken for the one left behind
+            wake.assert_called_once_with()
+        self.assertEqual(relay.drain(), 1)
+        self.assertTrue(relay.pool.join(5))
+        self.assertEqual(handled, [1, 2])
+
+    def test_prune(self):
+        self.store((1, 1, 'old'), (2, 1, 'recent'), (3, 1, 'pending'))
+        now = timezone.now()
+        InboundUpdate.objects.filter(update_id=1).update(handled=now - timedelta(days=2))
+        InboundUpdate.objects.filter(update_id=2).update(handled=now)
+        InboxRelay(lambda update: None).prune()
+        self.assertEqual(list(InboundUpdate.objects.order_by('update_id').values_list('update_id', flat=True)), [2, 3])
+
+
+class UpdatePoolTestCase(SimpleTestCase):
+    @mock.patch('bot.tg.runtime.close_old_connections')
+    def test_chat_is_handled_in_order(self, close_old_connections):
+        release = threading.Event()
+        handled = []
+
+        def handle(update):
+            if update.message.text == 'first':
+                # Chat 2 goes on while chat 1 is busy
+                self.assertTrue(release.wait(5))
+            handled.append(update.message.text)
+            if update.message.chat.id == 2:
+                release.set()
+
+        pool = UpdatePool(handle, workers=2)
+        for update in make_updates((1, 1, 'first'), (2, 1, 'second'), (3, 2, 'other')).result:
+            self.assertTrue(pool.submit(update))
+        self.assertTrue(pool.join(5))
+        self.assertEqual(handled, ['other', 'first', 'second'])
+
+    @mock.patch('bot.tg.runtime.close_old_connections')
+    def test_failed_update_does_not_stop_chat(self, close_old_connections):
+        handled = []
+
+        def handle(update):
+            if update.message.text == 'bad':
+                raise ValueError(update.message.text)
+            handled.append(update.message.text)
+
+        pool = UpdatePool(handle, workers=1)
+        with self.assertLogs('bot.tg.runtime', 'ERROR'):
+            for update in make_updates((1, 1, 'bad'), (2, 1, 'good')).result:
+                pool.submit(update)
+            self.assertTrue(pool.join(5))
+        self.assertEqual(handled, ['good'])
+
+
+class ReplayUpdatesTestCase(SimpleTestCase):
+    def test_posts_recorded_updates(self):
+        server = FakeTelegram()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        server.responses = [(200, {}), (403, {'detail': 'Forbidden'})]
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump({'ok': True, 'result': [update_data(1, 1, 'Hi'), update_data(2, 1, '/goals')]}, file)
+            file.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command('replay_updates', file.name, url=f'http://127.0.0.1:{server.server_port}/bot/webhook',
+                         secret='secret', stdout=stdout, stderr=stderr)
+        self.assertEqual([request[1] for request in server.requests], ['/bot/webhook'] * 2)
+        self.assertEqual(json.loads(server.requests[1][2])['message']['text'], '/goals')
+        self.assertEqual(server.requests[0][4]['X-Telegram-Bot-Api-Secret-Token'], 'secret')
+        self.assertIn('Posted 2 updates, 1 failed', stdout.getvalue())
+        self.assertIn('Update 2: 403', stderr.getvalue())
@@ -1,22 +1,114 @@
+import asyncio
+import logging
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from bot.tg.dc import GetUpdatesResponse, SendMessageResponse
 
+logger = logging.getLogger(__name__)
+
+
+class TgApiError(Exception):
+    def __init__(self, method: str, status: int, data: dict):
+        super().__init__(f'{method} failed with {status}: {data.get("description")}')
+        self.status = status
+        self.data = data
+
 
 class TgClient:
-    def __init__(self, token):
+    """
+    Bot API client over a pooled keep-alive session, safe to share between threads.
+
+    429 and 5xx responses are retried with exponential backoff, waiting ``retry_after`` when Telegram
+    sends it. Connection failures are retried too, unless the request may have reached Telegram and
+    isn't safe to repeat.
+    """
+    connect_timeout = 5
+    read_timeout = 15
+    max_retries = 5
+    backoff_factor = 0.5
+    max_backoff = 30
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, token, pool_size: int = 10, base_url: str = 'https://api.telegram.org'):
         self.token = token
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def get_url(self, method: str):
-        return f"https://api.telegram.org/bot{self.token}/{method}"
+        return f"{self.base_url}/bot{self.token}/{method}"
 
     def get_updates(self, offset: int = 0, timeout: int = 60) -> GetUpdatesResponse:
-        url = self.get_url('getUpdates')
-        response = requests.get(url=url, params={'offset': offset, 'timeout': timeout})
-        return GetUpdatesResponse.Schema().load(response.json())
+        # Telegram holds the long poll for ``timeout`` seconds before answering
+        data = self.request('GET', 'getUpdates', params={'offset': offset, 'timeout': timeout},
+                            read_timeout=timeout + self.read_timeout)
+        return GetUpdatesResponse.Schema().load(data)
 
     def send_message(self, chat_id: int, text: str) -> SendMessageResponse:
-        url = self.get_url('sendMessage')
-        data = {'chat_id': chat_id, 'text': text}
-        response = requests.get(url=url, json=data)
-        return SendMessageResponse.Schema().load(response.json())
+        data = self.request('POST', 'sendMessage', json={'chat_id': chat_id, 'text': text})
+        return SendMessageResponse.Schema().load(data)
+
+    def set_webhook(self, url: str, secret_token: str, max_connections: int = 40) -> dict:
+        return self.request('POST', 'setWebhook', json={
+            'url': url, 'secret_token': secret_token, 'allowed_updates': ['message'],
+            'max_connections': max_connections,
+        })
+
+    def delete_webhook(self) -> dict:
+        return self.request('POST', 'deleteWebhook')
+
+    def request(self, http_method: str, method: str, read_timeout: float | None = None, **kwargs) -> dict:
+        idempotent = http_method == 'GET'
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+                response = self.session.request(http_method, self.get_url(method), timeout=timeout, **kwargs)
+            except requests.ConnectTimeout:
+                if last_attempt:
+                    raise
+                delay = self.backoff(attempt)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt or not idempotent:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {'ok': False, 'description': response.text[:200]}
+                if response.status_code not in self.retry_statuses or last_attempt:
+                    if not data.get('ok'):
+                        raise TgApiError(method, response.status_code, data)
+                    return data
+                delay = self.retry_delay(response, data, attempt)
+            logger.warning('Telegram %s failed, retry %s in %.1fs', method, attempt + 1, delay)
+            time.sleep(delay)
+
+    def backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+
+    def retry_delay(self, response: requests.Response, data: dict, attempt: int) -> float:
+        retry_after = (data.get('parameters') or {}).get('retry_after') or response.headers.get('Retry-After')
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return self.backoff(attempt)
+
+
+class AsyncTgClient:
+    """TgClient for asyncio code, requests run in threads of the default executor"""
+
+    def __init__(self, client: TgClient):
+        self.client = client
+
+    async def get_updates(self, offset: int = 0, timeout: int = 60) -> GetUpdatesResponse:
+        return await asyncio.to_thread(self.client.get_updates, offset=offset, timeout=timeout)
+
+    async def send_message(self, chat_id: int, text: str) -> SendMessageResponse:
+        return await asyncio.to_thread(self.client.send_message, chat_id=chat_id, text=text)
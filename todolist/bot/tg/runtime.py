@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from bot.tg.client import AsyncTgClient
+from bot.tg.dc import UpdateObj
+
+logger = logging.getLogger(__name__)
+
+
+class BotRuntime:
+    """
+    Long polling loop that handles updates of different chats concurrently and updates of one chat in order.
+
+    ``handle`` is a sync callable, it runs with the ORM in a pool of ``workers`` threads. Every chat with
+    queued updates has a task of its own, so the next ``getUpdates`` call doesn't wait for a slow chat.
+    Like UpdatePool, updates are confirmed to Telegram once queued: polling pauses while ``max_pending``
+    updates are queued, and the queued ones are finished before ``run`` returns, but a crash loses them.
+    """
+
+    def __init__(self, client: AsyncTgClient, handle: Callable[[UpdateObj], None], workers: int = 8,
+                 poll_timeout: int = 60, max_pending: int = 1000):
+        self.client = client
+        self.poll_timeout = poll_timeout
+        self.max_pending = max_pending
+        self.offset = 0
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='bot-handler')
+        self.handle = sync_to_async(self._handle, thread_sensitive=False, executor=self.executor)
+        self._handler = handle
+        self._chats: dict[int, deque[UpdateObj]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._condition = asyncio.Condition()
+
+    def _handle(self, update: UpdateObj):
+        close_old_connections()
+        try:
+            self._handler(update)
+        finally:
+            close_old_connections()
+
+    async def run(self):
+        try:
+            while True:
+                await self.poll()
+        finally:
+            await self.join()
+            self.executor.shutdown(wait=False)
+
+    async def poll(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.pending < self.max_pending)
+        response = await self.client.get_updates(offset=self.offset, timeout=self.poll_timeout)
+        for update in response.result:
+            self.submit(update)
+        if response.result:
+            self.offset = response.result[-1].update_id + 1
+
+    def submit(self, update: UpdateObj):
+        self.pending += 1
+        chat_id = update.message.chat.id
+        if chat_id in self._chats:
+            # The chat is being handled, its task takes the update next
+            self._chats[chat_id].append(update)
+            return
+        self._chats[chat_id] = deque([update])
+        task = asyncio.create_task(self.handle_chat(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def join(self):
+        """Wait until every queued update has been handled"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self.pending)
+
+    async def handle_chat(self, chat_id: int):
+        updates = self._chats[chat_id]
+        while updates:
+            update = updates.popleft()
+            try:
+                await self.handle(update)
+            except Exception:
+                # A failing update must not stop the chat or the bot, it's not retried either
+                logger.exception('Telegram update %s failed', update.update_id)
+            finally:
+                async with self._condition:
+                    self.pending -= 1
+                    self._condition.notify_all()
+        del self._chats[chat_id]
+
+
+class UpdatePool:
+    """
+    Thread pool for webhook updates runbot takes from the inbox, the counterpart of BotRuntime.
+
+    Updates of different chats are handled concurrently and updates of one chat in the order they came.
+    """
+
+    def __init__(self, handle: Callable[[UpdateObj], None], workers: int = 8, max_pending: int = 1000):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='bot-webhook')
+        self.max_pending = max_pending
+        self.pending = 0
+        self._handler = handle
+        self._condition = threading.Condition()
+        self._chats: dict[int, deque[UpdateObj]] = {}
+
+    def submit(self, update: UpdateObj) -> bool:
+        """Queue the update, False when the pool is full"""
+        with self._condition:
+            if self.pending >= self.max_pending:
+                return False
+            self.pending += 1
+            chat_id = update.message.chat.id
+            if chat_id in self._chats:
+                # The chat is being handled, its thread takes the update next
+                self._chats[chat_id].append(update)
+                return True
+            self._chats[chat_id] = deque([update])
+        self.executor.submit(self._handle_chat, chat_id)
+        return True
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every queued update has been handled"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self.pending, timeout)
+
+    def _handle_chat(self, chat_id: int):
+        while True:
+            with self._condition:
+                updates = self._chats[chat_id]
+                if not updates:
+                    del self._chats[chat_id]
+                    return
+                update = updates.popleft()
+            close_old_connections()
+            try:
+                self._handler(update)
+            except Exception:
+                logger.exception('Telegram update %s failed', update.update_id)
+            finally:
+                close_old_connections()
+                with self._condition:
+                    self.pending -= 1
+                    self._condition.notify_all()
@@ -0,0 +1,228 @@
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from statistics import quantiles
+
+from bot.tg.client import TgClient
+from todolist.settings import TG_BOT_TOKEN, TG_BOT_RATE, TG_BOT_CHAT_RATE, TG_BOT_SENDERS
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_MAX_LENGTH = 4096
+MESSAGE_SEPARATOR = '\n\n'
+LATENCY_SAMPLES = 1000
+
+
+class TokenBucket:
+    """``rate`` tokens per second, at most ``capacity`` of them saved up"""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self.refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self, now: float):
+        self.refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self.refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Chat:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.messages: deque[tuple[str, float]] = deque()
+        self.busy = False
+
+
+class SendQueue:
+    """
+    Outbound messages of the bot, sent by ``workers`` threads within the Telegram limits.
+
+    A global token bucket keeps all chats under ``rate`` messages per second and a bucket per chat
+    keeps every chat under ``chat_rate``. Messages of one chat go out one at a time and in order,
+    messages waiting for the same chat are joined into one while they fit into a Telegram message.
+    ``send_message`` only queues the text, so the queue can stand in for a TgClient in handlers.
+    """
+
+    def __init__(self, client: TgClient, workers: int = 4, rate: float = 30, chat_rate: float = 1,
+                 chat_burst: float = 1, clock=time.monotonic):
+        self.client = client
+        self.workers = workers
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.clock = clock
+        self.bucket = TokenBucket(rate, max(1.0, rate / 10), clock())
+        self._chats: dict[int, _Chat] = {}
+        self._idle: OrderedDict[int, _Chat] = OrderedDict()
+        self._ready: list[tuple[float, int, int]] = []  # (not before, sequence, chat id)
+        self._sequence = 0
+        self._depth = 0
+        self._in_flight = 0
+        self._closing = False
+        self._threads: list[threading.Thread] = []
+        self._condition = threading.Condition()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {'queued': 0, 'sent': 0, 'requests': 0, 'coalesced': 0, 'failed': 0}
+
+    def start(self):
+        with self._condition:
+            if self._threads:
+                return
+            self._closing = False
+            self._threads = [
+                threading.Thread(target=self._work, name=f'bot-sender-{number}', daemon=True)
+                for number in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """Send what is queued and stop the workers"""
+        self.flush(timeout)
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued message has been sent or has failed"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._depth and not self._in_flight, timeout)
+
+    def send_message(self, chat_id: int, text: str):
+        now = self.clock()
+        with self._condition:
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _Chat(TokenBucket(self.chat_rate, self.chat_burst, now))
+            self._idle.pop(chat_id, None)
+            self._forget_idle_chats(now)
+            chat.messages.append((text, now))
+            self._depth += 1
+            self._counters['queued'] += 1
+            if len(chat.messages) == 1 and not chat.busy:
+                self._schedule(chat_id, chat, now)
+        if not self._threads:
+            self.start()
+
+    def stats(self) -> dict:
+        """Counters, queue depth and latency from queueing to delivery in seconds, for this process"""
+        with self._condition:
+            stats = {
+                **self._counters, 'depth': self._depth, 'in_flight': self._in_flight,
+                'chats': len(self._chats) - len(self._idle),
+            }
+            latencies = list(self._latencies)
+        if len(latencies) > 1:
+            cuts = quantiles(latencies, n=100)
+            stats['latency'] = {'p50': cuts[49], 'p95': cuts[94], 'max': max(latencies)}
+        else:
+            stats['latency'] = {'p50': None, 'p95': None, 'max': max(latencies, default=None)}
+        return stats
+
+    def _schedule(self, chat_id: int, chat: _Chat, now: float):
+        self._sequence += 1
+        heapq.heappush(self._ready, (now + chat.bucket.wait_time(now), self._sequence, chat_id))
+        self._condition.notify()
+
+    def _forget_idle_chats(self, now: float):
+        # Chats become idle in about the order their buckets fill up again
+        while self._idle:
+            chat_id, chat = next(iter(self._idle.items()))
+            if not chat.bucket.is_full(now):
+                break
+            del self._idle[chat_id]
+            del self._chats[chat_id]
+
+    def _take(self) -> tuple[int, list[tuple[str, float]]] | None:
+        """Wait for a chat whose turn it is and take its coalesced messages, None once stopped"""
+        with self._condition:
+            while True:
+                if self._closing:
+                    return None
+                now = self.clock()
+                if not self._ready:
+                    self._condition.wait()
+                    continue
+                wait = max(self._ready[0][0] - now, self.bucket.wait_time(now))
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                _, _, chat_id = heapq.heappop(self._ready)
+                chat = self._chats[chat_id]
+                batch = [chat.messages.popleft()]
+                length = len(batch[0][0])
+                while chat.messages and length + len(MESSAGE_SEPARATOR) + len(chat.messages[0][0]) <= \
+                        MESSAGE_MAX_LENGTH:
+                    length += len(MESSAGE_SEPARATOR) + len(chat.messages[0][0])
+                    batch.append(chat.messages.popleft())
+                self.bucket.take(now)
+                chat.bucket.take(now)
+                chat.busy = True
+                self._depth -= len(batch)
+                self._in_flight += len(batch)
+                return chat_id, batch
+
+    def _done(self, chat_id: int, batch: list[tuple[str, float]], sent: bool):
+        now = self.clock()
+        with self._condition:
+            chat = self._chats[chat_id]
+            chat.busy = False
+            self._in_flight -= len(batch)
+            self._counters['requests'] += 1
+            self._counters['coalesced'] += len(batch) - 1
+            if sent:
+                self._counters['sent'] += len(batch)
+                self._latencies.extend(now - queued for _, queued in batch)
+            else:
+                self._counters['failed'] += len(batch)
+            if chat.messages:
+                self._schedule(chat_id, chat, now)
+            else:
+                self._idle[chat_id] = chat
+            self._condition.notify_all()
+
+    def _work(self):
+        while (taken := self._take()) is not None:
+            chat_id, batch = taken
+            sent = False
+            try:
+                self.client.send_message(chat_id=chat_id, text=MESSAGE_SEPARATOR.join(text for text, _ in batch))
+                sent = True
+            except Exception:
+                logger.exception('Sending %s message(s) to chat %s failed', len(batch), chat_id)
+            finally:
+                self._done(chat_id, batch, sent)
+
+
+_queue: SendQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_send_queue() -> SendQueue:
+    """Send queue of runbot, its workers start with the first message; API processes use bot.outbox instead"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            # A connection per sender thread
+            client = TgClient(TG_BOT_TOKEN, pool_size=TG_BOT_SENDERS)
+            _queue = SendQueue(client, workers=TG_BOT_SENDERS, rate=TG_BOT_RATE, chat_rate=TG_BOT_CHAT_RATE)
+        return _queue
@@ -1,7 +1,9 @@
 from django.urls import path
 
-from bot.views import VerificationView
+from bot.views import SendQueueStatsView, VerificationView, WebhookView
 
 urlpatterns = [
     path("verify", VerificationView.as_view()),
+    path("send_stats", SendQueueStatsView.as_view()),
+    path("webhook", WebhookView.as_view()),
 ]
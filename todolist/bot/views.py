@@ -1,12 +1,20 @@
+import hmac
+
+import marshmallow
+from django.conf import settings
 from django.shortcuts import render
+from rest_framework import status
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from bot.models import TgUser
 from bot.serializers import TgUserSerializer
-from bot.tg.client import TgClient
-from todolist.settings import TG_BOT_TOKEN
+from bot.tg.dc import UpdateObj
+from bot.outbox import Outbox, outbox_stats, sender_stats
+from bot.webhook import store_update
 
 
 class VerificationView(GenericAPIView):
@@ -24,7 +32,35 @@ class VerificationView(GenericAPIView):
         instance.save(update_fields=['user'])
         serialized_instance = self.get_serializer(instance)
 
-        tg_client = TgClient(token=TG_BOT_TOKEN)
-        tg_client.send_message(chat_id=instance.tg_chat_id, text='Verification completed successfully')
+        Outbox().send_message(chat_id=instance.tg_chat_id, text='Verification completed successfully')
 
         return Response(serialized_instance.data)
+
+
+class SendQueueStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        # Messages are sent by runbot, which saves the stats of its send queue every TG_BOT_STATS_INTERVAL seconds
+        return Response({'outbox': outbox_stats(), 'sender': sender_stats()})
+
+
+class WebhookView(APIView):
+    """Updates Telegram posts in webhook mode, answered once they are stored for runbot"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        if settings.TG_BOT_MODE != 'webhook':
+            raise NotFound
+        secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not settings.TG_BOT_WEBHOOK_SECRET or not hmac.compare_digest(secret, settings.TG_BOT_WEBHOOK_SECRET):
+            raise PermissionDenied
+        try:
+            update = UpdateObj.Schema().load(request.data)
+        except marshmallow.ValidationError as error:
+            raise ValidationError(error.messages)
+        if not store_update(update, request.data, settings.TG_BOT_WEBHOOK_MAX_PENDING):
+            # Telegram delivers the update again later
+            return Response(status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+        return Response()
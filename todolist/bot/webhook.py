@@ -0,0 +1,104 @@
+import threading
+from datetime import timedelta
+from typing import Callable
+
+from django.db import connection
+from django.utils import timezone
+
+from bot.models import InboundUpdate
+from bot.relay import NotifyRelay
+from bot.tg.dc import UpdateObj
+from bot.tg.runtime import UpdatePool
+
+INBOX_CHANNEL = 'bot_inbox'
+INBOX_BATCH_SIZE = 100
+# Telegram stops delivering an update again after a day
+INBOX_KEEP = timedelta(days=1)
+INBOX_PRUNE_INTERVAL = timedelta(hours=1)
+
+
+def store_update(update: UpdateObj, data: dict, max_pending: int) -> bool:
+    """
+    Store an update posted to the webhook for runbot, False when ``max_pending`` updates are waiting already.
+
+    Telegram is answered once the update is committed, so it survives restarts of the API and of runbot.
+    An update delivered again is stored once.
+    """
+    if InboundUpdate.objects.filter(handled__isnull=True)[:max_pending].count() >= max_pending:
+        return False
+    InboundUpdate.objects.bulk_create(
+        [InboundUpdate(update_id=update.update_id, chat_id=update.message.chat.id, data=data)],
+        ignore_conflicts=True,
+    )
+    if connection.vendor == 'postgresql':
+        # Delivered on commit, wakes the inbox relay of runbot
+        with connection.cursor() as cursor:
+            cursor.execute(f'NOTIFY {INBOX_CHANNEL}')
+    return True
+
+
+class InboxRelay(NotifyRelay):
+    """
+    Hands stored updates to an UpdatePool of runbot in update_id order and marks them handled.
+
+    runbot is the only process handling updates, so updates of a chat are handled one at a time and in order,
+    and conversations are never saved by two processes at once. Updates left unhandled by a stopped or crashed
+    runbot are handled after the restart; an update whose handler failed is marked handled and not retried.
+    """
+
+    channel = INBOX_CHANNEL
+
+    def __init__(self, handle: Callable[[UpdateObj], None], workers: int = 8, max_pending: int = 1000,
+                 batch_size: int = INBOX_BATCH_SIZE):
+        super().__init__(name='bot-inbox')
+        self.handle = handle
+        self.pool = UpdatePool(self._handle, workers=workers, max_pending=max_pending)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._queued: set[int] = set()
+        self._full = False
+        self._pruned = None
+
+    def _handle(self, update: UpdateObj):
+        try:
+            self.handle(update)
+        finally:
+            try:
+                InboundUpdate.objects.filter(update_id=update.update_id).update(handled=timezone.now())
+            finally:
+                with self._lock:
+                    self._queued.discard(update.update_id)
+                    full, self._full = self._full, False
+                if full:
+                    # The last drain left updates behind for want of room in the pool
+                    self.wake()
+
+    def drain(self) -> int:
+        """Submit stored updates that are not queued yet, returns their number"""
+        self.prune()
+        submitted = 0
+        while True:
+            with self._lock:
+                queued = list(self._queued)
+            rows = list(
+                InboundUpdate.objects.filter(handled__isnull=True).exclude(update_id__in=queued)
+                .order_by('update_id').values_list('update_id', 'data')[:self.batch_size]
+            )
+            for update_id, data in rows:
+                with self._lock:
+                    self._queued.add(update_id)
+                if not self.pool.submit(UpdateObj.Schema().load(data)):
+                    with self._lock:
+                        self._queued.discard(update_id)
+                        self._full = True
+                    return submitted
+                submitted += 1
+            if len(rows) < self.batch_size:
+                return submitted
+
+    def prune(self):
+        """Forget updates handled before Telegram could deliver them again, at most once per interval"""
+        now = timezone.now()
+        if self._pruned is None or now - self._pruned > INBOX_PRUNE_INTERVAL:
+            InboundUpdate.objects.filter(handled__lt=now - INBOX_KEEP).delete()
+            self._pruned = now
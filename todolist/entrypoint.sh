@@ -9,4 +9,8 @@ if [[ $status != 0 ]]; then
   python manage.py migrate
 fi
 
+# Archive tasks run in threads of gunicorn workers and stop with them, finish the ones a restart interrupted.
+# Runners of the same task take turns, so it is safe in every container.
+python manage.py resume_archive_tasks &
+
 exec "$@"
@@ -0,0 +1,119 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from goals.models import Board, BoardParticipant, GoalCategory, Goal, GoalComment, Tombstone
+from goals.serializers import BoardListSerializer, BoardParticipantSerializer, GoalCategorySerializer, \
+    GoalSerializer, GoalCommentSerializer, TombstoneSerializer
+
+# Rows are stamped with ``updated`` before their transaction commits, so a row may show up after
+# a later one was already synced. Positions newer than this window are not trusted and re-read.
+CHANGES_OVERLAP = timedelta(seconds=5)
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 1000
+
+
+def _boards(user, scope):
+    return Board.objects.filter(id__in=scope)
+
+
+def _participants(user, scope):
+    return BoardParticipant.objects.filter(board_id__in=scope).select_related('user')
+
+
+def _categories(user, scope):
+    return GoalCategory.objects.filter(board_id__in=scope).select_related('user')
+
+
+def _goals(user, scope):
+    return Goal.objects.filter(board_id__in=scope)
+
+
+def _comments(user, scope):
+    return GoalComment.objects.filter(board_id__in=scope).select_related('user')
+
+
+def _deleted(user, scope):
+    return Tombstone.objects.filter(Q(board_id__in=scope) | Q(user=user))
+
+
+# (response key, queryset, serializer, time field), in the order clients should apply them
+CHANGE_SOURCES = [
+    ('boards', _boards, BoardListSerializer, 'updated'),
+    ('participants', _participants, BoardParticipantSerializer, 'updated'),
+    ('categories', _categories, GoalCategorySerializer, 'updated'),
+    ('goals', _goals, GoalSerializer, 'updated'),
+    ('comments', _comments, GoalCommentSerializer, 'updated'),
+    ('deleted', _deleted, TombstoneSerializer, 'deleted'),
+]
+
+
+def encode_changes_cursor(positions: dict) -> str:
+    data = {
+        key: [moment.isoformat(), pk]
+        for key, (moment, pk) in positions.items()
+    }
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+def decode_changes_cursor(cursor: str) -> dict:
+    if not cursor:
+        return {}
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        positions = {}
+        for key, source, serializer_class, field in CHANGE_SOURCES:
+            if key not in data:
+                continue
+            moment, pk = data[key]
+            moment = parse_datetime(moment)
+            if moment is None or not isinstance(pk, int):
+                raise ValueError
+            positions[key] = (moment, pk)
+    except (TypeError, ValueError, AttributeError, binascii.Error):
+        raise serializers.ValidationError({'since': ['Invalid cursor']})
+    return positions
+
+
+def get_changes(user, since: str = '', limit: int = CHANGES_DEFAULT_LIMIT, context: dict | None = None) -> dict:
+    """
+    Rows of the user's boards changed after the ``since`` cursor, up to ``limit`` rows of every kind.
+
+    The scope is the boards the user participates in now, deleted boards are only marked and stay in it.
+    Rows of a board the user left are not returned anymore: the participant tombstone stamped with the user
+    tells the client to drop the board with everything on it.
+    Rows changed within ``CHANGES_OVERLAP`` may be returned again by the next call, clients upsert them by id.
+    """
+    positions = decode_changes_cursor(since)
+    scope = BoardParticipant.objects.filter(user=user).values('board_id')
+    horizon = timezone.now() - CHANGES_OVERLAP
+
+    result = {}
+    has_more = False
+    for key, source, serializer_class, field in CHANGE_SOURCES:
+        queryset = source(user, scope).order_by(field, 'id')
+        position = positions.get(key)
+        if position is not None:
+            moment, pk = position
+            queryset = queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk}))
+
+        rows = list(queryset[:limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        has_more = has_more or more
+
+        if rows:
+            position = (getattr(rows[-1], field), rows[-1].id)
+        # A full page moves on regardless, so a burst of writes can't keep the client on the same rows
+        if not more and (position is None or position[0] > horizon):
+            position = (horizon, 0)
+        positions[key] = position
+        result[key] = serializer_class(rows, many=True, context=context).data
+
+    return {'cursor': encode_changes_cursor(positions), 'has_more': has_more, **result}
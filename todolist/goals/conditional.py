@@ -0,0 +1,86 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from goals.roles import get_board_roles
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for GET, computed with one aggregate query over the rows the view would return.
+
+    When the client's copy is still current the rows are not loaded and nothing is serialized.
+    The ETag covers the row count and max(updated) of the rows and of their ``conditional_related``
+    relations, the request path with its query string and the user with their board roles (for
+    views scoped by ``get_board_roles``), so deleted rows and lost access change it as well.
+    Last-Modified is sent by detail views only: a list can lose rows without any ``updated`` moving forward.
+    """
+    conditional_related: list[str] = []
+    conditional_board_roles = True
+    _filtered_queryset = None
+
+    def filter_queryset(self, queryset):
+        # Validators and the response share one filtered queryset: filter backends may run queries of their own
+        if self._filtered_queryset is None:
+            self._filtered_queryset = super().filter_queryset(queryset)
+        return self._filtered_queryset
+
+    def is_detail(self) -> bool:
+        return (self.lookup_url_kwarg or self.lookup_field) in self.kwargs
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.is_detail():
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_validators(self):
+        """Return ``(etag, last_modified)`` of the current GET, ``(None, None)`` when there is nothing to validate"""
+        distinct = bool(self.conditional_related)
+        aggregates = {'count': Count('pk', distinct=distinct), 'updated': Max('updated')}
+        for relation in self.conditional_related:
+            aggregates[f'{relation}_count'] = Count(f'{relation}__pk', distinct=True)
+            aggregates[f'{relation}_updated'] = Max(f'{relation}__updated')
+        try:
+            state = self.get_validator_queryset().order_by().aggregate(**aggregates)
+        except (TypeError, ValueError, ValidationError):
+            # Malformed lookup value, the regular path answers with 404
+            return None, None
+        if self.is_detail() and not state['count']:
+            return None, None
+
+        key = [
+            self.request.get_full_path(),
+            self.request.accepted_media_type,
+            self.request.user.pk,
+            sorted(get_board_roles(self.request).roles.items()) if self.conditional_board_roles else None,
+            sorted(state.items()),
+        ]
+        etag = 'W/"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()
+
+        last_modified = None
+        if self.is_detail():
+            last_modified = max(
+                (value for name, value in state.items() if name.endswith('updated') and value), default=None
+            )
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response.headers['ETag'] = etag
+            if timestamp is not None:
+                response.headers['Last-Modified'] = http_date(timestamp)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = 'goals_events'
+# Postgres rejects NOTIFY payloads over 8000 bytes
+EVENT_MAX_IDS = 500
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Events of one board for one stream, read from the stream's event loop"""
+
+    def __init__(self, board_id: int, loop: asyncio.AbstractEventLoop, queue_size: int = SUBSCRIPTION_QUEUE_SIZE):
+        self.board_id = board_id
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client gets a single reset instead of an ever growing backlog, and resyncs with goals/changes
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'reset', 'board': self.board_id})
+
+
+class EventBroker:
+    """In-process pub/sub of board events, safe to publish from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, board_id: int) -> Subscription:
+        subscription = Subscription(board_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[board_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.board_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.board_id]
+
+    def publish(self, event: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event.get('board'), ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # the stream's loop is already closed
+                self.unsubscribe(subscription)
+
+
+broker = EventBroker()
+
+
+def publish(event: dict):
+    """Deliver the event to streams of every worker: through NOTIFY on Postgres, in-process otherwise"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [EVENTS_CHANNEL, json.dumps(event, separators=(',', ':'))])
+    else:
+        broker.publish(event)
+
+
+def publish_on_commit(kind: str, action: str, board_id: int, ids):
+    """Publish a change of ``kind`` rows once the current transaction commits"""
+    ids = list(ids)
+    for start in range(0, len(ids), EVENT_MAX_IDS):
+        event = {'type': kind, 'action': action, 'board': board_id, 'ids': ids[start:start + EVENT_MAX_IDS]}
+        transaction.on_commit(lambda event=event: publish(event))
+
+
+def publish_rows_on_commit(kind: str, action: str, rows):
+    """Like publish_on_commit for ``(board_id, id)`` rows of several boards"""
+    ids_by_board = defaultdict(list)
+    for board_id, pk in rows:
+        ids_by_board[board_id].append(pk)
+    for board_id, ids in ids_by_board.items():
+        publish_on_commit(kind, action, board_id, ids)
+
+
+class NotifyListener(threading.Thread):
+    """Relays NOTIFY payloads of ``EVENTS_CHANNEL`` to the process broker, reconnecting on errors"""
+
+    poll_interval = 5
+    retry_interval = 1
+
+    def __init__(self):
+        super().__init__(name='goals-events-listener', daemon=True)
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.listen()
+                except Exception:
+                    logger.exception('Goals events listener failed, reconnecting')
+                    connections['default'].close()
+                    self.stopped.wait(self.retry_interval)
+        finally:
+            connections['default'].close()
+
+    def stop(self):
+        """Stop within ``poll_interval`` and close the connection"""
+        self.stopped.set()
+
+    def listen(self):
+        db = connections['default']
+        db.ensure_connection()
+        raw = db.connection
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN {EVENTS_CHANNEL}')
+        while not self.stopped.is_set():
+            if not select.select([raw], [], [], self.poll_interval)[0]:
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                try:
+                    broker.publish(json.loads(notify.payload))
+                except ValueError:
+                    logger.warning('Malformed goals event: %r', notify.payload)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener():
+    """Start the NOTIFY listener of this process on first use, only Postgres has one"""
+    global _listener
+    if connection.vendor != 'postgresql' or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = NotifyListener()
+            _listener.start()
+
+
+def stop_listener(timeout: float | None = None):
+    """Stop the NOTIFY listener of this process, the next stream starts a new one"""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        listener.join(timeout)
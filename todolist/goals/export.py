@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from goals.fastpath import compile_serializer
+from goals.models import Goal, GoalComment
+from goals.serializers import GoalExportSerializer, GoalCommentExportSerializer
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """One JSON document per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        return b''.join(self.render_rows(None, items))
+
+    def render_rows(self, header, rows):
+        for row in rows:
+            yield (_dumps(row) + '\n').encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """Rows of dicts as CSV with a header line, nested values are written as JSON"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = [item if isinstance(item, dict) else {'detail': item} for item in (
+            data if isinstance(data, list) else [data]
+        )]
+        header = list(items[0]) if items else []
+        return b''.join(self.render_rows(header, items))
+
+    def render_rows(self, header, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([self.cell(row.get(name)) for name in header])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    @staticmethod
+    def cell(value):
+        if value is None:
+            return ''
+        if isinstance(value, (dict, list)):
+            return _dumps(value)
+        return value
+
+
+def _chunks(iterator, size: int):
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _serialize(serializer, queryset, chunk_size: int):
+    """Chunks of serialized rows of the queryset, read with a server-side cursor where the database has one"""
+    compiled = compile_serializer(serializer)
+    if compiled is not None:
+        rows = queryset.values(*compiled.columns).iterator(chunk_size=chunk_size)
+        for chunk in _chunks(rows, chunk_size):
+            yield compiled(chunk)
+    else:
+        for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            yield type(serializer)(chunk, many=True).data
+
+
+def export_header(comments: bool = False) -> list[str]:
+    names = list(GoalExportSerializer().fields)
+    return [*names, 'comments'] if comments else names
+
+
+def export_goals(board_id: int, comments: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Serialized goals of the board in id order, with their comments when ``comments`` is set.
+
+    Categories and users are written as titles and usernames, the format goals.imports reads back.
+
+    Goals are read ``chunk_size`` at a time and comments with one query per chunk, so memory
+    does not depend on the size of the board.
+    """
+    goals = Goal.objects.filter(board_id=board_id).select_related('category', 'user').order_by('id')
+    for chunk in _serialize(GoalExportSerializer(), goals, chunk_size):
+        if comments:
+            by_goal = defaultdict(list)
+            goal_comments = GoalComment.objects.filter(
+                goal_id__in=[goal['id'] for goal in chunk]
+            ).select_related('user').order_by('goal_id', 'created', 'id')
+            for comment_chunk in _serialize(GoalCommentExportSerializer(), goal_comments, chunk_size):
+                for comment in comment_chunk:
+                    by_goal[comment['goal']].append(comment)
+            for goal in chunk:
+                goal['comments'] = by_goal[goal['id']]
+        yield from chunk
+
+
+def gzip_stream(chunks, level: int = 6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,208 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, fields as drf_fields, relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # a dependency, without it the stdlib encoder produces the same bytes, only slower
+    orjson = None
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+# Serializer fields whose representation of a database value of these model fields is the value itself
+IDENTITY_FIELDS = [
+    (drf_fields.IntegerField, (models.IntegerField, models.AutoField)),
+    (drf_fields.CharField, (models.CharField, models.TextField)),
+    (drf_fields.BooleanField, (models.BooleanField,)),
+    (relations.PrimaryKeyRelatedField, (models.ForeignKey,)),
+]
+
+
+def _overrides(field, base, name='to_representation') -> bool:
+    return getattr(type(field), name) is not getattr(base, name)
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        # DateTimeField.to_representation for aware datetimes, which is all USE_TZ databases return
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _choice_converter(field):
+    # Choices are few, so every distinct value is converted once
+    cache = {}
+
+    def convert(value):
+        try:
+            return cache[value]
+        except KeyError:
+            cache[value] = result = field.to_representation(value)
+            return result
+    return convert
+
+
+def _converter(field, model_field):
+    """Return a callable for non-None values, None when the database value is already the representation"""
+    if isinstance(field, drf_fields.ChoiceField) and not _overrides(field, drf_fields.ChoiceField):
+        return _choice_converter(field)
+    if isinstance(field, drf_fields.DateTimeField) and not _overrides(field, drf_fields.DateTimeField):
+        return _datetime_converter(field)
+    for field_class, model_field_classes in IDENTITY_FIELDS:
+        if isinstance(field, field_class) and not _overrides(field, field_class):
+            if isinstance(model_field, model_field_classes) and not getattr(field, 'pk_field', None):
+                return None
+            return field.to_representation
+    raise UnsupportedField(field)
+
+
+class CompiledSerializer:
+    """
+    Representation of ``.values()`` rows built by a function generated from a read-only serializer.
+
+    ``columns`` are the ``.values()`` names to select. Calling the instance with rows returns the
+    same list of dicts as the serializer with ``many=True`` returns for model instances.
+    """
+
+    def __init__(self, serializer: serializers.ModelSerializer):
+        self.columns = []
+        self.namespace = {}
+        expression = self.compile_serializer(serializer, serializer.Meta.model, prefix='')
+        source = f'def build(rows):\n    return [{expression} for row in rows]\n'
+        exec(compile(source, f'<compiled {type(serializer).__name__}>', 'exec'), self.namespace)
+        self.build = self.namespace['build']
+
+    def __call__(self, rows) -> list[dict]:
+        return self.build(rows)
+
+    def column(self, name: str) -> str:
+        if name not in self.columns:
+            self.columns.append(name)
+        return f'row[{name!r}]'
+
+    def compile_serializer(self, serializer, model, prefix: str) -> str:
+        entries = []
+        for field in serializer._readable_fields:
+            if len(field.source_attrs) != 1:
+                raise UnsupportedField(field)
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise UnsupportedField(field)
+            if model_field.many_to_many or model_field.one_to_many or model_field.one_to_one:
+                raise UnsupportedField(field)
+            column = f'{prefix}{field.source}'
+
+            if isinstance(field, serializers.BaseSerializer):
+                if not isinstance(field, serializers.ModelSerializer) or _overrides(field, serializers.Serializer) \
+                        or not model_field.is_relation:
+                    raise UnsupportedField(field)
+                nested = self.compile_serializer(field, model_field.related_model, prefix=f'{column}__')
+                value = f'(None if {self.column(column)} is None else {nested})'
+            elif isinstance(field, relations.SlugRelatedField) and not _overrides(field, relations.SlugRelatedField):
+                if not model_field.many_to_one:
+                    raise UnsupportedField(field)
+                slug_field = model_field.related_model._meta.get_field(field.slug_field)
+                if not isinstance(slug_field, (models.CharField, models.TextField, models.IntegerField)):
+                    raise UnsupportedField(field)
+                # A join selects the slug, a missing related row gives None like the serializer does
+                value = self.column(f'{column}__{field.slug_field}')
+            else:
+                convert = _converter(field, model_field)
+                if convert is None:
+                    value = self.column(column)
+                else:
+                    name = f'convert_{len(self.namespace)}'
+                    self.namespace[name] = convert
+                    value = f'(None if (value := {self.column(column)}) is None else {name}(value))'
+            entries.append(f'{field.field_name!r}: {value}')
+        return '{' + ', '.join(entries) + '}'
+
+
+_compiled = {}
+
+
+def compile_serializer(serializer: serializers.ModelSerializer) -> CompiledSerializer | None:
+    """Compiled form of the serializer, None when it has fields the compiler can't reproduce"""
+    key = (type(serializer), timezone.get_current_timezone_name())
+    if key not in _compiled:
+        try:
+            _compiled[key] = CompiledSerializer(serializer)
+        except UnsupportedField:
+            _compiled[key] = None
+    return _compiled[key]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output for data of dicts, lists, strings, integers, booleans and None, encoded by orjson.
+
+    Anything else, and indented or ASCII-only output, goes through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None or orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, keeping the output a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastListMixin:
+    """
+    Fast path of ``list()`` for plain JSON responses, byte for byte the same as the regular one.
+    Taken only with FAST_LIST_RESPONSES set.
+
+    Rows are read with ``.values()``, turned into dicts by the compiled serializer and encoded by
+    FastJSONRenderer. The browsable API and serializers with fields the compiler doesn't know take
+    the regular path.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = None
+        if settings.FAST_LIST_RESPONSES and type(request.accepted_renderer) is JSONRenderer:
+            compiled = compile_serializer(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        request.accepted_renderer = FastJSONRenderer()
+        queryset = self.filter_queryset(self.get_queryset())
+        # Keyset pagination reads ordering values from the rows
+        ordered_annotations = [
+            term.lstrip('-') for term in queryset.query.order_by
+            if isinstance(term, str) and term.lstrip('-') in queryset.query.annotations
+        ]
+        keys = [
+            name for name in [*(getattr(self, 'ordering_fields', None) or []), *ordered_annotations, 'id']
+            if name not in compiled.columns
+        ]
+        queryset = queryset.values(*compiled.columns, *keys)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled(page))
+        return Response(compiled(queryset))
@@ -1,9 +1,30 @@
+import operator
+import re
+from functools import reduce
+
 import django_filters
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections, models
+from django.db.models import F, Q, Value
 from django_filters import rest_framework
+from rest_framework import filters
 
 from goals.models import Goal
 
+# Text search configuration of the goals_goal.search_vector trigger
+SEARCH_CONFIG = 'russian'
+
+_trigram_available = {}
+
+
+def has_trigram(alias: str) -> bool:
+    """Whether pg_trgm is installed in the database, checked once per process"""
+    if alias not in _trigram_available:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[alias] = cursor.fetchone() is not None
+    return _trigram_available[alias]
+
 
 class GoalDateFilter(rest_framework.FilterSet):
     class Meta:
@@ -18,3 +39,63 @@ class GoalDateFilter(rest_framework.FilterSet):
     filter_overrides = {
         models.DateTimeField: {"filter_class": django_filters.IsoDateTimeFilter},
     }
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by Postgres full-text search.
+
+    Models with a ``search_vector`` column match every term as a tsquery prefix against it.
+    When that finds nothing, or the model has no vector, and pg_trgm is installed, the view's
+    ``search_trigram_fields`` match by trigram word similarity, which covers fragments and typos.
+    List only fields with a trigram index there (see migration 0011), others would be scanned.
+    Results are ranked unless the client asks for an explicit ordering, so put this backend after
+    ``OrderingFilter``. Other databases fall back to the regular ``ILIKE`` search.
+    """
+    search_vector_field = 'search_vector'
+    # Shorter phrases have no trigrams to look up in the index
+    trigram_min_length = 3
+
+    def get_trigram_fields(self, view) -> list[str]:
+        return getattr(view, 'search_trigram_fields', None) or []
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        connection = connections[queryset.db]
+        if not search_terms or connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        use_vector = any(field.name == self.search_vector_field for field in queryset.model._meta.concrete_fields)
+        phrase = ' '.join(search_terms)
+        trigram_fields = self.get_trigram_fields(view) if len(phrase) >= self.trigram_min_length else []
+        if trigram_fields and not has_trigram(queryset.db):
+            trigram_fields = []
+        if not use_vector and not trigram_fields:
+            return super().filter_queryset(request, queryset, view)
+
+        condition = rank = None
+        if use_vector:
+            lexemes = [word for term in search_terms for word in re.findall(r'\w+', term)]
+            if lexemes:
+                query = SearchQuery(
+                    ' & '.join(f'{word}:*' for word in lexemes), config=SEARCH_CONFIG, search_type='raw'
+                )
+                condition = Q(**{self.search_vector_field: query})
+                rank = SearchRank(F(self.search_vector_field), query)
+                # Trigrams only when full-text search finds nothing, one indexed EXISTS query
+                if trigram_fields and queryset.filter(condition).exists():
+                    trigram_fields = []
+        if trigram_fields:
+            condition = reduce(operator.or_, [
+                Q(**{f'{field}__trigram_word_similar': phrase}) for field in trigram_fields
+            ])
+            rank = reduce(operator.add, [TrigramWordSimilarity(phrase, field) for field in trigram_fields])
+        if condition is None:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.annotate(
+            search_rank=rank + Value(0.0, output_field=models.FloatField())
+        ).filter(condition)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
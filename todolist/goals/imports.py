@@ -0,0 +1,263 @@
+import csv
+import gzip
+import io
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import User
+from goals.events import publish
+from goals.models import Board, Goal, GoalCategory, GoalComment
+from goals.response_cache import invalidate_board_list_responses
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_ERRORS = 20
+
+# Rows keep ``created`` of the file, ``updated`` is the import time, so goals/changes reports imported rows
+GOAL_FIELDS = ['title', 'description', 'status', 'priority', 'due_date', 'created']
+COMMENT_FIELDS = ['text', 'created']
+
+
+class GoalImportError(Exception):
+    def __init__(self, errors: list[str]):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def guess_format(name: str) -> tuple[str | None, bool]:
+    """``(format, gzipped)`` of a file name like ``board-1.ndjson.gz``"""
+    gzipped = name.endswith('.gz')
+    if gzipped:
+        name = name[:-3]
+    extension = name.rpartition('.')[2].lower()
+    return (extension if extension in IMPORT_FORMATS else None), gzipped
+
+
+def _lines(file):
+    """Decoded lines of a binary file, decoding errors and damaged gzip data are reported with the line number"""
+    number = 0
+    try:
+        for number, data in enumerate(file, start=1):
+            try:
+                yield data.decode('utf-8-sig' if number == 1 else 'utf-8')
+            except UnicodeDecodeError as error:
+                raise GoalImportError([f'line {number}: not UTF-8 text: {error.reason} at byte {error.start}'])
+    except (OSError, EOFError) as error:
+        raise GoalImportError([f'line {number + 1}: unreadable file: {error}'])
+
+
+def read_records(file, fmt: str, gzipped: bool = False):
+    """``(line, record)`` pairs of a binary CSV or NDJSON file, the format of board/<pk>/export"""
+    if gzipped:
+        file = gzip.GzipFile(fileobj=file)
+    if fmt == 'csv':
+        # Strict, so broken quoting fails instead of shifting values between columns
+        reader = csv.DictReader(_lines(file), strict=True)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as error:
+            # The reader counts the lines it finished, not the one it failed on
+            raise GoalImportError([f'line {reader.line_num + 1}: invalid CSV: {error}'])
+    elif fmt == 'ndjson':
+        for line, data in enumerate(_lines(file), start=1):
+            if not data.strip():
+                continue
+            try:
+                record = json.loads(data)
+            except ValueError as error:
+                raise GoalImportError([f'line {line}: invalid JSON: {error}'])
+            if not isinstance(record, dict):
+                raise GoalImportError([f'line {line}: expected an object'])
+            yield line, record
+    else:
+        raise GoalImportError([f'unknown format {fmt!r}, expected one of {", ".join(IMPORT_FORMATS)}'])
+
+
+def _username(value) -> str | None:
+    # Exported rows carry nested users
+    if isinstance(value, dict):
+        value = value.get('username')
+    return value or None
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def insert_rows(model, rows: list[dict]) -> list[int]:
+    """
+    Insert rows of ``{field attname: value}`` and return their ids in the same order.
+
+    Postgres takes ids from the table sequence and loads the rows with COPY, other databases use bulk_create.
+    """
+    if not rows:
+        return []
+    if connection.vendor != 'postgresql':
+        return [obj.id for obj in model.objects.bulk_create([model(**row) for row in rows], batch_size=1000)]
+
+    table = model._meta.db_table
+    # Django keeps defaults out of the schema, COPY must write them
+    defaults = {
+        field.attname: field.get_default() for field in model._meta.concrete_fields
+        if field.has_default() and not field.primary_key and field.attname not in rows[0]
+    }
+    names = [*rows[0], *defaults]
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in ['id', *names])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", [table, len(rows)]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        buffer = io.StringIO()
+        for pk, row in zip(ids, rows):
+            values = [_copy_value(row.get(name, defaults.get(name))) for name in names]
+            buffer.write('\t'.join([str(pk), *values]) + '\n')
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY {connection.ops.quote_name(table)} ({columns}) FROM STDIN', buffer)
+    return ids
+
+
+class GoalImporter:
+    """
+    Loads goals with their categories and comments into a board, batch by batch in a single transaction.
+
+    Categories are matched by title and created when missing, users by username among participants
+    of the board, goals and comments without a user belong to the importing user. Per batch the importer
+    runs a fixed number of queries, so the import time grows with the number of rows only. Any invalid row
+    rolls the whole import back.
+    """
+
+    def __init__(self, board: Board, user: User, batch_size: int = IMPORT_BATCH_SIZE):
+        self.board = board
+        self.user = user
+        self.batch_size = batch_size
+        self.category_ids = {}
+        self.user_ids = {user.username: user.id}
+        self.stats = {'categories': 0, 'goals': 0, 'comments': 0}
+
+    def run(self, records) -> dict:
+        records = iter(records)
+        with transaction.atomic():
+            while batch := list(islice(records, self.batch_size)):
+                self.import_batch(batch)
+            invalidate_board_list_responses(self.board.id)
+            board_id = self.board.id
+            # Clients of the board stream reload everything instead of getting millions of ids
+            transaction.on_commit(lambda: publish({'type': 'reset', 'board': board_id}))
+        return self.stats
+
+    def import_batch(self, batch: list[tuple[int, dict]]):
+        now = timezone.now()
+        errors = []
+        goals, comments, lines = [], [], []
+        title_field = GoalCategory._meta.get_field('title')
+        for line, record in batch:
+            goal = self.clean(Goal, GOAL_FIELDS, record, line, errors, now)
+            try:
+                goal['category_id'] = title_field.clean(str(record.get('category') or '').strip(), None)
+            except ValidationError as error:
+                errors.append(f'line {line}: category: {" ".join(error.messages)}')
+            goal['user_id'] = _username(record.get('user'))
+            goals.append(goal)
+            lines.append(line)
+
+            record_comments = record.get('comments') or []
+            if isinstance(record_comments, str):
+                try:
+                    record_comments = json.loads(record_comments)
+                except ValueError:
+                    record_comments = None
+            if not isinstance(record_comments, list) or not all(isinstance(item, dict) for item in record_comments):
+                errors.append(f'line {line}: comments: Expected a list of objects.')
+                record_comments = []
+            for item in record_comments:
+                comment = self.clean(GoalComment, COMMENT_FIELDS, item, line, errors, now)
+                comment['goal_id'] = len(goals) - 1
+                comment['user_id'] = _username(item.get('user'))
+                comments.append(comment)
+
+        self.resolve_users(goals, lines, errors)
+        self.resolve_users(comments, [lines[comment['goal_id']] for comment in comments], errors)
+        if errors:
+            raise GoalImportError(errors[:IMPORT_MAX_ERRORS])
+        self.resolve_categories(goals, now)
+
+        goal_ids = insert_rows(Goal, [{**goal, 'board_id': self.board.id} for goal in goals])
+        for comment in comments:
+            comment['goal_id'] = goal_ids[comment['goal_id']]
+        insert_rows(GoalComment, [{**comment, 'board_id': self.board.id} for comment in comments])
+        self.stats['goals'] += len(goals)
+        self.stats['comments'] += len(comments)
+
+    @staticmethod
+    def clean(model, names: list[str], record: dict, line: int, errors: list[str], now) -> dict:
+        values = {}
+        for name in names:
+            field = model._meta.get_field(name)
+            value = record.get(name)
+            if value in ('', None):
+                if field.has_default() or name == 'created':
+                    continue
+                if field.null:
+                    values[name] = None
+                    continue
+            try:
+                value = field.clean(value, None)
+            except ValidationError as error:
+                errors.append(f'line {line}: {name}: {" ".join(error.messages)}')
+                continue
+            if getattr(value, 'tzinfo', False) is None:
+                value = timezone.make_aware(value)
+            values[name] = value
+        for name in names:
+            if name not in values and model._meta.get_field(name).has_default():
+                values[name] = model._meta.get_field(name).get_default()
+        values.setdefault('created', now)
+        values['updated'] = now
+        return values
+
+    def resolve_users(self, rows: list[dict], lines: list[int], errors: list[str]):
+        """Replace usernames of the rows with ids of board participants, one query for the usernames not seen before"""
+        missing = {row['user_id'] for row in rows if row['user_id'] is not None} - self.user_ids.keys()
+        if missing:
+            self.user_ids.update(
+                User.objects.filter(username__in=missing, participants__board=self.board).values_list('username', 'id')
+            )
+        for line, row in zip(lines, rows):
+            username = row['user_id']
+            if username is None:
+                row['user_id'] = self.user.id
+            elif username in self.user_ids:
+                row['user_id'] = self.user_ids[username]
+            else:
+                errors.append(f'line {line}: user: User "{username}" is not a participant of the board.')
+
+    def resolve_categories(self, goals: list[dict], now):
+        """Replace category titles of the goals with ids of live categories of the board, creating missing ones"""
+        missing = {goal['category_id'] for goal in goals} - self.category_ids.keys()
+        if missing:
+            existing = GoalCategory.objects.filter(
+                board=self.board, is_deleted=False, title__in=missing
+            ).order_by('-id').values_list('title', 'id')
+            self.category_ids.update(existing)
+            created = GoalCategory.objects.bulk_create([
+                GoalCategory(title=title, user=self.user, board=self.board, created=now, updated=now)
+                for title in sorted(missing - self.category_ids.keys())
+            ])
+            self.category_ids.update((category.title, category.id) for category in created)
+            self.stats['categories'] += len(created)
+        for goal in goals:
+            goal['category_id'] = self.category_ids[goal['category_id']]
+
+
+def import_goals(board: Board, user: User, file, fmt: str, gzipped: bool = False,
+                 batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import a CSV or NDJSON file into the board, returns the numbers of created rows"""
+    return GoalImporter(board, user, batch_size).run(read_records(file, fmt, gzipped))
@@ -0,0 +1,91 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import User
+from goals.fastpath import FastJSONRenderer, compile_serializer, orjson
+from goals.models import Board, BoardParticipant, GoalCategory, Goal
+from goals.serializers import BoardListSerializer, GoalCategorySerializer, GoalSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare the regular and the fast list serialization on generated rows, nothing is kept in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"orjson: {'installed' if orjson else 'not installed'}")
+        self.stdout.write(f"{'serializer':<24}{'rows':>8}{'regular, ms':>14}{'fast, ms':>12}{'speedup':>10}")
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-serialization', first_name='Бенчмарк')
+            self.generate(user, max(options['rows']))
+            for rows in sorted(options['rows']):
+                for serializer_class, queryset in [
+                    (BoardListSerializer, Board.objects.filter(participants__user=user)),
+                    (GoalCategorySerializer, GoalCategory.objects.filter(user=user).select_related('user')),
+                    (GoalSerializer, Goal.objects.filter(user=user)),
+                ]:
+                    self.compare(serializer_class, queryset.order_by('id')[:rows], rows, options['repeat'])
+            transaction.set_rollback(True)
+
+    def generate(self, user, rows: int):
+        now = timezone.now()
+        boards = Board.objects.bulk_create(
+            [Board(title=f'Benchmark board {i}', created=now, updated=now) for i in range(rows)]
+        )
+        BoardParticipant.objects.bulk_create(
+            [BoardParticipant(board=board, user=user, created=now, updated=now) for board in boards]
+        )
+        categories = GoalCategory.objects.bulk_create([
+            GoalCategory(title=f'Категория {i}', user=user, board=board, created=now, updated=now)
+            for i, board in enumerate(boards)
+        ])
+        Goal.objects.bulk_create([
+            Goal(
+                title=f'Цель {i}',
+                description='Описание цели' if i % 2 else None,
+                category=category,
+                board_id=category.board_id,
+                user=user,
+                status=i % 4 + 1,
+                priority=i % 4 + 1,
+                due_date=now if i % 3 else None,
+                created=now,
+                updated=now,
+            )
+            for i, category in enumerate(categories)
+        ])
+
+    def compare(self, serializer_class, queryset, rows: int, repeat: int):
+        def regular():
+            return JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+
+        compiled = compile_serializer(serializer_class())
+
+        def fast():
+            return FastJSONRenderer().render(compiled(queryset.values(*compiled.columns)))
+
+        if regular() != fast():
+            self.stderr.write(f'{serializer_class.__name__}: fast output differs from the regular one')
+        regular_time = self.measure(regular, repeat)
+        fast_time = self.measure(fast, repeat)
+        self.stdout.write(
+            f'{serializer_class.__name__:<24}{rows:>8}{regular_time * 1000:>14.1f}{fast_time * 1000:>12.1f}'
+            f'{regular_time / fast_time:>9.1f}x'
+        )
+
+    @staticmethod
+    def measure(func, repeat: int) -> float:
+        """Best of ``repeat`` runs, in seconds"""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,49 @@
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from core.models import User
+from goals.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, GoalImportError, guess_format, import_goals
+from goals.models import Board
+
+
+class Command(BaseCommand):
+    help = (
+        'Import goals with their categories and comments into a board from CSV or NDJSON, '
+        'the format of board/<pk>/export with category titles and usernames'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', type=int)
+        parser.add_argument('path', help='File to import, - for stdin, .gz files are decompressed')
+        parser.add_argument('--user', required=True, help='Username of new categories and of rows without a user')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(id=options['board_id'], is_deleted=False)
+            user = User.objects.get(username=options['user'])
+        except (Board.DoesNotExist, User.DoesNotExist) as error:
+            raise CommandError(error)
+
+        path = options['path']
+        fmt, gzipped = guess_format(path)
+        fmt = options['format'] or fmt
+        if fmt is None:
+            raise CommandError(f'Can not guess the format of {path}, use --format')
+
+        start = time.perf_counter()
+        try:
+            if path == '-':
+                stats = import_goals(board, user, sys.stdin.buffer, fmt, batch_size=options['batch_size'])
+            else:
+                with open(path, 'rb') as file:
+                    stats = import_goals(board, user, file, fmt, gzipped, batch_size=options['batch_size'])
+        except GoalImportError as error:
+            raise CommandError(f'Nothing imported:\n{error}')
+        self.stdout.write(
+            f"Imported {stats['goals']} goals, {stats['comments']} comments and {stats['categories']} new categories "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from goals.summary import rebuild_board_summary
+
+
+class Command(BaseCommand):
+    help = 'Recount goal summary of boards from their goals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_ids', nargs='*', type=int, help='Boards to rebuild, all boards by default')
+
+    def handle(self, *args, **options):
+        rows = rebuild_board_summary(options['board_ids'] or None)
+        self.stdout.write(f'Goal summary rebuilt: {rows} rows')
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from goals.tasks import ARCHIVE_CHUNK_SIZE, resume_archive_tasks
+
+
+class Command(BaseCommand):
+    help = 'Finish archive tasks of deleted boards and categories interrupted by a restart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        for task in resume_archive_tasks(chunk_size=options['chunk_size']):
+            self.stdout.write(f'Archive task #{task.id}: {task.processed}/{task.total} goals archived')
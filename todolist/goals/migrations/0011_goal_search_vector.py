@@ -0,0 +1,75 @@
+# Generated by Django 4.1.3 on 2026-10-18 14:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Keep in sync with goals.filters.SEARCH_CONFIG
+SEARCH_VECTOR_SQL = """
+CREATE OR REPLACE FUNCTION goals_goal_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON goals_goal
+    FOR EACH ROW EXECUTE FUNCTION goals_goal_search_vector_update();
+
+UPDATE goals_goal SET title = title;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS goals_goal_search_vector_trigger ON goals_goal;
+DROP FUNCTION IF EXISTS goals_goal_search_vector_update();
+"""
+
+TRIGRAM_SQL = """
+CREATE INDEX IF NOT EXISTS goal_title_trgm_idx ON goals_goal USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS category_title_trgm_idx ON goals_goalcategory USING gin (title gin_trgm_ops);
+"""
+
+DROP_TRIGRAM_SQL = """
+DROP INDEX IF EXISTS goal_title_trgm_idx;
+DROP INDEX IF EXISTS category_title_trgm_idx;
+"""
+
+
+def create_search_objects(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SEARCH_VECTOR_SQL)
+
+        # Trigram fallback is optional: managed databases don't always ship pg_trgm
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone():
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(TRIGRAM_SQL)
+
+
+def drop_search_objects(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DROP_TRIGRAM_SQL)
+        cursor.execute(DROP_SEARCH_VECTOR_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0010_goal_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='goal_search_vector_idx'),
+        ),
+        migrations.RunPython(create_search_objects, drop_search_objects),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.3 on 2026-10-18 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0011_goal_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(verbose_name='Дата последнего обновления')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'В очереди'), (2, 'Выполняется'), (3, 'Завершено'), (4, 'Ошибка')], default=1, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего целей')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано целей')),
+                ('last_goal_id', models.BigIntegerField(default=0, verbose_name='Последняя обработанная цель')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archive_tasks', to='goals.board', verbose_name='Доска')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archive_tasks', to='goals.goalcategory', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Архивация',
+                'verbose_name_plural': 'Архивации',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivetask',
+            index=models.Index(condition=models.Q(('status', 3), _negated=True), fields=['status'], name='archive_task_unfinished_idx'),
+        ),
+    ]
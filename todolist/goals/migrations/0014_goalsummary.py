@@ -0,0 +1,56 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_summary(apps, schema_editor):
+    Goal = apps.get_model('goals', 'Goal')
+    GoalSummary = apps.get_model('goals', 'GoalSummary')
+
+    rows = Goal.objects.order_by().values('board_id', 'category_id', 'status', 'priority').annotate(
+        count=models.Count('id')
+    )
+    GoalSummary.objects.bulk_create([GoalSummary(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0013_goal_board'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'К выполнению'), (2, 'В процессе'), (3, 'Выполнено'), (4, 'Архив')], verbose_name='Статус')),
+                ('priority', models.PositiveSmallIntegerField(choices=[(1, 'Низкий'), (2, 'Средний'), (3, 'Высокий'), (4, 'Критический')], verbose_name='Приоритет')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество целей')),
+            ],
+            options={
+                'verbose_name': 'Сводка по целям',
+                'verbose_name_plural': 'Сводки по целям',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(condition=models.Q(('status__in', [1, 2])), fields=['board', 'due_date'], name='goal_open_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='goalsummary',
+            name='board',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='goals.board', verbose_name='Доска'),
+        ),
+        migrations.AddField(
+            model_name='goalsummary',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='goals.goalcategory', verbose_name='Категория'),
+        ),
+        migrations.AddConstraint(
+            model_name='goalsummary',
+            constraint=models.UniqueConstraint(fields=('category', 'status', 'priority'), name='unique_goal_summary_bucket'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Keep kinds in sync with goals.models.Tombstone.Kind
+TOMBSTONE_TABLES = [
+    ('goals_goalcategory', 1, 'NULL'),
+    ('goals_goal', 2, 'NULL'),
+    ('goals_goalcomment', 3, 'NULL'),
+    ('goals_boardparticipant', 4, 'user_id'),
+]
+
+TOMBSTONE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION {table}_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO goals_tombstone (kind, object_id, board_id, user_id, deleted)
+    SELECT {kind}, id, board_id, {user}, clock_timestamp() FROM deleted_rows;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {table}_tombstone_trigger
+    AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS deleted_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {table}_tombstone();
+"""
+
+DROP_TOMBSTONE_FUNCTION_SQL = """
+DROP TRIGGER IF EXISTS {table}_tombstone_trigger ON {table};
+DROP FUNCTION IF EXISTS {table}_tombstone();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('goals', '0014_goalsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Категория'), (2, 'Цель'), (3, 'Комментарий'), (4, 'Участник')], verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор')),
+                ('deleted', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый объект',
+                'verbose_name_plural': 'Удалённые объекты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='boardparticipant',
+            index=models.Index(fields=['board', 'updated'], name='participant_board_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['board', 'updated'], name='goal_board_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalcategory',
+            index=models.Index(fields=['board', 'updated'], name='category_board_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalcomment',
+            index=models.Index(fields=['board', 'updated'], name='comment_board_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='board',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='goals.board', verbose_name='Доска'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['board', 'deleted'], name='tombstone_board_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted'], name='tombstone_user_deleted_idx'),
+        ),
+        migrations.RunSQL(
+            [TOMBSTONE_FUNCTION_SQL.format(table=table, kind=kind, user=user) for table, kind, user in TOMBSTONE_TABLES],
+            [DROP_TOMBSTONE_FUNCTION_SQL.format(table=table) for table, kind, user in TOMBSTONE_TABLES],
+        ),
+    ]
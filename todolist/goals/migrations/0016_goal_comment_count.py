@@ -0,0 +1,72 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+# Statement level, so bulk inserts and cascades update every goal once
+COMMENT_COUNTER_SQL = """
+CREATE OR REPLACE FUNCTION goals_goalcomment_added() RETURNS trigger AS $$
+BEGIN
+    UPDATE goals_goal SET
+        comment_count = goals_goal.comment_count + added.count,
+        last_comment_at = GREATEST(goals_goal.last_comment_at, added.last_created),
+        updated = clock_timestamp()
+    FROM (SELECT goal_id, count(*) AS count, max(created) AS last_created FROM new_rows GROUP BY goal_id) AS added
+    WHERE goals_goal.id = added.goal_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goalcomment_added_trigger
+    AFTER INSERT ON goals_goalcomment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goalcomment_added();
+
+CREATE OR REPLACE FUNCTION goals_goalcomment_removed() RETURNS trigger AS $$
+BEGIN
+    UPDATE goals_goal SET
+        comment_count = goals_goal.comment_count - removed.count,
+        last_comment_at = (SELECT max(created) FROM goals_goalcomment WHERE goal_id = goals_goal.id),
+        updated = clock_timestamp()
+    FROM (SELECT goal_id, count(*) AS count FROM deleted_rows GROUP BY goal_id) AS removed
+    WHERE goals_goal.id = removed.goal_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goalcomment_removed_trigger
+    AFTER DELETE ON goals_goalcomment
+    REFERENCING OLD TABLE AS deleted_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goalcomment_removed();
+
+UPDATE goals_goal SET comment_count = comments.count, last_comment_at = comments.last_created
+FROM (SELECT goal_id, count(*) AS count, max(created) AS last_created FROM goals_goalcomment GROUP BY goal_id) AS comments
+WHERE goals_goal.id = comments.goal_id;
+"""
+
+DROP_COMMENT_COUNTER_SQL = """
+DROP TRIGGER IF EXISTS goals_goalcomment_added_trigger ON goals_goalcomment;
+DROP FUNCTION IF EXISTS goals_goalcomment_added();
+DROP TRIGGER IF EXISTS goals_goalcomment_removed_trigger ON goals_goalcomment;
+DROP FUNCTION IF EXISTS goals_goalcomment_removed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0015_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='last_comment_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Дата последнего комментария'),
+        ),
+        migrations.RunSQL(COMMENT_COUNTER_SQL, DROP_COMMENT_COUNTER_SQL),
+    ]
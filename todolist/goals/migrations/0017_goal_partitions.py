@@ -0,0 +1,83 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Trade-offs of partitioning by status:
+# - the primary key becomes (id, status), ids stay unique through the shared sequence only;
+# - a status change from or to archived moves the row between partitions (a delete and an insert);
+# - nothing references goals_goal in the database anymore, comments are cascaded by Django only.
+# Keep the archived status in sync with goals.models.Goal.Status
+PARTITIONED_SQL = """
+CREATE TABLE goals_goal (LIKE goals_goal_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY LIST (status);
+-- The partition key must be part of the primary key
+ALTER TABLE goals_goal ADD CONSTRAINT goals_goal_pkey PRIMARY KEY (id, status);
+CREATE TABLE goals_goal_archived PARTITION OF goals_goal FOR VALUES IN (4);
+CREATE TABLE goals_goal_hot PARTITION OF goals_goal DEFAULT;
+"""
+
+UNPARTITIONED_SQL = """
+CREATE TABLE goals_goal (LIKE goals_goal_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+ALTER TABLE goals_goal ADD CONSTRAINT goals_goal_pkey PRIMARY KEY (id);
+"""
+
+# Moves rows, the id sequence, indexes, foreign keys and triggers of goals_goal to a table created by ``create_sql``
+REBUILD_SQL = r"""
+ALTER TABLE goals_goal RENAME TO goals_goal_old;
+ALTER TABLE goals_goal_old RENAME CONSTRAINT goals_goal_pkey TO goals_goal_old_pkey;
+{create_sql}
+INSERT INTO goals_goal SELECT * FROM goals_goal_old;
+
+CREATE SEQUENCE goals_goal_new_id_seq OWNED BY goals_goal.id;
+SELECT setval('goals_goal_new_id_seq', nextval(pg_get_serial_sequence('goals_goal_old', 'id')), false);
+ALTER TABLE goals_goal ALTER COLUMN id SET DEFAULT nextval('goals_goal_new_id_seq');
+
+DO $$
+DECLARE
+    name text;
+    definition text;
+BEGIN
+    FOR name, definition IN
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'goals_goal_old' AND indexname <> 'goals_goal_old_pkey'
+    LOOP
+        EXECUTE format('DROP INDEX %I', name);
+        EXECUTE regexp_replace(definition, ' ON (ONLY )?(\S+\.)?goals_goal_old ', ' ON \2goals_goal ');
+    END LOOP;
+    FOR name, definition IN
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'goals_goal_old'::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE goals_goal ADD CONSTRAINT %I %s', name, definition);
+    END LOOP;
+    FOR definition IN
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = 'goals_goal_old'::regclass AND NOT tgisinternal
+    LOOP
+        EXECUTE regexp_replace(definition, ' ON (\S+\.)?goals_goal_old ', ' ON \1goals_goal ');
+    END LOOP;
+END
+$$;
+
+DROP TABLE goals_goal_old;
+ALTER SEQUENCE goals_goal_new_id_seq RENAME TO goals_goal_id_seq;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0016_goal_comment_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='goalcomment',
+            name='goal',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='goals.goal', verbose_name='Цель'),
+        ),
+        migrations.RunSQL(
+            REBUILD_SQL.format(create_sql=PARTITIONED_SQL),
+            REBUILD_SQL.format(create_sql=UNPARTITIONED_SQL),
+        ),
+    ]
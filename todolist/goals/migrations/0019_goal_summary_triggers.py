@@ -0,0 +1,99 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:40
+
+from django.db import migrations
+
+# Statement level on the partitioned table, so bulk writes, cascades and status changes moving a goal
+# between partitions update each bucket once, in the transaction that changed the goals.
+# Increments are upserted in bucket order, so concurrent writers lock summary rows in the same order.
+# Decrements never insert: the category of the bucket may be in the middle of a cascade delete.
+SUMMARY_COUNTER_SQL = """
+CREATE OR REPLACE FUNCTION goals_goal_summary_added() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO goals_goalsummary (board_id, category_id, status, priority, count)
+    SELECT board_id, category_id, status, priority, count(*) FROM new_rows
+    GROUP BY board_id, category_id, status, priority
+    ORDER BY category_id, status, priority
+    ON CONFLICT (category_id, status, priority) DO UPDATE SET count = goals_goalsummary.count + EXCLUDED.count;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_summary_added_trigger
+    AFTER INSERT ON goals_goal
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goal_summary_added();
+
+CREATE OR REPLACE FUNCTION goals_goal_summary_removed() RETURNS trigger AS $$
+BEGIN
+    UPDATE goals_goalsummary SET count = goals_goalsummary.count - removed.count
+    FROM (SELECT category_id, status, priority, count(*) AS count FROM old_rows GROUP BY category_id, status, priority)
+        AS removed
+    WHERE (goals_goalsummary.category_id, goals_goalsummary.status, goals_goalsummary.priority)
+        = (removed.category_id, removed.status, removed.priority);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_summary_removed_trigger
+    AFTER DELETE ON goals_goal
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goal_summary_removed();
+
+CREATE OR REPLACE FUNCTION goals_goal_summary_changed() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO goals_goalsummary (board_id, category_id, status, priority, count)
+    SELECT board_id, category_id, status, priority, sum(delta) FROM (
+        SELECT board_id, category_id, status, priority, 1 AS delta FROM new_rows
+        UNION ALL
+        SELECT board_id, category_id, status, priority, -1 FROM old_rows
+    ) AS changes
+    GROUP BY board_id, category_id, status, priority HAVING sum(delta) > 0
+    ORDER BY category_id, status, priority
+    ON CONFLICT (category_id, status, priority) DO UPDATE SET count = goals_goalsummary.count + EXCLUDED.count;
+
+    UPDATE goals_goalsummary SET count = goals_goalsummary.count + removed.delta
+    FROM (
+        SELECT category_id, status, priority, sum(delta) AS delta FROM (
+            SELECT category_id, status, priority, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT category_id, status, priority, -1 FROM old_rows
+        ) AS changes
+        GROUP BY category_id, status, priority HAVING sum(delta) < 0
+    ) AS removed
+    WHERE (goals_goalsummary.category_id, goals_goalsummary.status, goals_goalsummary.priority)
+        = (removed.category_id, removed.status, removed.priority);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_summary_changed_trigger
+    AFTER UPDATE ON goals_goal
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goal_summary_changed();
+
+-- Counters kept by the application may have drifted
+DELETE FROM goals_goalsummary;
+INSERT INTO goals_goalsummary (board_id, category_id, status, priority, count)
+SELECT board_id, category_id, status, priority, count(*) FROM goals_goal
+GROUP BY board_id, category_id, status, priority;
+"""
+
+DROP_SUMMARY_COUNTER_SQL = """
+DROP TRIGGER IF EXISTS goals_goal_summary_added_trigger ON goals_goal;
+DROP FUNCTION IF EXISTS goals_goal_summary_added();
+DROP TRIGGER IF EXISTS goals_goal_summary_removed_trigger ON goals_goal;
+DROP FUNCTION IF EXISTS goals_goal_summary_removed();
+DROP TRIGGER IF EXISTS goals_goal_summary_changed_trigger ON goals_goal;
+DROP FUNCTION IF EXISTS goals_goal_summary_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0018_cacheversion'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SUMMARY_COUNTER_SQL, DROP_SUMMARY_COUNTER_SQL),
+    ]
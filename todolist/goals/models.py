@@ -1,3 +1,7 @@
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 
@@ -53,12 +57,26 @@ class BoardParticipant(BaseModel):
         constraints = [
             models.UniqueConstraint(fields=['board', 'user'], name='unique_user_board')
         ]
+        indexes = [
+            models.Index(fields=['user', 'role', 'board'], name='participant_user_role_idx'),
+            models.Index(fields=['board', 'updated'], name='participant_board_updated_idx'),
+        ]
 
 
 class GoalCategory(BaseModel):
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
+        indexes = [
+            # Live categories only, shaped to the list ordering
+            models.Index(
+                fields=['board', 'title'], condition=models.Q(is_deleted=False), name='category_live_board_idx'
+            ),
+            models.Index(
+                fields=['user', 'title'], condition=models.Q(is_deleted=False), name='category_live_user_idx'
+            ),
+            models.Index(fields=['board', 'updated'], name='category_board_updated_idx'),
+        ]
 
     title = models.CharField(verbose_name='Название', max_length=255)
     user = models.ForeignKey(to=User, verbose_name='Автор', on_delete=models.PROTECT)
@@ -92,6 +110,10 @@ class Goal(BaseModel):
         on_delete=models.CASCADE,
         related_name='goals',
     )
+    # Copy of category.board_id, so access filters don't join through categories
+    board = models.ForeignKey(
+        to=Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='goals', editable=False
+    )
     status = models.PositiveSmallIntegerField(
         verbose_name='Статус',
         choices=Status.choices,
@@ -104,23 +126,212 @@ class Goal(BaseModel):
     )
     due_date = models.DateTimeField(verbose_name='Дедлайн', null=True)
     user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Автор', related_name='goals')
+    # Maintained by a database trigger from title and description, see migration 0011
+    search_vector = SearchVectorField(verbose_name='Поисковый вектор', null=True, editable=False)
+    # Maintained by database triggers of comments, see migration 0016
+    comment_count = models.PositiveIntegerField(verbose_name='Количество комментариев', default=0, editable=False)
+    last_comment_at = models.DateTimeField(verbose_name='Дата последнего комментария', null=True, editable=False)
 
     class Meta:
         verbose_name = 'Цель'
         verbose_name_plural = 'Цели'
+        indexes = [
+            # GoalListView filters and default ordering, non-archived goals only
+            models.Index(
+                fields=['category', 'title', 'due_date', 'priority'],
+                condition=~models.Q(status=4),
+                name='goal_live_category_idx',
+            ),
+            models.Index(fields=['category', 'status', 'priority', 'due_date'], name='goal_category_status_idx'),
+            models.Index(
+                fields=['board', 'title', 'due_date', 'priority'],
+                condition=~models.Q(status=4),
+                name='goal_live_board_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='goal_search_vector_idx'),
+            # Overdue counts of the board summary
+            models.Index(
+                fields=['board', 'due_date'], condition=models.Q(status__in=[1, 2]), name='goal_open_due_idx'
+            ),
+            # Delta sync, see goals.changes
+            models.Index(fields=['board', 'updated'], name='goal_board_updated_idx'),
+        ]
+
+    open_statuses = (Status.to_do, Status.in_progress)
+    # Statuses of the hot partition of goals_goal, archived goals are in goals_goal_archived, see migration 0017
+    active_statuses = (Status.to_do, Status.in_progress, Status.done)
+    summary_fields = ('board_id', 'category_id', 'status', 'priority')
+    # Written by the database only, so saving a stale instance must not overwrite them
+    trigger_fields = ('search_vector', 'comment_count', 'last_comment_at')
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_board_id = instance.__dict__.get('board_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # A goal without a category fails on the NOT NULL constraint, not here
+        if self.category_id is not None:
+            self.board_id = self.category.board_id
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.trigger_fields
+            ]
+        super().save(*args, **kwargs)
+        # Moving a goal to a category of another board moves its comments too
+        loaded_board_id = getattr(self, '_loaded_board_id', None)
+        if loaded_board_id is not None and loaded_board_id != self.board_id:
+            # Stamped, so delta sync of the new board picks them up
+            self.comments.update(board_id=self.board_id, updated=self.updated)
+        self._loaded_board_id = self.board_id
+
+    @staticmethod
+    def sync_comment_boards(goal_ids):
+        """Copy board_id of the goals to their comments after a bulk category change"""
+        GoalComment.objects.filter(goal_id__in=goal_ids).update(
+            board_id=models.Subquery(Goal.objects.filter(id=models.OuterRef('goal_id')).values('board_id')[:1]),
+            updated=timezone.now(),
+        )
+
 
 class GoalComment(BaseModel):
     user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Автор', related_name='comments')
-    goal = models.ForeignKey(Goal, verbose_name='Цель', on_delete=models.CASCADE, related_name='comments')
+    # Partitioned goals have no unique id constraint to reference, comments are still cascaded by Django
+    goal = models.ForeignKey(
+        Goal, verbose_name='Цель', on_delete=models.CASCADE, related_name='comments', db_constraint=False
+    )
+    # Copy of goal.board_id, kept in sync by Goal.save
+    board = models.ForeignKey(
+        to=Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='comments', editable=False
+    )
     text = models.TextField(verbose_name='Текст')
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['goal', '-created'], name='comment_goal_created_idx'),
+            models.Index(fields=['board', 'updated'], name='comment_board_updated_idx'),
+        ]
 
     def __str__(self):
         return self.text
+
+    def save(self, *args, **kwargs):
+        if self.board_id is None:
+            self.board_id = self.goal.board_id
+        return super().save(*args, **kwargs)
+
+
+class ArchiveTask(BaseModel):
+    """Progress of archiving goals of a deleted board or category, see goals.tasks"""
+
+    class Status(models.IntegerChoices):
+        pending = 1, 'В очереди'
+        running = 2, 'Выполняется'
+        done = 3, 'Завершено'
+        failed = 4, 'Ошибка'
+
+    board = models.ForeignKey(
+        to=Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='archive_tasks'
+    )
+    category = models.ForeignKey(
+        to=GoalCategory,
+        verbose_name='Категория',
+        on_delete=models.PROTECT,
+        related_name='archive_tasks',
+        null=True,
+        blank=True,
+    )
+    status = models.PositiveSmallIntegerField(verbose_name='Статус', choices=Status.choices, default=Status.pending)
+    total = models.PositiveIntegerField(verbose_name='Всего целей', default=0)
+    processed = models.PositiveIntegerField(verbose_name='Обработано целей', default=0)
+    last_goal_id = models.BigIntegerField(verbose_name='Последняя обработанная цель', default=0)
+    error = models.TextField(verbose_name='Ошибка', blank=True, default='')
+
+    class Meta:
+        verbose_name = 'Архивация'
+        verbose_name_plural = 'Архивации'
+        indexes = [
+            models.Index(fields=['status'], condition=~models.Q(status=3), name='archive_task_unfinished_idx'),
+        ]
+
+
+class GoalSummary(models.Model):
+    """Goal counters of a board per category, status and priority, kept by triggers of goals_goal (migration 0019)"""
+
+    board = models.ForeignKey(
+        to=Board, verbose_name='Доска', on_delete=models.CASCADE, related_name='summary'
+    )
+    category = models.ForeignKey(
+        to=GoalCategory, verbose_name='Категория', on_delete=models.CASCADE, related_name='summary'
+    )
+    status = models.PositiveSmallIntegerField(verbose_name='Статус', choices=Goal.Status.choices)
+    priority = models.PositiveSmallIntegerField(verbose_name='Приоритет', choices=Goal.Priority.choices)
+    count = models.IntegerField(verbose_name='Количество целей', default=0)
+
+    class Meta:
+        verbose_name = 'Сводка по целям'
+        verbose_name_plural = 'Сводки по целям'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'status', 'priority'], name='unique_goal_summary_bucket')
+        ]
+
+
+class Tombstone(models.Model):
+    """Trace of a hard deleted row, so delta sync clients can drop it, see goals.changes"""
+
+    # Written by AFTER DELETE triggers of the tables, see migration 0015
+    class Kind(models.IntegerChoices):
+        category = 1, 'Категория'
+        goal = 2, 'Цель'
+        comment = 3, 'Комментарий'
+        participant = 4, 'Участник'
+
+    kind = models.PositiveSmallIntegerField(verbose_name='Тип', choices=Kind.choices)
+    object_id = models.BigIntegerField(verbose_name='Идентификатор')
+    board = models.ForeignKey(
+        to=Board, verbose_name='Доска', on_delete=models.CASCADE, related_name='tombstones', db_index=False
+    )
+    # Removed participant, so the user learns about the board they lost
+    user = models.ForeignKey(
+        to=User,
+        verbose_name='Пользователь',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    deleted = models.DateTimeField(verbose_name='Дата удаления', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+        indexes = [
+            models.Index(fields=['board', 'deleted'], name='tombstone_board_deleted_idx'),
+            models.Index(fields=['user', 'deleted'], name='tombstone_user_deleted_idx'),
+        ]
+
+
+class CacheVersion(models.Model):
+    """
+    Version of the cached board roles of a user, see goals.roles.
+
+    Kept in the database and changed in the transaction of the change, so caches of every process see it.
+    """
+
+    user = models.OneToOneField(
+        to=User, verbose_name='Пользователь', on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+    version = models.UUIDField(verbose_name='Версия', default=uuid.uuid4)
+
+    class Meta:
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэша'
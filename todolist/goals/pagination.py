@@ -0,0 +1,222 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import date
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset (cursor) mode.
+
+    Clients keep getting limit/offset pages by default. Passing ``cursor`` (empty for the first page)
+    switches to keyset pagination over the view ordering with ``id`` as a tie-breaker:
+    no COUNT(*) is run and deep pages cost the same as the first one.
+    """
+    cursor_query_param = 'cursor'
+    cursor_default_limit = 50
+    cursor_max_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_cursor_limit(request)
+        self.keys = self.get_keys(request, queryset, view)
+        position, self.reverse = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.get_order_by())
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_cursor_limit(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param], strict=True, cutoff=self.cursor_max_limit
+            )
+        except (KeyError, ValueError):
+            return self.cursor_default_limit
+
+    def get_keys(self, request, queryset, view):
+        """
+        Return ``(name, descending, field)`` for every ordering term, ending with ``id``.
+
+        Annotations like ``search_rank`` of FullTextSearchFilter are keys too, with their output field.
+        """
+        # Filter backends have already ordered the queryset, search ranking included
+        ordering = queryset.query.order_by
+        if not ordering and view is not None and any(
+            isinstance(backend, type) and issubclass(backend, OrderingFilter)
+            for backend in getattr(view, 'filter_backends', [])
+        ):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+        ordering = ordering or []
+
+        keys = []
+        for term in ordering:
+            if not isinstance(term, str):
+                continue
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = 'id'
+            if name in queryset.query.annotations:
+                field = queryset.query.annotations[name].output_field
+            else:
+                try:
+                    field = queryset.model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    continue
+            if name in (key[0] for key in keys):
+                continue
+            keys.append((name, term.startswith('-'), field))
+            if name == 'id':
+                break
+        if not keys or keys[-1][0] != 'id':
+            keys.append(('id', False, queryset.model._meta.pk))
+        return keys
+
+    def get_order_by(self):
+        order_by = []
+        for name, descending, field in self.keys:
+            if descending != self.reverse:
+                order_by.append(F(name).desc(nulls_first=True))
+            else:
+                order_by.append(F(name).asc(nulls_last=True))
+        return order_by
+
+    def get_position_filter(self, position) -> Q:
+        """Rows strictly after ``position`` in the current traversal order"""
+        after = Q()
+        equal = Q()
+        matched = False
+        for (name, descending, field), value in zip(self.keys, position):
+            if descending != self.reverse:
+                # DESC NULLS FIRST
+                if value is None:
+                    term = Q(**{f'{name}__isnull': False})
+                else:
+                    term = Q(**{f'{name}__lt': value})
+            else:
+                # ASC NULLS LAST
+                if value is None:
+                    term = None
+                elif field.null:
+                    term = Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+                else:
+                    term = Q(**{f'{name}__gt': value})
+
+            if term is not None:
+                after = (after | (equal & term)) if matched else equal & term
+                matched = True
+            if value is None:
+                equal &= Q(**{f'{name}__isnull': True})
+            else:
+                equal &= Q(**{name: value})
+        if not matched:
+            return Q(pk__in=[])
+        return after
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        position = []
+        for name, descending, field in self.keys:
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if isinstance(value, date):
+                value = value.isoformat()
+            position.append(value)
+        data = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(data.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position = data['p']
+            reverse = bool(data.get('r'))
+            if len(position) != len(self.keys):
+                raise ValueError
+            position = [
+                None if value is None else field.to_python(value)
+                for (name, descending, field), value in zip(self.keys, position)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_paginated_response_schema(self, schema):
+        if not self.use_cursor:
+            return super().get_paginated_response_schema(schema)
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Keyset pagination cursor, pass it empty to start keyset pagination',
+            'schema': {'type': 'string'},
+        })
+        return parameters
@@ -1,6 +1,6 @@
 from rest_framework import permissions
 
-from goals.models import BoardParticipant
+from goals.roles import get_board_roles
 
 
 class IsOwner(permissions.BasePermission):
@@ -13,33 +13,30 @@ class BoardPermissions(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if not request.user.is_authenticated:
             return False
+        roles = get_board_roles(request)
         if request.method in permissions.SAFE_METHODS:
-            return BoardParticipant.objects.filter(user=request.user, board=obj).exists()
-        return BoardParticipant.objects.filter(user=request.user, board=obj, role=BoardParticipant.Role.owner).exists()
+            return roles.is_participant(obj.id)
+        return roles.is_owner(obj.id)
 
 
 class GoalCategoryPermissions(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if not request.user.is_authenticated:
             return False
+        roles = get_board_roles(request)
         if request.method in permissions.SAFE_METHODS:
-            return BoardParticipant.objects.filter(user=request.user, board=obj.board).exists()
-        return BoardParticipant.objects.filter(user=request.user,
-                                               board=obj.board,
-                                               role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-                                               ).exists()
+            return roles.is_participant(obj.board_id)
+        return roles.can_write(obj.board_id)
 
 
 class GoalPermissions(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if not request.user.is_authenticated:
             return False
+        roles = get_board_roles(request)
         if request.method in permissions.SAFE_METHODS:
-            return BoardParticipant.objects.filter(user=request.user, board=obj.category.board).exists()
-        return BoardParticipant.objects.filter(user=request.user,
-                                               board=obj.category.board,
-                                               role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer]
-                                               ).exists()
+            return roles.is_participant(obj.board_id)
+        return roles.can_write(obj.board_id)
 
 
 class GoalCommentPermissions(permissions.BasePermission):
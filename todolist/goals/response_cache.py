@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from goals.models import BoardParticipant
+from goals.roles import get_board_roles, invalidate_board_roles
+
+RESPONSE_CACHE_ALIAS = 'list_responses'
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def invalidate_list_responses(*user_ids: int) -> None:
+    """Drop cached lists of the users, call it in the transaction that changes what they see"""
+    # Lists are cached under the cache versions of goals.roles, kept in the database for every process
+    invalidate_board_roles(*user_ids)
+
+
+def invalidate_board_list_responses(board_id: int, *user_ids: int) -> None:
+    """Drop cached lists of every participant of the board and of ``user_ids``"""
+    participant_ids = BoardParticipant.objects.filter(board_id=board_id).values_list('user_id', flat=True)
+    invalidate_list_responses(*participant_ids, *user_ids)
+
+
+def record_lookup(name: str, hit: bool) -> None:
+    with _stats_lock:
+        _stats[(name, 'hits' if hit else 'misses')] += 1
+
+
+def response_cache_stats() -> dict:
+    """Hits and misses of every cached view in this process"""
+    with _stats_lock:
+        stats = {}
+        for (name, outcome), count in _stats.items():
+            stats.setdefault(name, {'hits': 0, 'misses': 0})[outcome] = count
+    return stats
+
+
+class CachedListMixin:
+    """
+    Per-user cache of JSON list responses, keyed by the normalized query string.
+
+    Entries live ``response_cache_timeout`` seconds (the cache alias TIMEOUT by default, 0 disables the cache)
+    and are dropped on any change of boards, participants and categories the user can see, see goals.signals.
+    Keys carry the user's cache version from the database, so a change made in one process is seen by the
+    caches of all of them. A hit runs only the version query and still answers conditional requests with 304.
+    """
+    response_cache_alias = RESPONSE_CACHE_ALIAS
+    response_cache_timeout = DEFAULT_TIMEOUT
+
+    def get_response_cache_name(self) -> str:
+        return type(self).__name__
+
+    def get_response_cache_key(self, request) -> str | None:
+        if not isinstance(request.accepted_renderer, JSONRenderer) or not request.user.is_authenticated:
+            return None
+        params = sorted(request.query_params.lists())
+        digest = hashlib.sha1(repr([params, request.accepted_media_type]).encode()).hexdigest()
+        version = get_board_roles(request).version
+        return f'list_responses:{self.get_response_cache_name()}:{request.user.pk}:{version}:{digest}'
+
+    def get(self, request, *args, **kwargs):
+        key = None if self.response_cache_timeout == 0 else self.get_response_cache_key(request)
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        cache = caches[self.response_cache_alias]
+        cached = cache.get(key)
+        record_lookup(self.get_response_cache_name(), cached is not None)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content, headers={**headers, 'X-Cache': 'HIT'})
+            return get_conditional_response(request, etag=headers.get('ETag'), response=response)
+
+        response = super().get(request, *args, **kwargs)
+        response.headers['X-Cache'] = 'MISS'
+        if isinstance(response, Response) and response.status_code == 200:
+            def store(rendered):
+                headers = {name: rendered.headers[name] for name in CACHED_HEADERS if name in rendered.headers}
+                cache.set(key, (rendered.content, headers), timeout=self.response_cache_timeout)
+            response.add_post_render_callback(store)
+        return response
@@ -0,0 +1,108 @@
+import uuid
+
+from django.core.cache import caches
+
+from goals.models import BoardParticipant, CacheVersion
+
+ROLES_CACHE_ALIAS = 'board_roles'
+
+
+def get_cache_version(user_id: int) -> str:
+    """Version of the user's cached roles, roles cached under older versions are never read again"""
+    version = CacheVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    return version.hex if version else '0'
+
+
+def load_board_roles(user_id: int, version: str | None = None) -> dict[int, int]:
+    """
+    Return ``{board_id: role}`` of the user's live boards, served from the roles cache when possible.
+
+    The cache key carries the version from the database, so a local memory cache of every process
+    misses as soon as another process changes the roles.
+    """
+    if version is None:
+        version = get_cache_version(user_id)
+    cache = caches[ROLES_CACHE_ALIAS]
+    key = f'board_roles:{user_id}:{version}'
+    roles = cache.get(key)
+    if roles is None:
+        roles = dict(
+            BoardParticipant.objects.filter(
+                user_id=user_id, board__is_deleted=False
+            ).values_list('board_id', 'role')
+        )
+        cache.set(key, roles)
+    return roles
+
+
+def invalidate_board_roles(*user_ids: int) -> None:
+    """
+    Give the users new cache versions, call it in the transaction that changes their roles.
+
+    Their cached list responses are keyed by the same version, see goals.response_cache.
+    """
+    # Sorted, so concurrent transactions lock the version rows in the same order
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(user_id=user_id, version=uuid.uuid4()) for user_id in sorted(set(user_ids))],
+        update_conflicts=True, unique_fields=['user_id'], update_fields=['version'],
+    )
+
+
+def invalidate_board(board_id: int) -> None:
+    """Drop cached roles of every participant of the board"""
+    user_ids = BoardParticipant.objects.filter(board_id=board_id).values_list('user_id', flat=True)
+    invalidate_board_roles(*user_ids)
+
+
+class BoardRoles:
+    """Board roles of a single user, loaded once on first access."""
+
+    writer_roles = (BoardParticipant.Role.owner, BoardParticipant.Role.writer)
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = None
+        self._version = None
+
+    @property
+    def version(self) -> str:
+        """Cache version of the user, read once per request"""
+        if self._version is None:
+            self._version = get_cache_version(self.user.id)
+        return self._version
+
+    @property
+    def roles(self) -> dict[int, int]:
+        """Mapping of ``{board_id: role}`` for every live board the user participates in"""
+        if self._roles is None:
+            self._roles = load_board_roles(self.user.id, self.version)
+        return self._roles
+
+    @property
+    def board_ids(self) -> list[int]:
+        return list(self.roles)
+
+    @property
+    def writable_board_ids(self) -> list[int]:
+        return [board_id for board_id, role in self.roles.items() if role in self.writer_roles]
+
+    def get_role(self, board_id: int) -> int | None:
+        return self.roles.get(board_id)
+
+    def is_participant(self, board_id: int) -> bool:
+        return board_id in self.roles
+
+    def is_owner(self, board_id: int) -> bool:
+        return self.get_role(board_id) == BoardParticipant.Role.owner
+
+    def can_write(self, board_id: int) -> bool:
+        return self.get_role(board_id) in self.writer_roles
+
+
+def get_board_roles(request) -> BoardRoles:
+    """Return the roles resolver of the current request, creating it on first call"""
+    roles = getattr(request, '_board_roles', None)
+    if roles is None:
+        roles = BoardRoles(request.user)
+        request._board_roles = roles
+    return roles
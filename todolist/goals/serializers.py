@@ -1,9 +1,66 @@
 from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import smart_str
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers, exceptions
 
 from core.models import User
 from core.serializers import UserSerializer
-from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant
+from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant, ArchiveTask, Tombstone
+from goals.roles import get_board_roles, invalidate_board_roles
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that resolves values from ``context['prefetched'][field_name]``
+    when the caller loaded the related objects in bulk, instead of one query per value.
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return prefetched[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    @classmethod
+    def prefetch(cls, serializer: serializers.Serializer, items: list) -> dict:
+        """Load related objects of every prefetched field for a batch of items with one query per field"""
+        prefetched = {}
+        for name, field in serializer.fields.items():
+            if not isinstance(field, cls) or field.read_only:
+                continue
+            ids = set()
+            for item in items:
+                if not isinstance(item, dict) or isinstance(item.get(name), bool):
+                    continue
+                try:
+                    ids.add(int(item.get(name)))
+                except (TypeError, ValueError):
+                    continue
+            prefetched[name] = field.get_queryset().in_bulk(ids)
+        return prefetched
+
+
+class PrefetchedSlugRelatedField(serializers.SlugRelatedField):
+    """Slug field that resolves values from ``context['prefetched'][field_name]`` keyed by slug when present"""
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            return prefetched[data]
+        except KeyError:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=smart_str(data))
+        except TypeError:
+            self.fail('invalid')
 
 
 # Boards
@@ -24,7 +81,7 @@ class BoardCreateSerializer(serializers.ModelSerializer):
 
 class BoardParticipantSerializer(serializers.ModelSerializer):
     role = serializers.ChoiceField(required=True, choices=BoardParticipant.editable_choices)
-    user = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.all())
+    user = PrefetchedSlugRelatedField(slug_field='username', queryset=User.objects.all())
 
     class Meta:
         model = BoardParticipant
@@ -41,30 +98,75 @@ class BoardSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'created', 'updated']
 
+    def to_internal_value(self, data):
+        # Resolve all participant usernames with one query instead of one per participant
+        participants = data.get('participants') if isinstance(data, dict) else None
+        if isinstance(participants, list):
+            usernames = {
+                part['user'] for part in participants if isinstance(part, dict) and isinstance(part.get('user'), str)
+            }
+            self.context.setdefault('prefetched', {})['user'] = User.objects.in_bulk(usernames, field_name='username')
+        return super().to_internal_value(data)
+
     def update(self, instance, validated_data):
         owner = validated_data.pop('user')
-        new_participants = validated_data.pop('participants')
+        new_participants = validated_data.pop('participants', None)
         with transaction.atomic():
-            for part in new_participants:
-                new_part_ids = {part['user'].id: part}
-
-            old_participants = instance.participants.exclude(user=owner)
-
-            for old_participant in old_participants:
-                if old_participant.user_id not in new_part_ids:
-                    old_participant.delete()
-                else:
-                    if old_participant.role != new_part_ids[old_participant.user_id]['role']:
-                        old_participant.role = new_part_ids[old_participant.user_id]['role']
-                        old_participant.save()
-                    new_part_ids.pop(old_participant.user_id)
-            for new_part in new_part_ids.values():
-                BoardParticipant.objects.create(board=instance, user=new_part['user'], role=new_part['role'])
-            instance.title = validated_data['title']
+            if new_participants is not None:
+                self.sync_participants(instance, owner, new_participants)
+            if 'title' in validated_data:
+                instance.title = validated_data['title']
             instance.save()
 
         return instance
 
+    @staticmethod
+    def sync_participants(board: Board, owner: User, new_participants: list[dict]):
+        """Apply the participants diff with at most one delete, one update and one insert"""
+        new_part_ids = {part['user'].id: part for part in new_participants if part['user'].id != owner.id}
+        old_participants = {part.user_id: part for part in board.participants.exclude(user=owner)}
+
+        removed_ids = [user_id for user_id in old_participants if user_id not in new_part_ids]
+        now = timezone.now()
+        changed, created = [], []
+        for user_id, part in new_part_ids.items():
+            old_participant = old_participants.get(user_id)
+            if old_participant is None:
+                created.append(BoardParticipant(
+                    board=board, user=part['user'], role=part['role'], created=now, updated=now
+                ))
+            elif old_participant.role != part['role']:
+                old_participant.role = part['role']
+                old_participant.updated = now
+                changed.append(old_participant)
+
+        if removed_ids:
+            # post_delete signals invalidate cached roles of removed participants
+            BoardParticipant.objects.filter(board=board, user_id__in=removed_ids).delete()
+        if changed:
+            BoardParticipant.objects.bulk_update(changed, ['role', 'updated'])
+        if created:
+            BoardParticipant.objects.bulk_create(created)
+
+        # bulk writes don't send signals
+        user_ids = [part.user_id for part in changed + created]
+        if user_ids:
+            invalidate_board_roles(*user_ids)
+
+    def to_representation(self, instance):
+        # The view drops prefetched participants after an update, load them back with their users at once
+        prefetch_related_objects(
+            [instance], Prefetch('participants', queryset=BoardParticipant.objects.select_related('user'))
+        )
+        return super().to_representation(instance)
+
+
+class ArchiveTaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchiveTask
+        exclude = ['last_goal_id']
+        read_only_fields = ['id', 'created', 'updated', 'board', 'category', 'status', 'total', 'processed', 'error']
+
 
 class BoardListSerializer(serializers.ModelSerializer):
     class Meta:
@@ -84,12 +186,7 @@ class GoalCategoryCreateSerializer(serializers.ModelSerializer):
     def validate_board(self, value):
         if value.is_deleted:
             raise serializers.ValidationError("not allowed for deleted board")
-        allowed = BoardParticipant.objects.filter(
-            board=value.id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-            user=self.context["request"].user,
-        ).exists()
-        if not allowed:
+        if not get_board_roles(self.context["request"]).can_write(value.id):
             raise serializers.ValidationError("must be owner or writer of the board")
         return value
 
@@ -105,45 +202,53 @@ class GoalCategorySerializer(serializers.ModelSerializer):
 
 # Goals
 class GoalCreateSerializer(serializers.ModelSerializer):
-    category = serializers.PrimaryKeyRelatedField(
+    category = PrefetchedPrimaryKeyRelatedField(
         queryset=GoalCategory.objects.filter(is_deleted=False)
     )
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Goal
-        fields = '__all__'
-        read_only_fields = ['id', 'created', 'updated', 'user']
+        exclude = ['search_vector']
+        read_only_fields = ['id', 'created', 'updated', 'user', 'board']
 
     def validate_category(self, value):
         if value.is_deleted:
             raise serializers.ValidationError('not allowed in deleted category')
 
-        allowed = BoardParticipant.objects.filter(
-            board_id=value.board_id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-            user=self.context["request"].user,
-        ).exists()
-        if not allowed:
+        if not get_board_roles(self.context["request"]).can_write(value.board_id):
             raise serializers.ValidationError("must be owner or writer of the goal")
         return value
 
 
 class GoalSerializer(serializers.ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     class Meta:
         model = Goal
-        fields = '__all__'
-        read_only_fields = ['id', 'created', 'updated', 'user']
+        exclude = ['search_vector']
+        read_only_fields = ['id', 'created', 'updated', 'user', 'board']
 
     def validate_category(self, value):
         # if self.context['request'].user.id != value.user_id:
         #     raise exceptions.PermissionDenied
         if value.is_deleted:
             raise serializers.ValidationError('not allowed in deleted category')
-
+        if not get_board_roles(self.context["request"]).can_write(value.board_id):
+            raise serializers.ValidationError("must be owner or writer of the goal")
         return value
 
 
+class GoalExportSerializer(GoalSerializer):
+    """Goals of board/<pk>/export, with category titles and usernames the import resolves in any board"""
+    category = serializers.SlugRelatedField(slug_field='title', read_only=True)
+    user = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+
+class GoalBulkArchiveSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+
+
 # GoalComments
 class GoalCommentCreateSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -154,15 +259,10 @@ class GoalCommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = GoalComment
         fields = '__all__'
-        read_only_fields = ['id', 'created', 'updated', 'user']
+        read_only_fields = ['id', 'created', 'updated', 'user', 'board']
 
     def validate_goal(self, value):
-        allowed = BoardParticipant.objects.filter(
-            board_id=value.category.board_id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-            user=self.context["request"].user,
-        ).exists()
-        if not allowed:
+        if not get_board_roles(self.context["request"]).can_write(value.board_id):
             raise serializers.ValidationError("must be owner or writer of the goal")
         return value
 
@@ -173,4 +273,16 @@ class GoalCommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = GoalComment
         fields = '__all__'
-        read_only_fields = ['id', 'created', 'updated', 'user', 'goal']
+        read_only_fields = ['id', 'created', 'updated', 'user', 'goal', 'board']
+
+
+class GoalCommentExportSerializer(GoalCommentSerializer):
+    user = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+
+# Delta sync
+class TombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tombstone
+        fields = ['kind', 'object_id', 'board', 'user', 'deleted']
+        read_only_fields = fields
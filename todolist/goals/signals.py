@@ -0,0 +1,40 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from goals.events import publish_on_commit
+from goals.models import Board, BoardParticipant, Goal, GoalCategory, GoalComment
+from goals.response_cache import invalidate_board_list_responses
+from goals.roles import invalidate_board_roles
+
+
+@receiver([post_save, post_delete], sender=BoardParticipant)
+def participant_changed(sender, instance: BoardParticipant, **kwargs):
+    # The cache version changes with the participant, in the same transaction, and drops cached lists too
+    invalidate_board_roles(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Board)
+def board_changed(sender, instance: Board, **kwargs):
+    invalidate_board_list_responses(instance.id)
+
+
+@receiver([post_save, post_delete], sender=GoalCategory)
+def category_changed(sender, instance: GoalCategory, **kwargs):
+    invalidate_board_list_responses(instance.board_id, instance.user_id)
+
+
+EVENT_TYPES = {GoalCategory: 'category', Goal: 'goal', GoalComment: 'comment'}
+
+
+@receiver(post_save, sender=GoalCategory)
+@receiver(post_save, sender=Goal)
+@receiver(post_save, sender=GoalComment)
+def publish_saved(sender, instance, created, **kwargs):
+    publish_on_commit(EVENT_TYPES[sender], 'created' if created else 'updated', instance.board_id, [instance.id])
+
+
+@receiver(post_delete, sender=GoalCategory)
+@receiver(post_delete, sender=Goal)
+@receiver(post_delete, sender=GoalComment)
+def publish_deleted(sender, instance, **kwargs):
+    publish_on_commit(EVENT_TYPES[sender], 'deleted', instance.board_id, [instance.id])
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import re
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+
+from goals.events import broker, ensure_listener
+from goals.roles import load_board_roles
+
+STREAM_PATH = re.compile(r'^/goals/board/(?P<board_id>\d+)/stream$')
+HEARTBEAT_INTERVAL = 15
+
+
+def _with_db(func):
+    """Run ``func`` in the sync thread, closing stale connections like Django does around requests"""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+@_with_db
+def get_stream_user(scope):
+    """Authenticate the stream with the session cookie, the same way AuthenticationMiddleware does"""
+    headers = dict(scope.get('headers') or [])
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin1'))
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return get_user(request)
+
+
+@_with_db
+def can_read_board(user, board_id: int) -> bool:
+    return user.is_authenticated and board_id in load_board_roles(user.id)
+
+
+def format_event(event: dict) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n".encode()
+
+
+async def send_error(send, status: int, detail: str):
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
+
+
+async def board_stream(scope, receive, send):
+    """
+    Server-sent events with changes of goals, categories and comments of a board.
+
+    Events carry ids only, clients load the rows with goals/changes. A ``reset`` event means
+    events were dropped and the client has to resync. Access is checked again on every heartbeat.
+    """
+    if scope['method'] != 'GET':
+        return await send_error(send, 405, f"Method \"{scope['method']}\" not allowed.")
+    board_id = int(STREAM_PATH.match(scope['path']).group('board_id'))
+    user = await get_stream_user(scope)
+    if not user.is_authenticated:
+        return await send_error(send, 403, 'Authentication credentials were not provided.')
+    if not await can_read_board(user, board_id):
+        return await send_error(send, 404, 'Not found.')
+
+    ensure_listener()
+    subscription = broker.subscribe(board_id)
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnect = asyncio.ensure_future(wait_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body', 'body': format_event({'type': 'ready', 'board': board_id}), 'more_body': True
+        })
+        while True:
+            get = asyncio.ensure_future(subscription.queue.get())
+            await asyncio.wait({get, disconnect}, timeout=HEARTBEAT_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+            if disconnect.done():
+                get.cancel()
+                return
+            if get.done():
+                body = format_event(get.result())
+            else:
+                get.cancel()
+                if not await can_read_board(user, board_id):
+                    break
+                body = b': ping\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': format_event({'type': 'revoked', 'board': board_id})})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnect.cancel()
@@ -0,0 +1,92 @@
+from collections import Counter
+from typing import Iterable
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from goals.events import publish_rows_on_commit
+from goals.models import Goal, GoalCategory, GoalSummary
+
+
+def archive_goals(queryset) -> list[int]:
+    """
+    Archive goals of the queryset with a single UPDATE and publish the change.
+
+    The goals are locked first, so the published ids match the rows that were actually updated.
+    Must run inside a transaction.
+    """
+    rows = list(
+        queryset.exclude(status=Goal.Status.archived).select_for_update().order_by('id').values_list('id', 'board_id')
+    )
+    if not rows:
+        return []
+    goal_ids = [goal_id for goal_id, _ in rows]
+    Goal.objects.filter(id__in=goal_ids).update(status=Goal.Status.archived, updated=timezone.now())
+    publish_rows_on_commit('goal', 'updated', [(board_id, goal_id) for goal_id, board_id in rows])
+    return goal_ids
+
+
+def rebuild_board_summary(board_ids: Iterable[int] | None = None) -> int:
+    """
+    Recount summary rows of the boards (all boards by default) from goals, returns the number of rows.
+
+    The counters are kept by triggers of goals_goal, this only repairs them. Goal writes wait until it is done.
+    """
+    summary = GoalSummary.objects.all()
+    goals = Goal.objects.all()
+    if board_ids is not None:
+        board_ids = list(board_ids)
+        summary = summary.filter(board_id__in=board_ids)
+        goals = goals.filter(board_id__in=board_ids)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(Goal._meta.db_table)} IN SHARE MODE')
+        summary.delete()
+        rows = goals.order_by().values(*Goal.summary_fields).annotate(count=Count('id'))
+        created = GoalSummary.objects.bulk_create([GoalSummary(**row) for row in rows], batch_size=1000)
+    return len(created)
+
+
+def board_summary(board_id: int) -> dict:
+    """
+    Goal counts of a board per status, priority and category, plus open goals past their due date.
+
+    Goals of deleted categories are left out of every count, so the categories add up to the totals.
+    """
+    by_status = Counter()
+    by_priority = Counter()
+    by_category = Counter()
+    rows = GoalSummary.objects.filter(board_id=board_id, count__gt=0, category__is_deleted=False).values_list(
+        'category_id', 'status', 'priority', 'count'
+    )
+    for category_id, status, priority, count in rows:
+        by_status[status] += count
+        by_priority[priority] += count
+        by_category[category_id] += count
+
+    overdue = dict(
+        Goal.objects.filter(
+            board_id=board_id, category__is_deleted=False, status__in=Goal.open_statuses, due_date__lt=timezone.now()
+        )
+        .order_by().values_list('category_id').annotate(count=Count('id'))
+    )
+    categories = GoalCategory.objects.filter(board_id=board_id, is_deleted=False).order_by('title', 'id')
+
+    return {
+        'board': board_id,
+        'total': sum(by_status.values()),
+        'overdue': sum(overdue.values()),
+        'by_status': [{'status': status, 'count': by_status[status]} for status in Goal.Status.values],
+        'by_priority': [{'priority': priority, 'count': by_priority[priority]} for priority in Goal.Priority.values],
+        'by_category': [
+            {
+                'id': category_id,
+                'title': title,
+                'count': by_category[category_id],
+                'overdue': overdue.get(category_id, 0),
+            }
+            for category_id, title in categories.values_list('id', 'title')
+        ],
+    }
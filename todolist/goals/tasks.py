@@ -0,0 +1,101 @@
+import logging
+import threading
+
+from django.db import transaction, connections
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from goals.events import publish_on_commit
+from goals.models import ArchiveTask, Board, Goal, GoalCategory
+from goals.response_cache import invalidate_board_list_responses
+from goals.summary import archive_goals
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CHUNK_SIZE = 1000
+
+
+def task_goals(task: ArchiveTask) -> QuerySet[Goal]:
+    if task.category_id:
+        return Goal.objects.filter(category_id=task.category_id)
+    return Goal.objects.filter(board_id=task.board_id)
+
+
+def start_archive(board: Board, category: GoalCategory | None = None) -> ArchiveTask:
+    """Create an archive task and run it in background once the current transaction commits"""
+    task = ArchiveTask(board=board, category=category)
+    task.total = task_goals(task).count()
+    task.save()
+    transaction.on_commit(lambda: run_in_background(task.id))
+    return task
+
+
+def run_in_background(task_id: int):
+    """
+    Run the task in a daemon thread of the current process.
+
+    The thread dies with its gunicorn worker, tasks it leaves unfinished are picked up by
+    ``manage.py resume_archive_tasks``, which entrypoint.sh starts with every container.
+    """
+    def target():
+        try:
+            run_archive_task(task_id)
+        except Exception:
+            logger.exception('Archive task %s failed', task_id)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=target, name=f'archive-task-{task_id}', daemon=True).start()
+
+
+def run_archive_task(task_id: int, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> ArchiveTask:
+    """
+    Archive goals of the task in chunks of ``chunk_size``, one short transaction per chunk.
+
+    Progress is stored with every chunk, so an interrupted task resumes from its last goal id.
+    The task row is locked while a chunk runs, so concurrent runners of the same task take turns.
+    """
+    task = ArchiveTask.objects.get(pk=task_id)
+    if task.status == ArchiveTask.Status.done:
+        return task
+    ArchiveTask.objects.filter(pk=task_id).update(status=ArchiveTask.Status.running, updated=timezone.now())
+
+    try:
+        if task.category_id is None:
+            while _delete_categories_chunk(task, chunk_size):
+                pass
+        while True:
+            with transaction.atomic():
+                task = ArchiveTask.objects.select_for_update().get(pk=task_id)
+                goal_ids = task_goals(task).filter(id__gt=task.last_goal_id).order_by('id').values_list('id', flat=True)
+                goal_ids = list(goal_ids[:chunk_size])
+                if not goal_ids:
+                    task.status = ArchiveTask.Status.done
+                    task.save(update_fields=['status', 'updated'])
+                    return task
+                archive_goals(Goal.objects.filter(id__in=goal_ids))
+                task.last_goal_id = goal_ids[-1]
+                task.processed += len(goal_ids)
+                task.save(update_fields=['last_goal_id', 'processed', 'updated'])
+    except Exception as e:
+        ArchiveTask.objects.filter(pk=task_id).update(
+            status=ArchiveTask.Status.failed, error=str(e), updated=timezone.now()
+        )
+        raise
+
+
+def _delete_categories_chunk(task: ArchiveTask, chunk_size: int) -> bool:
+    with transaction.atomic():
+        categories = GoalCategory.objects.filter(board_id=task.board_id, is_deleted=False)
+        category_ids = list(categories.values_list('id', flat=True)[:chunk_size])
+        if category_ids:
+            GoalCategory.objects.filter(id__in=category_ids).update(is_deleted=True, updated=timezone.now())
+            publish_on_commit('category', 'updated', task.board_id, category_ids)
+            invalidate_board_list_responses(task.board_id)
+    return bool(category_ids)
+
+
+def resume_archive_tasks(chunk_size: int = ARCHIVE_CHUNK_SIZE) -> list[ArchiveTask]:
+    """Run every unfinished task to completion in the current thread"""
+    task_ids = ArchiveTask.objects.exclude(status=ArchiveTask.Status.done).order_by('id').values_list('id', flat=True)
+    return [run_archive_task(task_id, chunk_size) for task_id in task_ids]
@@ -0,0 +1,1270 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from core.models import User
+from goals import events
+from goals.export import export_goals
+from goals.fastpath import compile_serializer
+from goals.filters import has_trigram
+from goals.models import (
+    ArchiveTask, Board, BoardParticipant, CacheVersion, GoalCategory, Goal, GoalComment, GoalSummary, Tombstone,
+)
+from goals.response_cache import CachedListMixin
+from goals.roles import load_board_roles
+from goals.serializers import BoardListSerializer, GoalCategorySerializer, GoalExportSerializer, GoalSerializer
+from goals.summary import archive_goals
+from goals.tasks import resume_archive_tasks, run_archive_task
+from goals.views import GoalBulkMixin
+from todolist.asgi import application as asgi_application
+
+
+def clear_caches():
+    # Local memory caches outlive the test transactions
+    for cache in caches.all():
+        cache.clear()
+
+
+def create_user(username: str, **fields) -> User:
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='Passw0rd!', **fields)
+
+
+class BoardTestCase(APITestCase):
+    """A board with a category, ``self.user`` takes part in it with ``role`` and is authenticated"""
+    username = 'owner'
+    role = BoardParticipant.Role.owner
+    category_title = 'Category'
+
+    def setUp(self):
+        clear_caches()
+        self.user = create_user(self.username)
+        self.board = Board.objects.create(title='Board')
+        self.participant = BoardParticipant.objects.create(board=self.board, user=self.user, role=self.role)
+        self.category = GoalCategory.objects.create(title=self.category_title, user=self.user, board=self.board)
+        self.client.force_authenticate(self.user)
+
+
+class QueryCountTestCase(BoardTestCase):
+    """
+    Every goals endpoint runs a fixed number of queries regardless of how many rows it returns.
+
+    GET counts include the aggregate query of ConditionalGetMixin and, where board roles or cached lists
+    are used, the cache version query of goals.roles.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+        GoalComment.objects.create(goal=self.goal, user=self.user, text='Comment')
+        self.rows = 1
+
+    def add_rows(self, count: int = 10):
+        for i in range(self.rows, self.rows + count):
+            user = User.objects.create(username=f'user{i}', email=f'user{i}@example.com')
+            BoardParticipant.objects.create(board=self.board, user=user, role=BoardParticipant.Role.reader)
+            GoalCategory.objects.create(title=f'Category {i}', user=self.user, board=self.board)
+            goal = Goal.objects.create(title=f'Goal {i}', category=self.category, user=self.user)
+            GoalComment.objects.create(goal=self.goal, user=user, text=f'Comment {i}')
+            GoalComment.objects.create(goal=goal, user=user, text=f'Comment {i}')
+        self.rows += count
+
+    def count_queries(self, url: str) -> int:
+        caches['board_roles'].clear()
+        caches['list_responses'].clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertQueryCount(self, expected: int, url: str):
+        self.assertEqual(self.count_queries(url), expected)
+        self.add_rows()
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_board_list(self):
+        self.assertQueryCount(4, '/goals/board/list')
+
+    def test_board_list_paginated(self):
+        self.assertQueryCount(5, '/goals/board/list?limit=5')
+
+    def test_board_detail(self):
+        self.assertQueryCount(5, f'/goals/board/{self.board.id}')
+
+    def test_category_list(self):
+        self.assertQueryCount(3, '/goals/goal_category/list')
+
+    def test_category_list_paginated(self):
+        self.assertQueryCount(4, '/goals/goal_category/list?limit=5')
+
+    def test_category_detail(self):
+        self.assertQueryCount(4, f'/goals/goal_category/{self.category.id}')
+
+    def test_goal_list(self):
+        self.assertQueryCount(4, '/goals/goal/list')
+
+    def test_goal_list_paginated(self):
+        self.assertQueryCount(5, '/goals/goal/list?limit=5')
+
+    def test_goal_list_keyset(self):
+        self.assertQueryCount(4, '/goals/goal/list?limit=5&cursor=')
+
+    def test_goal_detail(self):
+        self.assertQueryCount(4, f'/goals/goal/{self.goal.id}')
+
+    def test_comment_list(self):
+        # goal filter value is validated with its own query
+        self.assertQueryCount(3, f'/goals/goal_comment/list?goal={self.goal.id}')
+
+    def test_comment_list_paginated(self):
+        self.assertQueryCount(4, f'/goals/goal_comment/list?goal={self.goal.id}&limit=5')
+
+    def test_comment_detail(self):
+        comment = GoalComment.objects.filter(goal=self.goal).first()
+        self.assertQueryCount(2, f'/goals/goal_comment/{comment.id}')
+
+    def update_board(self):
+        participants = [
+            {'user': participant.user.username, 'role': BoardParticipant.Role.writer}
+            for participant in self.board.participants.exclude(user=self.user).select_related('user')[1:]
+        ]
+        participants.append({'user': User.objects.create(username=f'new{self.rows}').username, 'role': 3})
+        caches['board_roles'].clear()
+        caches['list_responses'].clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(
+                f'/goals/board/{self.board.id}', {'title': 'Renamed', 'participants': participants}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['participants']), len(participants) + 1)
+        return len(context.captured_queries)
+
+    def test_board_update(self):
+        self.add_rows(3)
+        queries = self.update_board()
+        self.add_rows()
+        self.assertEqual(self.update_board(), queries)
+
+
+class ConditionalGetTestCase(BoardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+        self.comment = GoalComment.objects.create(goal=self.goal, user=self.user, text='Comment')
+
+    def get(self, url: str, **headers):
+        response = self.client.get(url, **headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def assertNotModified(self, url: str):
+        etag = self.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # Cache version of the roles and the aggregate
+        self.assertEqual(len(context.captured_queries), 2)
+        return etag
+
+    def assertModified(self, url: str, etag: str):
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_goal_list(self):
+        etag = self.assertNotModified('/goals/goal/list')
+        self.client.patch(f'/goals/goal/{self.goal.id}', {'title': 'Renamed'}, format='json')
+        self.assertModified('/goals/goal/list', etag)
+
+    def test_goal_list_query_string(self):
+        etag = self.get('/goals/goal/list')['ETag']
+        self.assertModified('/goals/goal/list?limit=5', etag)
+
+    def test_board_detail_participant_removed(self):
+        other = User.objects.create(username='other')
+        BoardParticipant.objects.create(board=self.board, user=other, role=BoardParticipant.Role.reader)
+        url = f'/goals/board/{self.board.id}'
+        etag = self.assertNotModified(url)
+        BoardParticipant.objects.filter(user=other).delete()
+        self.assertModified(url, etag)
+
+    def test_comment_list_comment_deleted(self):
+        GoalComment.objects.create(goal=self.goal, user=self.user, text='Second')
+        url = f'/goals/goal_comment/list?goal={self.goal.id}'
+        etag = self.get(url)['ETag']
+        self.comment.delete()
+        self.assertModified(url, etag)
+
+    def test_detail_last_modified(self):
+        url = f'/goals/goal/{self.goal.id}'
+        response = self.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_has_no_last_modified(self):
+        self.assertNotIn('Last-Modified', self.get('/goals/goal/list'))
+
+    def test_lost_access(self):
+        url = f'/goals/goal_category/{self.category.id}'
+        etag = self.get(url)['ETag']
+        BoardParticipant.objects.filter(user=self.user).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class BoardRolesCacheTestCase(BoardTestCase):
+    username = 'writer'
+    role = BoardParticipant.Role.writer
+
+    def test_cached_under_version(self):
+        self.assertEqual(load_board_roles(self.user.id), {self.board.id: BoardParticipant.Role.writer})
+        with CaptureQueriesContext(connection) as context:
+            load_board_roles(self.user.id)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('goals_cacheversion', context.captured_queries[0]['sql'])
+
+    def test_change_by_other_process(self):
+        load_board_roles(self.user.id)
+        # What another worker leaves behind: new role and version in the database, this process' cache untouched
+        BoardParticipant.objects.filter(id=self.participant.id).update(role=BoardParticipant.Role.reader)
+        CacheVersion.objects.update_or_create(user=self.user, defaults={'version': uuid.uuid4()})
+        self.assertEqual(load_board_roles(self.user.id), {self.board.id: BoardParticipant.Role.reader})
+
+    def test_removed_participant(self):
+        load_board_roles(self.user.id)
+        self.participant.delete()
+        self.assertEqual(load_board_roles(self.user.id), {})
+
+
+@mock.patch('goals.changes.CHANGES_OVERLAP', timedelta(0))
+class ChangesTestCase(BoardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+        self.comment = GoalComment.objects.create(goal=self.goal, user=self.user, text='Comment')
+
+    def changes(self, since: str = '', limit: int = 100) -> dict:
+        response = self.client.get('/goals/changes', {'since': since, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_then_incremental(self):
+        data = self.changes()
+        self.assertEqual([goal['id'] for goal in data['goals']], [self.goal.id])
+        self.assertEqual(len(data['comments']), 1)
+        self.assertFalse(data['has_more'])
+
+        data = self.changes(data['cursor'])
+        self.assertEqual(data['goals'], [])
+        self.assertEqual(data['comments'], [])
+
+        self.client.patch(f'/goals/goal/{self.goal.id}', {'status': Goal.Status.done}, format='json')
+        data = self.changes(data['cursor'])
+        self.assertEqual([goal['status'] for goal in data['goals']], [Goal.Status.done])
+        self.assertEqual(data['categories'], [])
+
+    def test_limit(self):
+        for i in range(3):
+            Goal.objects.create(title=f'Goal {i}', category=self.category, user=self.user)
+        data = self.changes(limit=3)
+        self.assertTrue(data['has_more'])
+        data = self.changes(data['cursor'], limit=3)
+        self.assertEqual(len(data['goals']), 1)
+        self.assertFalse(data['has_more'])
+
+    def test_hard_delete(self):
+        cursor = self.changes()['cursor']
+        comment_id = self.comment.id
+        self.comment.delete()
+        data = self.changes(cursor)
+        self.assertEqual(
+            [(row['kind'], row['object_id']) for row in data['deleted']], [(Tombstone.Kind.comment, comment_id)]
+        )
+
+    def test_removed_participant(self):
+        other = User.objects.create(username='other')
+        BoardParticipant.objects.create(board=self.board, user=other, role=BoardParticipant.Role.reader)
+        self.client.force_authenticate(other)
+        cursor = self.changes()['cursor']
+        BoardParticipant.objects.filter(user=other).delete()
+        data = self.changes(cursor)
+        self.assertEqual([(row['kind'], row['board']) for row in data['deleted']],
+                         [(Tombstone.Kind.participant, self.board.id)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/goals/changes', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+
+@mock.patch.object(CachedListMixin, 'response_cache_timeout', 0)
+class KeysetPaginationTestCase(BoardTestCase):
+    def create_goals(self, *titles: str) -> list[int]:
+        return [
+            Goal.objects.create(
+                title=title, category=self.category, user=self.user, priority=i % 3 + 1
+            ).id
+            for i, title in enumerate(titles)
+        ]
+
+    def walk(self, url: str, direction: str = 'next') -> tuple[list[int], str]:
+        """Ids of every page from ``url`` on and the link back from the last page"""
+        ids = []
+        while True:
+            data = self.client.get(url).json()
+            page = [goal['id'] for goal in data['results']]
+            ids = ids + page if direction == 'next' else page + ids
+            back = data['previous' if direction == 'next' else 'next']
+            url = data[direction]
+            if url is None:
+                return ids, back
+
+    def test_round_trip_over_non_unique_column(self):
+        self.create_goals(*(f'Goal {i}' for i in range(7)))
+        expected = list(Goal.objects.order_by('priority', 'id').values_list('id', flat=True))
+        ids, previous = self.walk('/goals/goal/list?ordering=priority&limit=2&cursor=')
+        self.assertEqual(ids, expected)
+        ids, _ = self.walk(previous, direction='previous')
+        self.assertEqual(ids, expected[:-1])
+
+    def test_ties_are_broken_by_id(self):
+        expected = self.create_goals(*['Same'] * 5)
+        ids, _ = self.walk('/goals/goal/list?ordering=-title&limit=2&cursor=')
+        self.assertEqual(ids, expected)
+
+    def test_search_rank_order(self):
+        self.create_goals('купить', 'купить хлеб', 'купить молоко, купить хлеб, купить всё', 'продать')
+        search = urlencode({'search': 'купить'})
+        ranked = [goal['id'] for goal in self.client.get(f'/goals/goal/list?{search}').json()]
+        self.assertEqual(len(ranked), 3)
+        self.assertNotEqual(ranked, sorted(ranked))
+        ids, _ = self.walk(f'/goals/goal/list?{search}&limit=1&cursor=')
+        self.assertEqual(ids, ranked)
+
+    def test_invalid_cursor(self):
+        self.create_goals('Goal')
+        self.assertEqual(self.client.get('/goals/goal/list?cursor=garbage').status_code, 404)
+
+
+@mock.patch.object(CachedListMixin, 'response_cache_timeout', 0)
+class GoalSearchTestCase(BoardTestCase):
+    def create_goal(self, title: str, description: str | None = None, **kwargs) -> int:
+        return Goal.objects.create(
+            title=title, description=description, category=self.category, user=self.user, **kwargs
+        ).id
+
+    def search(self, search: str, **params) -> tuple[list[int], list[str]]:
+        """Ids of the found goals and the SQL of the request"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/goals/goal/list', {'search': search, **params})
+        self.assertEqual(response.status_code, 200)
+        return [goal['id'] for goal in response.json()], [query['sql'] for query in context.captured_queries]
+
+    def assertNoTrigrams(self, queries: list[str]):
+        self.assertFalse([sql for sql in queries if 'WORD_SIMILARITY' in sql or '%>' in sql])
+
+    def test_title_outranks_description(self):
+        in_description = self.create_goal('Покупки', 'Купить молоко')
+        in_title = self.create_goal('Молоко')
+        self.create_goal('Хлеб')
+        ids, queries = self.search('молок')
+        self.assertEqual(ids, [in_title, in_description])
+        self.assertNoTrigrams(queries)
+
+    def test_trigram_fallback(self):
+        if not has_trigram('default'):
+            self.skipTest('pg_trgm is not installed')
+        in_title = self.create_goal('Починить холодильник')
+        self.create_goal('Ремонт', 'Починить холодильник')
+        ids, queries = self.search('холодильникк')
+        # Description has no trigram index, only titles are matched by similarity
+        self.assertEqual(ids, [in_title])
+        self.assertTrue([sql for sql in queries if '%>' in sql])
+
+    def test_short_phrase_skips_trigrams(self):
+        self.create_goal('Починить холодильник')
+        ids, queries = self.search('хщ')
+        self.assertEqual(ids, [])
+        self.assertNoTrigrams(queries)
+
+    def test_with_filters_and_ordering(self):
+        low = self.create_goal('Купить молоко', priority=Goal.Priority.low)
+        high = self.create_goal('Молоко купить', priority=Goal.Priority.high)
+        self.create_goal('Купить молоко', status=Goal.Status.done)
+        self.create_goal('Купить хлеб')
+        ids, _ = self.search('молоко', status=Goal.Status.to_do, ordering='-priority')
+        self.assertEqual(ids, [high, low])
+
+
+@mock.patch('goals.changes.CHANGES_OVERLAP', timedelta(0))
+class DenormalizedBoardTestCase(BoardTestCase):
+    """Goals and comments keep board_id of their category, moved comments show up in goals/changes"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_board = Board.objects.create(title='Other')
+        BoardParticipant.objects.create(board=self.other_board, user=self.user, role=BoardParticipant.Role.owner)
+        self.other_category = GoalCategory.objects.create(title='Other', user=self.user, board=self.other_board)
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+        self.comment = GoalComment.objects.create(goal=self.goal, user=self.user, text='Comment')
+
+    def assertMoved(self, cursor: str):
+        self.assertEqual(Goal.objects.get(id=self.goal.id).board_id, self.other_board.id)
+        self.assertEqual(GoalComment.objects.get(id=self.comment.id).board_id, self.other_board.id)
+        data = self.client.get('/goals/changes', {'since': cursor}).data
+        self.assertEqual([goal['id'] for goal in data['goals']], [self.goal.id])
+        self.assertEqual([comment['id'] for comment in data['comments']], [self.comment.id])
+
+    def test_created(self):
+        self.assertEqual(self.goal.board_id, self.board.id)
+        self.assertEqual(self.comment.board_id, self.board.id)
+
+    def test_move(self):
+        cursor = self.client.get('/goals/changes').data['cursor']
+        response = self.client.patch(f'/goals/goal/{self.goal.id}', {'category': self.other_category.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertMoved(cursor)
+
+    def test_bulk_move(self):
+        cursor = self.client.get('/goals/changes').data['cursor']
+        response = self.client.patch(
+            '/goals/goal/bulk_update', [{'id': self.goal.id, 'category': self.other_category.id}], format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertMoved(cursor)
+
+    def test_without_category(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Goal.objects.create(title='Orphan', category=None, user=self.user)
+
+
+class GoalSummaryTestCase(BoardTestCase):
+    """Summary counters follow every way goals are written, in the same transaction"""
+
+    def setUp(self):
+        super().setUp()
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+
+    def counts(self) -> dict:
+        return {
+            (category_id, status, priority): count
+            for category_id, status, priority, count in GoalSummary.objects.filter(count__gt=0).values_list(
+                'category_id', 'status', 'priority', 'count'
+            )
+        }
+
+    def assertCountsMatchGoals(self):
+        goals = Goal.objects.order_by().values_list('category_id', 'status', 'priority').annotate(count=Count('id'))
+        self.assertEqual(self.counts(), {(category_id, status, priority): count
+                                         for category_id, status, priority, count in goals})
+
+    def test_save_and_delete(self):
+        self.assertEqual(self.counts(), {(self.category.id, Goal.Status.to_do, Goal.Priority.medium): 1})
+        self.goal.status = Goal.Status.in_progress
+        self.goal.save()
+        self.assertEqual(self.counts(), {(self.category.id, Goal.Status.in_progress, Goal.Priority.medium): 1})
+        self.goal.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_stale_instances(self):
+        # Both copies were loaded as "to do", each save must move the goal from the bucket it is really in
+        first, second = Goal.objects.get(id=self.goal.id), Goal.objects.get(id=self.goal.id)
+        first.status = Goal.Status.done
+        first.save()
+        second.status = Goal.Status.in_progress
+        second.save()
+        self.assertEqual(self.counts(), {(self.category.id, Goal.Status.in_progress, Goal.Priority.medium): 1})
+
+    def test_bulk_writes(self):
+        other = GoalCategory.objects.create(title='Other', user=self.user, board=self.board)
+        now = timezone.now()
+        Goal.objects.bulk_create([
+            Goal(title=str(i), category=other, board=self.board, user=self.user, created=now, updated=now)
+            for i in range(3)
+        ])
+        Goal.objects.filter(category=other).update(priority=Goal.Priority.high)
+        archive_goals(Goal.objects.filter(category=self.category))
+        self.assertEqual(self.counts(), {
+            (self.category.id, Goal.Status.archived, Goal.Priority.medium): 1,
+            (other.id, Goal.Status.to_do, Goal.Priority.high): 3,
+        })
+        self.assertCountsMatchGoals()
+        other.delete()
+        self.assertCountsMatchGoals()
+
+    def test_endpoint(self):
+        self.client.patch(f'/goals/goal/{self.goal.id}', {'status': Goal.Status.done}, format='json')
+        data = self.client.get(f'/goals/board/{self.board.id}/summary').data
+        self.assertEqual(data['total'], 1)
+        self.assertIn({'status': Goal.Status.done, 'count': 1}, data['by_status'])
+        self.assertEqual(data['by_category'], [{'id': self.category.id, 'title': 'Category', 'count': 1, 'overdue': 0}])
+
+    def test_deleted_category(self):
+        deleted = GoalCategory.objects.create(title='Deleted', user=self.user, board=self.board)
+        yesterday = timezone.now() - timedelta(days=1)
+        Goal.objects.create(title='Hidden', category=deleted, user=self.user, due_date=yesterday)
+        GoalCategory.objects.filter(id=deleted.id).update(is_deleted=True)
+        Goal.objects.filter(id=self.goal.id).update(due_date=yesterday)
+        data = self.client.get(f'/goals/board/{self.board.id}/summary').data
+        self.assertEqual((data['total'], data['overdue']), (1, 1))
+        self.assertEqual(sum(row['count'] for row in data['by_status']), 1)
+        self.assertEqual(sum(row['count'] for row in data['by_category']), data['total'])
+        self.assertEqual(sum(row['overdue'] for row in data['by_category']), data['overdue'])
+
+    def test_rebuild(self):
+        GoalSummary.objects.update(count=5)
+        call_command('rebuild_board_summary', stdout=io.StringIO())
+        self.assertCountsMatchGoals()
+
+
+class GoalEventsTestCase(BoardTestCase):
+    """Events published on commit, one per board and batch of ids"""
+
+    @mock.patch('goals.events.publish')
+    def test_saved_and_deleted(self, publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            goal_id = goal.id
+            goal.delete()
+        self.assertEqual([call.args[0] for call in publish.call_args_list], [
+            {'type': 'goal', 'action': 'created', 'board': self.board.id, 'ids': [goal_id]},
+            {'type': 'goal', 'action': 'deleted', 'board': self.board.id, 'ids': [goal_id]},
+        ])
+
+    @mock.patch('goals.events.EVENT_MAX_IDS', 2)
+    @mock.patch('goals.events.publish')
+    def test_batches(self, publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/goals/goal/bulk_create', [
+                {'title': str(i), 'category': self.category.id} for i in range(3)
+            ], format='json')
+        ids = [goal['id'] for goal in response.json()]
+        self.assertEqual([call.args[0] for call in publish.call_args_list], [
+            {'type': 'goal', 'action': 'created', 'board': self.board.id, 'ids': ids[:2]},
+            {'type': 'goal', 'action': 'created', 'board': self.board.id, 'ids': ids[2:]},
+        ])
+
+    def test_wsgi_route(self):
+        response = self.client.get(f'/goals/board/{self.board.id}/stream')
+        self.assertEqual(response.status_code, 501)
+
+
+@mock.patch.object(events.NotifyListener, 'poll_interval', 0.1)
+class BoardStreamTestCase(TransactionTestCase):
+    """
+    Board streams through the ASGI application, the stream reads the database from other threads,
+    so the data has to be committed.
+    """
+
+    def setUp(self):
+        self.user = create_user('owner')
+        self.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=self.board, user=self.user, role=BoardParticipant.Role.owner)
+        self.category = GoalCategory.objects.create(title='Category', user=self.user, board=self.board)
+        self.client.login(username='owner', password='Passw0rd!')
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def tearDown(self):
+        events.stop_listener(timeout=5)
+
+    def stream(self, board_id: int, events_count: int = 0, on_ready=None, cookie: str | None = None) -> list[dict]:
+        """ASGI messages of a stream, disconnected once ``events_count`` events followed the ready event"""
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': f'/goals/board/{board_id}/stream', 'query_string': b'',
+            'headers': [(b'cookie', (self.cookie if cookie is None else cookie).encode())],
+        }
+
+        async def run():
+            messages = []
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                bodies = [message for message in messages if message['type'] == 'http.response.body']
+                if message['type'] != 'http.response.body':
+                    return
+                if len(bodies) == 1 and on_ready is not None:
+                    await on_ready()
+                if len(bodies) > events_count:
+                    disconnected.set()
+
+            await asyncio.wait_for(asgi_application(scope, receive, send), timeout=10)
+            return messages
+
+        return asyncio.run(run())
+
+    def test_access(self):
+        messages = self.stream(self.board.id, cookie='')
+        self.assertEqual(messages[0]['status'], 403)
+        other = Board.objects.create(title='Other')
+        messages = self.stream(other.id)
+        self.assertEqual(messages[0]['status'], 404)
+
+    def test_ready(self):
+        start, body = self.stream(self.board.id)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertEqual(body['body'], f'event: ready\ndata: {{"type":"ready","board":{self.board.id}}}\n\n'.encode())
+
+    def test_notify(self):
+        @sync_to_async
+        def create_goal():
+            # Committed, so the event goes through NOTIFY and the listener of this process
+            try:
+                return Goal.objects.create(title='Goal', category=self.category, user=self.user)
+            finally:
+                connections.close_all()
+
+        @sync_to_async
+        def is_listening():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT 1 FROM pg_stat_activity WHERE datname = current_database() AND query = %s",
+                        [f'LISTEN {events.EVENTS_CHANNEL}'],
+                    )
+                    return cursor.fetchone() is not None
+            finally:
+                connections.close_all()
+
+        async def on_ready():
+            # NOTIFY reaches only sessions that are already listening
+            for _ in range(100):
+                if await is_listening():
+                    break
+                await asyncio.sleep(0.05)
+            await create_goal()
+
+        messages = self.stream(self.board.id, events_count=1, on_ready=on_ready)
+        goal = Goal.objects.get()
+        self.assertEqual(
+            json.loads(messages[-1]['body'].decode().split('data: ', 1)[1]),
+            {'type': 'goal', 'action': 'created', 'board': self.board.id, 'ids': [goal.id]},
+        )
+        self.assertTrue(messages[-1]['body'].startswith(b'event: goal\n'))
+
+
+class GoalBulkTestCase(BoardTestCase):
+    username = 'writer'
+    role = BoardParticipant.Role.writer
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create(username='owner')
+        read_only = Board.objects.create(title='Read only')
+        BoardParticipant.objects.create(board=read_only, user=owner, role=BoardParticipant.Role.owner)
+        BoardParticipant.objects.create(board=read_only, user=self.user, role=BoardParticipant.Role.reader)
+        self.read_only_category = GoalCategory.objects.create(title='Other', user=owner, board=read_only)
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+        self.read_only_goal = Goal.objects.create(title='Other goal', category=self.read_only_category, user=owner)
+
+    def post(self, url: str, data):
+        return self.client.generic('PATCH' if url.endswith('update') else 'POST', f'/goals/goal/{url}',
+                                   json.dumps(data), content_type='application/json')
+
+    def test_create(self):
+        response = self.post('bulk_create', [
+            {'title': 'First', 'category': self.category.id}, {'title': 'Second', 'category': self.category.id},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([goal['title'] for goal in response.json()], ['First', 'Second'])
+        self.assertEqual(Goal.objects.filter(board=self.board, user=self.user).count(), 3)
+
+    def test_create_is_all_or_nothing(self):
+        response = self.post('bulk_create', [
+            {'title': 'Allowed', 'category': self.category.id},
+            {'title': 'Forbidden', 'category': self.read_only_category.id},
+            {'category': self.category.id},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1], {'category': ['must be owner or writer of the goal']})
+        self.assertIn('title', errors[2])
+        self.assertEqual(Goal.objects.count(), 2)
+
+    def test_batch_size(self):
+        with mock.patch.object(GoalBulkMixin, 'max_batch_size', 2):
+            response = self.post('bulk_create', [{'title': str(i), 'category': self.category.id} for i in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('no more than 2', response.json()['non_field_errors'][0])
+        self.assertEqual(self.post('bulk_create', {'title': 'Goal'}).status_code, 400)
+        response = self.post('bulk_archive', {'ids': list(range(1, 502))})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Goal.objects.count(), 2)
+
+    def test_update(self):
+        other_board = Board.objects.create(title='Other writable')
+        BoardParticipant.objects.create(board=other_board, user=self.user, role=BoardParticipant.Role.owner)
+        category = GoalCategory.objects.create(title='Moved', user=self.user, board=other_board)
+        response = self.post('bulk_update', [{'id': self.goal.id, 'title': 'Renamed', 'category': category.id}])
+        self.assertEqual(response.status_code, 200)
+        self.goal.refresh_from_db()
+        self.assertEqual((self.goal.title, self.goal.board_id), ('Renamed', other_board.id))
+
+    def test_update_is_all_or_nothing(self):
+        response = self.post('bulk_update', [
+            {'id': self.goal.id, 'title': 'Renamed'},
+            {'id': self.read_only_goal.id, 'title': 'Renamed'},
+            {'id': self.goal.id, 'title': 'Again'},
+            {'id': 0, 'title': 'Missing'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [
+            {},
+            {'id': ['must be owner or writer of the goal']},
+            {'id': ['Duplicate id.']},
+            {'id': ['Not found.']},
+        ])
+        response = self.post('bulk_update', [
+            {'id': self.goal.id, 'title': 'Renamed'}, {'id': self.goal.id + 100, 'status': 'bad'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.title, 'Goal')
+
+    def test_archive(self):
+        response = self.post('bulk_archive', {'ids': [self.goal.id, self.read_only_goal.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['ids']), [str(self.read_only_goal.id)])
+        self.assertFalse(Goal.objects.filter(status=Goal.Status.archived).exists())
+
+        response = self.post('bulk_archive', {'ids': [self.goal.id]})
+        self.assertEqual(response.json(), {'ids': [self.goal.id]})
+        self.assertEqual(Goal.objects.get(id=self.goal.id).status, Goal.Status.archived)
+        self.assertEqual(Goal.objects.get(id=self.read_only_goal.id).status, Goal.Status.to_do)
+
+
+class ArchiveTaskTestCase(BoardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goal_ids = [
+            Goal.objects.create(title=f'Goal {i}', category=self.category, user=self.user).id for i in range(5)
+        ]
+
+    def start(self) -> ArchiveTask:
+        with mock.patch('goals.tasks.run_in_background') as run_in_background:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(f'/goals/board/{self.board.id}')
+        self.assertEqual(response.status_code, 202)
+        run_in_background.assert_called_once_with(response.data['id'])
+        return ArchiveTask.objects.get(id=response.data['id'])
+
+    def test_board_destroy_returns_task(self):
+        task = self.start()
+        self.assertTrue(Board.objects.get(id=self.board.id).is_deleted)
+        data = self.client.get(f'/goals/archive_task/{task.id}').json()
+        self.assertEqual((data['status'], data['total'], data['processed']), (ArchiveTask.Status.pending, 5, 0))
+
+        run_archive_task(task.id)
+        data = self.client.get(f'/goals/archive_task/{task.id}').json()
+        self.assertEqual((data['status'], data['processed']), (ArchiveTask.Status.done, 5))
+        self.assertFalse(Goal.objects.exclude(status=Goal.Status.archived).exists())
+        self.assertTrue(GoalCategory.objects.get(id=self.category.id).is_deleted)
+
+    def test_chunks(self):
+        task = self.start()
+        with mock.patch('goals.tasks.archive_goals', side_effect=archive_goals) as chunk:
+            task = run_archive_task(task.id, chunk_size=2)
+        self.assertEqual([len(call.args[0]) for call in chunk.call_args_list], [2, 2, 1])
+        self.assertEqual(
+            (task.status, task.processed, task.last_goal_id), (ArchiveTask.Status.done, 5, self.goal_ids[-1])
+        )
+
+    def test_resume_interrupted(self):
+        task = self.start()
+        chunks = []
+
+        def interrupt_second_chunk(queryset):
+            chunks.append(queryset)
+            if len(chunks) == 2:
+                raise RuntimeError('restart')
+            return archive_goals(queryset)
+
+        with mock.patch('goals.tasks.archive_goals', side_effect=interrupt_second_chunk):
+            with self.assertRaises(RuntimeError):
+                run_archive_task(task.id, chunk_size=2)
+        task.refresh_from_db()
+        self.assertEqual(
+            (task.status, task.processed, task.last_goal_id), (ArchiveTask.Status.failed, 2, self.goal_ids[1])
+        )
+
+        with mock.patch('goals.tasks.archive_goals', side_effect=archive_goals) as chunk:
+            [task] = resume_archive_tasks(chunk_size=2)
+        # Resumed after the last archived goal
+        self.assertEqual(
+            [list(call.args[0].values_list('id', flat=True)) for call in chunk.call_args_list],
+            [self.goal_ids[2:4], self.goal_ids[4:]],
+        )
+        self.assertEqual((task.status, task.processed), (ArchiveTask.Status.done, 5))
+        self.assertEqual(resume_archive_tasks(), [])
+
+
+@mock.patch.object(CachedListMixin, 'response_cache_timeout', 0)
+@override_settings(FAST_LIST_RESPONSES=True)
+class FastListTestCase(APITestCase):
+    """The fast list path returns the same bytes as the serializers and JSONRenderer"""
+
+    urls = [
+        '/goals/board/list',
+        '/goals/board/list?limit=1&offset=1',
+        '/goals/goal_category/list',
+        '/goals/goal_category/list?ordering=-created',
+        '/goals/goal/list',
+        '/goals/goal/list?limit=2',
+        '/goals/goal/list?limit=2&cursor=&ordering=-due_date',
+        '/goals/goal/list?search=Goal',
+    ]
+
+    def setUp(self):
+        clear_caches()
+        self.user = create_user('owner', first_name='Имя')
+        for title in ['Board', 'Доска    ', 'Tab\t"quote"\\ \x01 \x1f \x7f \u2028 😀']:
+            board = Board.objects.create(title=title)
+            BoardParticipant.objects.create(board=board, user=self.user, role=BoardParticipant.Role.owner)
+            category = GoalCategory.objects.create(title=f'Category {title}', user=self.user, board=board)
+            for i, due_date in enumerate([None, timezone.now(), timezone.now().replace(microsecond=0)]):
+                Goal.objects.create(
+                    title=f'Goal {i} {title}',
+                    description=None if i else f'Описание {title}',
+                    category=category,
+                    user=self.user,
+                    due_date=due_date,
+                    status=i + 1,
+                )
+        self.client.force_authenticate(self.user)
+
+    def get_content(self, url: str) -> bytes:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assertSameContent(self, url: str):
+        fast = self.get_content(url)
+        with mock.patch('goals.fastpath.compile_serializer', return_value=None):
+            regular = self.get_content(url)
+        self.assertEqual(fast, regular)
+
+    def test_same_content(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertSameContent(url)
+
+    def test_same_content_without_orjson(self):
+        with mock.patch('goals.fastpath.orjson', None):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    self.assertSameContent(url)
+
+    @override_settings(FAST_LIST_RESPONSES=False)
+    def test_opt_in(self):
+        with mock.patch('goals.fastpath.compile_serializer') as compile_serializer:
+            self.get_content('/goals/goal/list')
+        compile_serializer.assert_not_called()
+
+    def test_compiles_list_serializers(self):
+        for serializer_class in [BoardListSerializer, GoalCategorySerializer, GoalSerializer, GoalExportSerializer]:
+            self.assertIsNotNone(compile_serializer(serializer_class()))
+
+
+class ResponseCacheTestCase(BoardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = create_user('other')
+        BoardParticipant.objects.create(board=self.board, user=self.other, role=BoardParticipant.Role.writer)
+
+    def get(self, url: str, user=None, **headers):
+        self.client.force_authenticate(user or self.user)
+        response = self.client.get(url, **headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def test_hit_runs_version_query(self):
+        self.assertEqual(self.get('/goals/board/list')['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as context:
+            response = self.get('/goals/board/list')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(response.json()[0]['title'], 'Board')
+
+    def test_change_by_other_process(self):
+        # Another worker has its own cache, the version in the database is all they share
+        self.get('/goals/board/list')
+        CacheVersion.objects.update_or_create(user=self.user, defaults={'version': uuid.uuid4()})
+        self.assertEqual(self.get('/goals/board/list')['X-Cache'], 'MISS')
+
+    def test_normalized_params(self):
+        self.get('/goals/board/list?limit=5&offset=0')
+        self.assertEqual(self.get('/goals/board/list?offset=0&limit=5')['X-Cache'], 'HIT')
+        self.assertEqual(self.get('/goals/board/list?offset=0&limit=6')['X-Cache'], 'MISS')
+
+    def test_per_user(self):
+        self.get('/goals/board/list')
+        self.assertEqual(self.get('/goals/board/list', user=self.other)['X-Cache'], 'MISS')
+
+    def test_hit_not_modified(self):
+        etag = self.get('/goals/goal_category/list')['ETag']
+        response = self.get('/goals/goal_category/list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_board_change_invalidates_participants(self):
+        self.get('/goals/board/list')
+        self.get('/goals/board/list', user=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board.title = 'Renamed'
+            self.board.save()
+        for user in (self.user, self.other):
+            response = self.get('/goals/board/list', user=user)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.json()[0]['title'], 'Renamed')
+
+    def test_category_change(self):
+        self.get('/goals/goal_category/list')
+        with self.captureOnCommitCallbacks(execute=True):
+            GoalCategory.objects.create(title='Second', user=self.user, board=self.board)
+        self.assertEqual(len(self.get('/goals/goal_category/list').json()), 2)
+
+    def test_participant_change_invalidates_only_that_user(self):
+        self.get('/goals/board/list')
+        self.get('/goals/board/list', user=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            BoardParticipant.objects.filter(user=self.other).delete()
+        self.assertEqual(self.get('/goals/board/list')['X-Cache'], 'HIT')
+        self.assertEqual(self.get('/goals/board/list', user=self.other).json(), [])
+
+    def test_stats(self):
+        self.get('/goals/board/list')
+        self.get('/goals/board/list')
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.get('/goals/cache_stats').json()['views']
+        self.assertGreaterEqual(stats['BoardListView']['hits'], 1)
+        self.assertGreaterEqual(stats['BoardListView']['misses'], 1)
+
+
+class BoardExportTestCase(BoardTestCase):
+    role = BoardParticipant.Role.reader
+
+    def setUp(self):
+        super().setUp()
+        self.goals = [
+            Goal.objects.create(title=f'Цель, "{i}"', category=self.category, user=self.user) for i in range(5)
+        ]
+        GoalComment.objects.create(goal=self.goals[1], user=self.user, text='Comment')
+
+    def export(self, query: str = ''):
+        response = self.client.get(f'/goals/board/{self.board.id}/export{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('?format=csv').decode())))
+        expected = GoalSerializer(self.goals, many=True).data
+        self.assertEqual([row['id'] for row in rows], [str(goal['id']) for goal in expected])
+        self.assertEqual(rows[0]['title'], expected[0]['title'])
+        self.assertEqual(rows[0]['description'], '')
+        self.assertEqual((rows[0]['category'], rows[0]['user']), ('Category', 'owner'))
+
+    def test_ndjson_with_comments(self):
+        lines = self.export('?format=ndjson&comments=true').decode().splitlines()
+        goals = [json.loads(line) for line in lines]
+        self.assertEqual(len(goals), 5)
+        self.assertEqual(goals[0]['comments'], [])
+        self.assertEqual([comment['text'] for comment in goals[1]['comments']], ['Comment'])
+        self.assertEqual(goals[1]['comments'][0]['user'], 'owner')
+
+    def test_chunks(self):
+        chunked = list(export_goals(self.board.id, comments=True, chunk_size=2))
+        self.assertEqual(chunked, list(export_goals(self.board.id, comments=True)))
+
+    def test_same_rows_as_serializer(self):
+        exported = list(export_goals(self.board.id))
+        with mock.patch('goals.export.compile_serializer', return_value=None):
+            self.assertEqual(exported, list(export_goals(self.board.id)))
+        goals = Goal.objects.filter(board=self.board).order_by('id')
+        self.assertEqual(exported, [dict(row) for row in GoalExportSerializer(goals, many=True).data])
+
+    def test_gzip(self):
+        response = self.client.get(f'/goals/board/{self.board.id}/export?format=ndjson&gzip=1')
+        self.assertIn('board-%d.ndjson.gz' % self.board.id, response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.splitlines()), 5)
+
+    def test_other_board(self):
+        board = Board.objects.create(title='Other')
+        response = self.client.get(f'/goals/board/{board.id}/export?format=csv')
+        self.assertEqual(response.status_code, 404)
+
+
+class GoalImportTestCase(BoardTestCase):
+    role = BoardParticipant.Role.writer
+    category_title = 'Existing'
+
+    def setUp(self):
+        super().setUp()
+        self.other = create_user('other')
+        BoardParticipant.objects.create(board=self.board, user=self.other, role=BoardParticipant.Role.reader)
+
+    def upload(self, name: str, content: bytes, **data):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(f'/goals/board/{self.board.id}/import', {'file': upload, **data}, format='multipart')
+
+    def test_ndjson(self):
+        lines = [
+            {'title': 'First', 'category': 'Existing', 'status': 3, 'due_date': '2026-01-01T10:00:00Z',
+             'comments': [{'text': 'Hi', 'user': {'username': 'other'}}, {'text': 'Tab\there\\'}]},
+            {'title': 'Second', 'category': 'New', 'user': 'other', 'description': 'Line\nbreak'},
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines).encode()
+        response = self.upload('goals.ndjson', content)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data, {'categories': 1, 'goals': 2, 'comments': 2})
+
+        first, second = Goal.objects.filter(board=self.board).order_by('id')
+        self.assertEqual((first.category_id, first.status, first.priority), (self.category.id, 3, 2))
+        self.assertEqual(first.due_date, timezone.datetime(2026, 1, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(second.category.title, 'New')
+        self.assertEqual((second.user_id, second.description), (self.other.id, 'Line\nbreak'))
+        self.assertEqual(
+            list(first.comments.order_by('id').values_list('text', 'user_id', 'board_id')),
+            [('Hi', self.other.id, self.board.id), ('Tab\there\\', self.user.id, self.board.id)],
+        )
+        self.assertEqual(Goal.objects.filter(search_vector='first').count(), 1)
+        self.assertEqual(GoalSummary.objects.get(category=self.category, status=3).count, 1)
+
+    def test_csv_round_trip(self):
+        Goal.objects.create(title='Goal, "quoted"', category=self.category, user=self.other, description=None)
+        export = b''.join(self.client.get(f'/goals/board/{self.board.id}/export?gzip=1').streaming_content)
+        response = self.upload('goals.csv.gz', export)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data, {'categories': 0, 'goals': 1, 'comments': 0})
+        first, second = Goal.objects.filter(board=self.board).order_by('id')
+        self.assertEqual((second.title, second.description, second.category_id, second.user_id),
+                         (first.title, None, self.category.id, self.other.id))
+
+    def test_ndjson_round_trip_to_other_board(self):
+        goal = Goal.objects.create(title='Goal', category=self.category, user=self.other)
+        GoalComment.objects.create(goal=goal, user=self.other, text='Hi')
+        export = b''.join(
+            self.client.get(f'/goals/board/{self.board.id}/export?format=ndjson&comments=1').streaming_content
+        )
+        self.board = Board.objects.create(title='Copy')
+        BoardParticipant.objects.create(board=self.board, user=self.user, role=BoardParticipant.Role.owner)
+        BoardParticipant.objects.create(board=self.board, user=self.other, role=BoardParticipant.Role.reader)
+        response = self.upload('goals.ndjson', export)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data, {'categories': 1, 'goals': 1, 'comments': 1})
+        copy = Goal.objects.get(board=self.board)
+        self.assertEqual((copy.category.title, copy.user_id), ('Existing', self.other.id))
+        self.assertEqual(list(copy.comments.values_list('text', 'user_id')), [('Hi', self.other.id)])
+
+    def test_errors_roll_back(self):
+        content = (
+            'title,category,user,status\n'
+            'Good,New,,1\n'
+            ',New,,1\n'
+            'Bad status,New,,9\n'
+            'Bad user,New,nobody,1\n'
+        ).encode()
+        response = self.upload('goals.csv', content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error.split(':')[0] for error in response.data['file']], ['line 3', 'line 4', 'line 5'])
+        self.assertFalse(Goal.objects.exists())
+        self.assertFalse(GoalCategory.objects.filter(title='New').exists())
+
+    def test_users_outside_board(self):
+        create_user('stranger')
+        lines = [
+            {'title': 'Goal', 'category': 'New', 'user': 'stranger'},
+            {'title': 'Comment', 'category': 'New', 'comments': [{'text': 'Hi', 'user': 'stranger'}]},
+        ]
+        response = self.upload('goals.ndjson', '\n'.join(json.dumps(line) for line in lines).encode())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['file'], [
+            'line 1: user: User "stranger" is not a participant of the board.',
+            'line 2: user: User "stranger" is not a participant of the board.',
+        ])
+        self.assertFalse(Goal.objects.exists())
+
+    @mock.patch('goals.changes.CHANGES_OVERLAP', timedelta(0))
+    def test_timestamps(self):
+        cursor = self.client.get('/goals/changes').data['cursor']
+        line = {'title': 'Old', 'category': 'Existing', 'created': '2020-01-01T00:00:00Z',
+                'updated': '2020-02-01T00:00:00Z', 'comments': [{'text': 'Hi', 'created': '2020-01-02T00:00:00Z'}]}
+        self.assertEqual(self.upload('goals.ndjson', json.dumps(line).encode()).status_code, 201)
+        goal, comment = Goal.objects.get(), GoalComment.objects.get()
+        self.assertEqual(goal.created, timezone.datetime(2020, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(comment.created, timezone.datetime(2020, 1, 2, tzinfo=timezone.utc))
+        self.assertGreater(comment.updated, goal.created)
+        data = self.client.get('/goals/changes', {'since': cursor}).data
+        self.assertEqual(([row['id'] for row in data['goals']], [row['id'] for row in data['comments']]),
+                         ([goal.id], [comment.id]))
+
+    def test_unreadable_files(self):
+        valid = 'title,category\nGoal,New\n'.encode()
+        cases = [
+            ('goals.csv', 'title,category\nGoal,New\nЦель,New\n'.encode('cp1251'), 'line 3: not UTF-8 text'),
+            ('goals.ndjson', '{"title": "Цель"}\n'.encode('cp1251'), 'line 1: not UTF-8 text'),
+            ('goals.csv.gz', valid, 'line 1: unreadable file: Not a gzipped file'),
+            ('goals.csv.gz', gzip.compress(valid)[:-10], 'line 2: unreadable file: Compressed file ended'),
+            ('goals.csv', b'title,category\nGoal,New\n"Broken"quote,New\n', 'line 3: invalid CSV'),
+            ('goals.csv', b'title,category\n"Unterminated,New\n', 'line 2: invalid CSV'),
+        ]
+        for name, content, error in cases:
+            with self.subTest(name=name, error=error):
+                response = self.upload(name, content)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(len(response.data['file']), 1)
+                self.assertTrue(response.data['file'][0].startswith(error), response.data['file'][0])
+        self.assertFalse(Goal.objects.exists())
+
+    def test_reader_forbidden(self):
+        self.client.force_authenticate(self.other)
+        response = self.upload('goals.csv', b'title,category\nGoal,New\n')
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_batches(self):
+        path = os.path.join(tempfile.mkdtemp(), 'goals.ndjson')
+        with open(path, 'w') as file:
+            for i in range(7):
+                file.write(json.dumps({'title': f'Goal {i}', 'category': f'Category {i % 2}'}) + '\n')
+        out = io.StringIO()
+        call_command('import_goals', self.board.id, path, user='owner', batch_size=3, stdout=out)
+        self.assertIn('Imported 7 goals', out.getvalue())
+        self.assertEqual(
+            list(Goal.objects.filter(board=self.board).order_by('id').values_list('title', flat=True)),
+            [f'Goal {i}' for i in range(7)],
+        )
+        self.assertEqual(GoalCategory.objects.filter(board=self.board).count(), 3)
+
+
+class CommentCounterTestCase(BoardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goal = Goal.objects.create(title='Goal', category=self.category, user=self.user)
+
+    def counters(self):
+        return Goal.objects.values_list('comment_count', 'last_comment_at').get(id=self.goal.id)
+
+    def test_create_and_delete(self):
+        self.assertEqual(self.counters(), (0, None))
+        first = GoalComment.objects.create(goal=self.goal, user=self.user, text='First')
+        second = GoalComment.objects.create(goal=self.goal, user=self.user, text='Second')
+        self.assertEqual(self.counters(), (2, second.created))
+
+        self.client.delete(f'/goals/goal_comment/{second.id}')
+        self.assertEqual(self.counters(), (1, first.created))
+        first.delete()
+        self.assertEqual(self.counters(), (0, None))
+
+    def test_stale_goal_save_keeps_counters(self):
+        goal = Goal.objects.get(id=self.goal.id)
+        comment = GoalComment.objects.create(goal=self.goal, user=self.user, text='Comment')
+        goal.title = 'Renamed'
+        goal.save()
+        self.assertEqual(self.counters(), (1, comment.created))
+        self.assertEqual(Goal.objects.get(id=self.goal.id).title, 'Renamed')
+
+    def test_bulk_create(self):
+        other = Goal.objects.create(title='Other', category=self.category, user=self.user)
+        now = timezone.now()
+        GoalComment.objects.bulk_create([
+            GoalComment(goal=goal, board=self.board, user=self.user, text='Comment', created=now, updated=now)
+            for goal in [self.goal, self.goal, other]
+        ])
+        self.assertEqual(self.counters(), (2, now))
+        self.assertEqual(Goal.objects.get(id=other.id).comment_count, 1)
+
+    def test_serialized_read_only(self):
+        GoalComment.objects.create(goal=self.goal, user=self.user, text='Comment')
+        goal = self.client.get('/goals/goal/list').json()[0]
+        self.assertEqual(goal['comment_count'], 1)
+        self.assertIsNotNone(goal['last_comment_at'])
+        self.client.patch(f'/goals/goal/{self.goal.id}', {'comment_count': 10}, format='json')
+        self.assertEqual(self.counters()[0], 1)
+
+
+class ArchivedPartitionTestCase(BoardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.active = Goal.objects.create(title='Active', category=self.category, user=self.user)
+        self.done = Goal.objects.create(
+            title='Done', category=self.category, user=self.user, status=Goal.Status.done
+        )
+        self.archived = Goal.objects.create(title='Archived', category=self.category, user=self.user)
+        self.client.delete(f'/goals/goal/{self.archived.id}')
+
+    def titles(self, query: str = '') -> list[str]:
+        return [goal['title'] for goal in self.client.get(f'/goals/goal/list{query}').json()]
+
+    def test_archived_goal_moves_to_cold_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM goals_goal_archived')
+            self.assertEqual(cursor.fetchall(), [(self.archived.id,)])
+        goal = Goal.objects.get(id=self.archived.id)
+        goal.status = Goal.Status.to_do
+        goal.save()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM goals_goal_archived')
+            self.assertEqual(cursor.fetchall(), [])
+
+    def test_list_defaults_to_active(self):
+        self.assertEqual(self.titles(), ['Active', 'Done'])
+        self.assertEqual(self.titles('?status=4'), ['Archived'])
+        self.assertEqual(self.titles('?status__in=1,4'), ['Active', 'Archived'])
+
+    def test_comments_follow_goal(self):
+        comment = GoalComment.objects.create(goal=self.archived, user=self.user, text='Comment')
+        Goal.objects.get(id=self.archived.id).delete()
+        self.assertFalse(GoalComment.objects.filter(id=comment.id).exists())
+
+    def partition_of(self, goal_id: int) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM goals_goal WHERE id = %s', [goal_id])
+            return cursor.fetchone()[0]
+
+    def test_status_change_then_delete(self):
+        comments = [GoalComment.objects.create(goal=self.active, user=self.user, text=str(i)) for i in range(2)]
+        for status, partition in [(Goal.Status.archived, 'goals_goal_archived'), (Goal.Status.done, 'goals_goal_hot')]:
+            response = self.client.patch(f'/goals/goal/{self.active.id}', {'status': status}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.partition_of(self.active.id), partition)
+            # Moving between partitions keeps the id, so comments still point at the goal
+            self.assertEqual(Goal.objects.get(id=self.active.id).comment_count, 2)
+            self.assertEqual(GoalComment.objects.filter(goal_id=self.active.id).count(), 2)
+
+        Goal.objects.get(id=self.active.id).delete()
+        self.assertFalse(GoalComment.objects.filter(id__in=[comment.id for comment in comments]).exists())
+
+    def test_no_database_foreign_key(self):
+        # Only Django cascades comments, a delete bypassing the ORM leaves them behind
+        comment = GoalComment.objects.create(goal=self.active, user=self.user, text='Comment')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM goals_goal WHERE id = %s', [self.active.id])
+        self.assertTrue(GoalComment.objects.filter(id=comment.id).exists())
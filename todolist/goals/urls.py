@@ -9,6 +9,9 @@ urlpatterns = [
 
     path('goal/create', views.GoalCreateView.as_view(), name='goal-create'),
     path('goal/list', views.GoalListView.as_view(), name='goal-list'),
+    path('goal/bulk_create', views.GoalBulkCreateView.as_view(), name='goal-bulk-create'),
+    path('goal/bulk_update', views.GoalBulkUpdateView.as_view(), name='goal-bulk-update'),
+    path('goal/bulk_archive', views.GoalBulkArchiveView.as_view(), name='goal-bulk-archive'),
     path('goal/<pk>', views.GoalView.as_view(), name='goal-one'),
 
     path('goal_comment/create', views.GoalCommentCreateView.as_view()),
@@ -17,5 +20,14 @@ urlpatterns = [
 
     path('board/create', views.BoardCreateView.as_view()),
     path('board/list', views.BoardListView.as_view()),
+    path('board/<pk>/export', views.BoardExportView.as_view()),
+    path('board/<pk>/import', views.BoardImportView.as_view()),
+    path('board/<pk>/summary', views.BoardSummaryView.as_view()),
+    path('board/<pk>/stream', views.BoardStreamView.as_view()),
     path('board/<pk>', views.BoardView.as_view()),
+
+    path('changes', views.GoalChangesView.as_view()),
+    path('cache_stats', views.ResponseCacheStatsView.as_view()),
+
+    path('archive_task/<pk>', views.ArchiveTaskView.as_view()),
 ]
@@ -1,19 +1,39 @@
+import os
+
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Q, Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
-from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveUpdateDestroyAPIView, RetrieveUpdateAPIView
-from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.permissions import IsAuthenticated
-
-from goals.filters import GoalDateFilter
-from goals.models import GoalCategory, Goal, GoalComment, Board
+from rest_framework import filters, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveUpdateDestroyAPIView, RetrieveUpdateAPIView, \
+    GenericAPIView, RetrieveAPIView
+from rest_framework.pagination import _positive_int
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from goals.changes import CHANGES_DEFAULT_LIMIT, CHANGES_MAX_LIMIT, get_changes
+from goals.conditional import ConditionalGetMixin
+from goals.events import publish_rows_on_commit
+from goals.export import CSVRenderer, NDJSONRenderer, export_goals, export_header, gzip_stream
+from goals.fastpath import FastListMixin
+from goals.filters import GoalDateFilter, FullTextSearchFilter
+from goals.imports import IMPORT_FORMATS, GoalImportError, guess_format, import_goals
+from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant, ArchiveTask
+from goals.pagination import KeysetPagination
 from goals.permissions import IsOwner, BoardPermissions, GoalCategoryPermissions, GoalPermissions, \
     GoalCommentPermissions
+from goals.response_cache import CachedListMixin, response_cache_stats
+from goals.roles import get_board_roles, invalidate_board
 from goals.serializers import GoalCategoryCreateSerializer, GoalCategorySerializer, GoalCreateSerializer, \
     GoalSerializer, GoalCommentCreateSerializer, GoalCommentSerializer, BoardCreateSerializer, BoardSerializer, \
-    BoardListSerializer
+    BoardListSerializer, GoalBulkArchiveSerializer, PrefetchedPrimaryKeyRelatedField, ArchiveTaskSerializer
+from goals.summary import archive_goals, board_summary
+from goals.tasks import start_archive
 
 
 class BoardCreateView(CreateAPIView):
@@ -22,29 +42,131 @@ class BoardCreateView(CreateAPIView):
     serializer_class = BoardCreateSerializer
 
 
-class BoardView(RetrieveUpdateDestroyAPIView):
+class BoardView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     model = Board
     permission_classes = [IsAuthenticated, BoardPermissions]
     serializer_class = BoardSerializer
+    conditional_related = ['participants']
 
     def get_queryset(self):
         # Filtering boards through participants
-        queryset = Board.objects.filter(participants__user=self.request.user, is_deleted=False)
+        queryset = Board.objects.filter(
+            id__in=get_board_roles(self.request).board_ids, is_deleted=False
+        ).prefetch_related(
+            Prefetch('participants', queryset=BoardParticipant.objects.select_related('user'))
+        )
         return queryset
 
+    def destroy(self, request, *args, **kwargs):
+        task = self.perform_destroy(self.get_object())
+        return Response(ArchiveTaskSerializer(task).data, status=status.HTTP_202_ACCEPTED)
+
     def perform_destroy(self, instance: Board):
+        # The board disappears from listings right away, categories and goals are archived in background
         with transaction.atomic():
             instance.is_deleted = True
             instance.save()
-            instance.categories.update(is_deleted=True)
-            Goal.objects.filter(category__board=instance).update(status=Goal.Status.archived)
-        return instance
+            task = start_archive(instance)
+            invalidate_board(instance.id)
+        return task
+
+
+class BoardSummaryView(RetrieveAPIView):
+    model = Board
+    permission_classes = [IsAuthenticated, BoardPermissions]
+
+    def get_queryset(self):
+        return Board.objects.filter(
+            id__in=get_board_roles(self.request).board_ids, is_deleted=False
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        return Response(board_summary(board.id))
+
+
+class BoardExportView(RetrieveAPIView):
+    model = Board
+    permission_classes = [IsAuthenticated, BoardPermissions]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get_queryset(self):
+        return Board.objects.filter(
+            id__in=get_board_roles(self.request).board_ids, is_deleted=False
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        comments = request.query_params.get('comments', '').lower() in ('1', 'true')
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true')
+
+        renderer = request.accepted_renderer
+        content = renderer.render_rows(export_header(comments), export_goals(board.id, comments=comments))
+        filename = f'board-{board.id}.{renderer.format}'
+        if compress:
+            content = gzip_stream(content)
+            filename += '.gz'
+            content_type = 'application/gzip'
+        else:
+            content_type = f'{renderer.media_type}; charset={renderer.charset}'
+        return StreamingHttpResponse(content, content_type=content_type, headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+        })
+
+
+class BoardImportView(GenericAPIView):
+    model = Board
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def get_queryset(self):
+        return Board.objects.filter(
+            id__in=get_board_roles(self.request).writable_board_ids, is_deleted=False
+        )
+
+    def post(self, request, *args, **kwargs):
+        board = self.get_object()
+        file = request.FILES.get('file')
+        if file is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        fmt, gzipped = guess_format(file.name)
+        fmt = request.data.get('format') or fmt
+        if fmt not in IMPORT_FORMATS:
+            raise ValidationError({'format': [f'Expected one of {", ".join(IMPORT_FORMATS)}.']})
+        try:
+            stats = import_goals(board, request.user, file.file, fmt, gzipped)
+        except GoalImportError as error:
+            raise ValidationError({'file': error.errors})
+        return Response(stats, status=status.HTTP_201_CREATED)
+
+
+class BoardStreamView(APIView):
+    """
+    Board streams are served by todolist.asgi before requests reach Django, see goals.stream.
+
+    Under the WSGI server of the Dockerfile the route answers 501, so clients fall back to polling goals/changes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'detail': 'Board streams need the ASGI server, poll goals/changes instead.'},
+                        status=status.HTTP_501_NOT_IMPLEMENTED)
+
+
+class ArchiveTaskView(RetrieveAPIView):
+    model = ArchiveTask
+    permission_classes = [IsAuthenticated]
+    serializer_class = ArchiveTaskSerializer
+
+    def get_queryset(self):
+        # Boards of finished tasks are deleted, so they are not in the cached roles
+        return ArchiveTask.objects.filter(board__participants__user=self.request.user)
 
 
-class BoardListView(ListAPIView):
+class BoardListView(CachedListMixin, ConditionalGetMixin, FastListMixin, ListAPIView):
     model = Board
     permission_classes = [IsAuthenticated]
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
     serializer_class = BoardListSerializer
     filter_backends = [
         filters.OrderingFilter,
@@ -54,7 +176,7 @@ class BoardListView(ListAPIView):
 
     def get_queryset(self):
         return Board.objects.filter(
-            participants__user=self.request.user, is_deleted=False
+            id__in=get_board_roles(self.request).board_ids, is_deleted=False
         )
 
 
@@ -64,42 +186,50 @@ class GoalCategoryCreateView(CreateAPIView):
     serializer_class = GoalCategoryCreateSerializer
 
 
-class GoalCategoryListView(ListAPIView):
+class GoalCategoryListView(CachedListMixin, ConditionalGetMixin, FastListMixin, ListAPIView):
     model = GoalCategory
     permission_classes = [IsAuthenticated]
     serializer_class = GoalCategorySerializer
-    pagination_class = LimitOffsetPagination
+    conditional_board_roles = False
+    pagination_class = KeysetPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
     ]
 
     filterset_fields = ['board']
     ordering_fields = ['title', 'created']
     ordering = ['title']
     search_fields = ['title']
+    search_trigram_fields = ['title']
 
     def get_queryset(self):
         return GoalCategory.objects.filter(
             user=self.request.user, is_deleted=False
-        )
+        ).select_related('user')
 
 
-class GoalCategoryView(RetrieveUpdateDestroyAPIView):
+class GoalCategoryView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     model = GoalCategory
     serializer_class = GoalCategorySerializer
     permission_classes = [IsAuthenticated, GoalCategoryPermissions]
 
     def get_queryset(self):
-        return GoalCategory.objects.filter(board__participants__user=self.request.user, is_deleted=False)
+        return GoalCategory.objects.filter(
+            board_id__in=get_board_roles(self.request).board_ids, is_deleted=False
+        ).select_related('user')
+
+    def destroy(self, request, *args, **kwargs):
+        task = self.perform_destroy(self.get_object())
+        return Response(ArchiveTaskSerializer(task).data, status=status.HTTP_202_ACCEPTED)
 
     def perform_destroy(self, instance):
         with transaction.atomic():
             instance.is_deleted = True
             instance.save()
-            Goal.objects.filter(category=instance).update(status=Goal.Status.archived)
-        return instance
+            task = start_archive(instance.board, category=instance)
+        return task
 
 
 class GoalCreateView(CreateAPIView):
@@ -108,31 +238,36 @@ class GoalCreateView(CreateAPIView):
     serializer_class = GoalCreateSerializer
 
 
-class GoalListView(ListAPIView):
+class GoalListView(ConditionalGetMixin, FastListMixin, ListAPIView):
     model = Goal
     permission_classes = [IsAuthenticated]
     serializer_class = GoalSerializer
     filterset_class = GoalDateFilter
-    pagination_class = LimitOffsetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     ordering_fields = ['title', 'created', 'due_date', 'priority']
     ordering = ['title', 'due_date', 'priority']
     search_fields = ['title', 'description']
+    search_trigram_fields = ['title']
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            category__board__participants__user=self.request.user
+        queryset = Goal.objects.filter(
+            board_id__in=get_board_roles(self.request).board_ids
         )
+        # Archived goals are in a partition of their own, read only when a status filter asks for them
+        if not {'status', 'status__in'} & self.request.query_params.keys():
+            queryset = queryset.filter(status__in=Goal.active_statuses)
+        return queryset
 
 
-class GoalView(RetrieveUpdateDestroyAPIView):
+class GoalView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     model = Goal
     permission_classes = [IsAuthenticated, GoalPermissions]  # IsOwner
     serializer_class = GoalSerializer
 
     def get_queryset(self):
         return Goal.objects.filter(
-            category__board__participants__user=self.request.user
+            board_id__in=get_board_roles(self.request).board_ids
         )
 
     def perform_destroy(self, instance):
@@ -147,23 +282,172 @@ class GoalCommentCreateView(CreateAPIView):
     serializer_class = GoalCommentCreateSerializer
 
 
-class GoalCommentListView(ListAPIView):
+class GoalCommentListView(ConditionalGetMixin, ListAPIView):
     model = GoalComment
     permission_classes = [IsAuthenticated, GoalCommentPermissions]
     serializer_class = GoalCommentSerializer
-    pagination_class = LimitOffsetPagination
+    conditional_board_roles = False
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['goal']
     ordering = ['-created']
 
     def get_queryset(self):
-        return GoalComment.objects.filter(goal__user=self.request.user)
+        return GoalComment.objects.filter(goal__user=self.request.user).select_related('user')
 
 
-class GoalCommentView(RetrieveUpdateDestroyAPIView):
+class GoalCommentView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     model = GoalComment
     permission_classes = [IsAuthenticated]  # IsOwner
     serializer_class = GoalCommentSerializer
+    conditional_board_roles = False
+
+    def get_queryset(self):
+        return GoalComment.objects.filter(goal__user=self.request.user).select_related('user')
+
+
+class GoalChangesView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = _positive_int(request.query_params['limit'], strict=True, cutoff=CHANGES_MAX_LIMIT)
+        except (KeyError, ValueError):
+            limit = CHANGES_DEFAULT_LIMIT
+        since = request.query_params.get('since', '')
+        return Response(get_changes(request.user, since, limit, context=self.get_serializer_context()))
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        # Counters are per process, like the default local memory cache
+        return Response({'pid': os.getpid(), 'views': response_cache_stats()})
+
+
+class GoalBulkMixin:
+    max_batch_size = 500
+
+    def get_batch(self, request) -> list:
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items']})
+        if len(request.data) > self.max_batch_size:
+            raise ValidationError({'non_field_errors': [f'Ensure there are no more than {self.max_batch_size} items']})
+        return request.data
+
+    def get_batch_context(self, serializer_class, items: list) -> dict:
+        context = self.get_serializer_context()
+        context['prefetched'] = PrefetchedPrimaryKeyRelatedField.prefetch(serializer_class(context=context), items)
+        return context
+
+
+class GoalBulkCreateView(GoalBulkMixin, GenericAPIView):
+    model = Goal
+    permission_classes = [IsAuthenticated]
+    serializer_class = GoalCreateSerializer
+
+    def post(self, request, *args, **kwargs):
+        items = self.get_batch(request)
+        context = self.get_batch_context(GoalCreateSerializer, items)
+
+        item_serializers = [GoalCreateSerializer(data=item, context=context) for item in items]
+        errors = [{} if serializer.is_valid() else serializer.errors for serializer in item_serializers]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        goals = [
+            Goal(**serializer.validated_data, board_id=serializer.validated_data['category'].board_id,
+                 created=now, updated=now)
+            for serializer in item_serializers
+        ]
+        with transaction.atomic():
+            goals = Goal.objects.bulk_create(goals)
+            publish_rows_on_commit('goal', 'created', [(goal.board_id, goal.id) for goal in goals])
+        return Response(GoalSerializer(goals, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class GoalBulkUpdateView(GoalBulkMixin, GenericAPIView):
+    model = Goal
+    permission_classes = [IsAuthenticated]
+    serializer_class = GoalSerializer
 
     def get_queryset(self):
-        return GoalComment.objects.filter(goal__user=self.request.user)
+        return Goal.objects.filter(
+            board_id__in=get_board_roles(self.request).board_ids
+        )
+
+    def patch(self, request, *args, **kwargs):
+        items = self.get_batch(request)
+        context = self.get_batch_context(GoalSerializer, items)
+        roles = get_board_roles(request)
+
+        ids = []
+        for item in items:
+            try:
+                ids.append(int(item['id']))
+            except (TypeError, ValueError, KeyError):
+                ids.append(None)
+        goals = self.get_queryset().in_bulk({goal_id for goal_id in ids if goal_id is not None})
+
+        item_serializers, errors, seen = [], [], set()
+        for goal_id, item in zip(ids, items):
+            goal = goals.get(goal_id)
+            if goal is None:
+                errors.append({'id': ['Not found.']})
+            elif goal_id in seen:
+                errors.append({'id': ['Duplicate id.']})
+            elif not roles.can_write(goal.board_id):
+                errors.append({'id': ['must be owner or writer of the goal']})
+            else:
+                serializer = GoalSerializer(goal, data=item, partial=True, context=context)
+                item_serializers.append(serializer)
+                errors.append({} if serializer.is_valid() else serializer.errors)
+            seen.add(goal_id)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        fields = {'updated'}
+        moved_ids = []
+        for serializer in item_serializers:
+            goal = serializer.instance
+            for attr, value in serializer.validated_data.items():
+                setattr(goal, attr, value)
+                fields.add(attr)
+            if 'category' in serializer.validated_data and goal.category.board_id != goal.board_id:
+                goal.board_id = goal.category.board_id
+                moved_ids.append(goal.id)
+                fields.add('board')
+            goal.updated = now
+        goals = [serializer.instance for serializer in item_serializers]
+        with transaction.atomic():
+            Goal.objects.bulk_update(goals, list(fields))
+            publish_rows_on_commit('goal', 'updated', [(goal.board_id, goal.id) for goal in goals])
+            if moved_ids:
+                Goal.sync_comment_boards(moved_ids)
+        return Response(GoalSerializer(goals, many=True).data)
+
+
+class GoalBulkArchiveView(GenericAPIView):
+    model = Goal
+    permission_classes = [IsAuthenticated]
+    serializer_class = GoalBulkArchiveSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        allowed = set(Goal.objects.filter(
+            id__in=ids, board_id__in=get_board_roles(request).writable_board_ids
+        ).values_list('id', flat=True))
+        errors = {str(goal_id): ['Not found or must be owner or writer of the goal']
+                  for goal_id in ids if goal_id not in allowed}
+        if errors:
+            return Response({'ids': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            archive_goals(Goal.objects.filter(id__in=allowed))
+        return Response({'ids': sorted(allowed)})
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todolist.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once apps are ready
+from goals.stream import STREAM_PATH, board_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Django 4.1 can't stream from async code, board streams are served by a plain ASGI app
+    if scope['type'] == 'http' and STREAM_PATH.match(scope['path']):
+        return await board_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
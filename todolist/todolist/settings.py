@@ -37,6 +37,29 @@ DEBUG = env('DEBUG')
 ALLOWED_HOSTS = [env('ALLOWED_HOSTS')]
 
 TG_BOT_TOKEN = env('TG_BOT_TOKEN')
+# Threads of runbot handling updates, each chat is handled by one thread at a time. Only runbot handles updates
+TG_BOT_WORKERS = env.int('TG_BOT_WORKERS', default=8)
+# Conversations of runbot kept in memory, all of them are stored in the database
+TG_BOT_CONVERSATIONS_CACHE_SIZE = env.int('TG_BOT_CONVERSATIONS_CACHE_SIZE', default=10000)
+# Outbound messages per second, to all chats and to one chat (Telegram allows about 30 and 1). Only runbot sends,
+# the API stores its messages in the outbox table for runbot, so these limits hold for the whole bot
+TG_BOT_RATE = env.float('TG_BOT_RATE', default=30)
+TG_BOT_CHAT_RATE = env.float('TG_BOT_CHAT_RATE', default=1)
+# Threads of runbot sending queued messages
+TG_BOT_SENDERS = env.int('TG_BOT_SENDERS', default=4)
+# Seconds between saves of the runbot send queue stats shown by bot/send_stats
+TG_BOT_STATS_INTERVAL = env.float('TG_BOT_STATS_INTERVAL', default=10)
+# 'polling' runs the bot in runbot, 'webhook' has Telegram post updates to bot/webhook of the API.
+# Polling confirms updates to Telegram once runbot has queued them: runbot finishes them when stopped,
+# but updates still queued when it crashes are lost.
+# Webhook answers Telegram once the API has stored the update in the inbox table, one delivery at a time;
+# runbot handles stored updates in order and picks up the ones it had not handled after a restart.
+TG_BOT_MODE = env('TG_BOT_MODE', default='polling')
+# Public https URL of bot/webhook and the secret Telegram sends with every update, 1-256 of A-Z a-z 0-9 _ -
+TG_BOT_WEBHOOK_URL = env('TG_BOT_WEBHOOK_URL', default='')
+TG_BOT_WEBHOOK_SECRET = env('TG_BOT_WEBHOOK_SECRET', default='')
+# Stored updates runbot has not handled yet, Telegram delivers later what doesn't fit
+TG_BOT_WEBHOOK_MAX_PENDING = env.int('TG_BOT_WEBHOOK_MAX_PENDING', default=1000)
 
 
 # Application definition
@@ -48,6 +71,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'social_django',
     'django_filters',
@@ -103,6 +127,41 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Board roles are cached per user under a version kept in the database (goals.models.CacheVersion),
+# so a change made through one gunicorn worker is seen by the local memory caches of all of them.
+# Board and category list responses are cached per user under the same version, see goals.response_cache,
+# so any backend is safe; a shared one (e.g. redis) only raises the hit rate over separate worker caches.
+# Local memory cache drops the least recently used entries past MAX_ENTRIES.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'board_roles': {
+        'BACKEND': env('BOARD_ROLES_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('BOARD_ROLES_CACHE_LOCATION', default='board_roles'),
+        'TIMEOUT': env.int('BOARD_ROLES_CACHE_TIMEOUT', default=60),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('BOARD_ROLES_CACHE_MAX_ENTRIES', default=10000),
+        },
+    },
+    'list_responses': {
+        'BACKEND': env('LIST_RESPONSES_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('LIST_RESPONSES_CACHE_LOCATION', default='list_responses'),
+        'TIMEOUT': env.int('LIST_RESPONSES_CACHE_TIMEOUT', default=300),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('LIST_RESPONSES_CACHE_MAX_ENTRIES', default=5000),
+        },
+    },
+}
+
+# Opt-in fast path of board, category and goal lists, see goals.fastpath: rows are built from .values() by compiled
+# serializers and encoded by orjson, with the same bytes as the regular path. Compare with benchmark_serialization
+FAST_LIST_RESPONSES = env.bool('FAST_LIST_RESPONSES', default=False)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 